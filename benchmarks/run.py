@@ -0,0 +1,177 @@
+"""
+Benchmark suite of the DataHandler, the figures and the callbacks on synthetic databases of several sizes.
+
+Usage: python -m benchmarks.run [--sizes 1x1 10x2] [--repeat 10] [--output benchmark.json] [--compare old.json]
+
+Each size is given as <meters>x<years>. The databases are generated once with elv.synthetic and kept in the data
+directory, each size is benchmarked in a separate process with the cache disabled. The report is written as JSON, with
+one entry per size and benchmark, and can be compared with an earlier report to spot regressions.
+"""
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_SIZES = ['1x1', '10x2', '50x3']
+
+
+def parse_size(size):
+    """Return the number of meters and years of a size given as <meters>x<years>."""
+    meters, years = size.lower().split('x')
+    return int(meters), int(years)
+
+
+def measure(func, repeat):
+    """Call func repeat times and return the timing statistics in seconds, the first call is reported separately."""
+    timings = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'first': timings[0], 'min': min(timings[1:]), 'median': statistics.median(timings[1:]),
+            'mean': statistics.mean(timings[1:]), 'runs': repeat}
+
+
+def benchmarks():
+    """Return the benchmarked functions by name, the database is given by the ELV_DATABASE environment variable."""
+    import pandas as pd
+    from plotly.utils import PlotlyJSONEncoder
+
+    from dlp import get_default_load_profile
+    from elv import callbacks, dh, export, figures
+
+    dlp = get_default_load_profile()
+    meters = dh.meters_in_database()
+    meter = meters[0]
+    metadata = dh.metadata(meter)
+    first, last = pd.Timestamp(metadata.first_date), pd.Timestamp(metadata.last_date)
+    date = (first + (last - first) / 2).strftime("%Y-%m-%d")
+    window = (pd.Timestamp(date), pd.Timestamp(date) + pd.Timedelta(days=14))
+    span = {'xaxis.range': [(last - pd.Timedelta(days=90)).strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")]}
+    readings = dh.storage().readings(meter, f"{metadata.first_date} 00:00", f"{metadata.last_date} 23:59")
+    daily_readings = dh.storage().daily_readings(meter)
+    year = (last - pd.Timedelta(days=364)).strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")
+    return {
+        'DataHandler.meters_in_database': dh.meters_in_database,
+        'DataHandler.search_meters': lambda: dh.search_meters(meter[:3]),
+        'DataHandler.metadata': lambda: dh.metadata(meter),
+        'DataHandler.meter_info': lambda: dh.meter_info(meter),
+        'DataHandler.first_date': lambda: dh.first_date(meter),
+        'DataHandler.last_date': lambda: dh.last_date(meter),
+        'DataHandler.available_months': lambda: dh.available_months(meter),
+        'DataHandler.available_years': lambda: dh.available_years(meter),
+        'DataHandler.day': lambda: dh.day(meter, date),
+        'DataHandler.interval': lambda: dh.interval(meter, *window),
+        'DataHandler.overview': lambda: dh.overview(meter),
+        'DataHandler.overview_stats': lambda: dh.overview_stats(meter, *window),
+        'DataHandler.min': lambda: dh.min(meter, *window),
+        'DataHandler.max': lambda: dh.max(meter, *window),
+        'DataHandler.mean': lambda: dh.mean(meter, *window),
+        'DataHandler.sum': lambda: dh.sum(meter, *window),
+        'DataHandler.yearly_energy_usage': lambda: dh.yearly_energy_usage(meter),
+        'DataHandler.portfolio_interval': lambda: dh.portfolio_interval(meters, *window),
+        'DataHandler.portfolio_overview': lambda: dh.portfolio_overview(meters),
+        'DataHandler._prepare_dataframe[15T]': lambda: dh._prepare_dataframe(readings, '15T'),
+        'DataHandler._prepare_dataframe[D]': lambda: dh._prepare_dataframe(daily_readings, 'D'),
+        'figures.overview_figure': lambda: figures.overview_figure(meter),
+        'figures.overview_figure[zoomed]': lambda: figures.overview_figure(meter, *window),
+        'figures.portfolio_figure': lambda: figures.portfolio_figure(meters),
+        # Serialization of a callback output as done by Dash
+        'figures.overview_figure[json]': lambda: json.dumps(figures.overview_figure(meter), cls=PlotlyJSONEncoder),
+        'figures.day_dataset': lambda: figures.day_dataset(meter, date),
+        'figures.detail_layout': lambda: figures.detail_layout(date),
+        'export.csv_chunks[year]': lambda: sum(map(len, export.csv_chunks(export.export_frames(dh, meter, *year)))),
+        'callbacks.update_stats_overview': lambda: callbacks.update_stats_overview.__wrapped__(span, 1, meter),
+        'callbacks.update_day_dataset': lambda: callbacks.update_day_dataset.__wrapped__(date, meter),
+        'DefaultLoadProfile.calculate_profile': lambda: dlp.calculate_profile(date, 3500, shift=True),
+        'DefaultLoadProfile.calculate_profile_range': lambda: dlp.calculate_profile_range(*year, 3500, shift=True),
+    }
+
+
+def run_size(repeat):
+    """Benchmark the database given by the environment and print the results as JSON."""
+    results = {}
+    for name, func in benchmarks().items():
+        results[name] = measure(func, repeat)
+    json.dump(results, sys.stdout)
+
+
+def main():
+    """Generate the databases, run the benchmarks of each size in a separate process and write the report."""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="sizes as <meters>x<years>")
+    parser.add_argument('--repeat', type=int, default=10, help="number of measured calls per benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic databases")
+    parser.add_argument('--data-dir', default=pathlib.Path(tempfile.gettempdir()) / 'elv-benchmarks',
+                        type=pathlib.Path, help="directory of the generated databases")
+    parser.add_argument('--output', default='benchmark.json', help="path of the JSON report")
+    parser.add_argument('--compare', help="earlier JSON report to compare the medians with")
+    parser.add_argument('--run-size', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_size:
+        run_size(args.repeat)
+        return
+
+    from elv.synthetic import generate_database
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip(),
+        'python': platform.python_version(),
+        'packages': package_versions(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': [],
+    }
+    for size in args.sizes:
+        meters, years = parse_size(size)
+        path = args.data_dir / f"synthetic-{meters}x{years}-{args.seed}.db"
+        if not path.exists():
+            print(f"Generating {path}...", file=sys.stderr)
+            generate_database(path, meters, years, seed=args.seed)
+        con = sqlite3.connect(path)
+        rows = con.execute("SELECT count(*) FROM zaehlwerte;").fetchone()[0]
+        con.close()
+        env = dict(os.environ, ELV_DATABASE=str(path), ELV_CACHE_TYPE='null')
+        output = subprocess.run([sys.executable, '-W', 'ignore', '-m', 'benchmarks.run', '--run-size', '--repeat',
+                                 str(args.repeat)], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        for name, timings in json.loads(output.stdout).items():
+            report['results'].append(dict(size=size, meters=meters, years=years, rows=rows, benchmark=name, **timings))
+            print(f"{size:>8} {name:<48} {timings['median'] * 1000:10.2f} ms")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        compare(args.compare, report)
+
+
+def package_versions():
+    """Return the versions of the packages that affect the results."""
+    import dash
+    import numpy
+    import pandas
+    import plotly
+    return {module.__name__: module.__version__ for module in (dash, numpy, pandas, plotly)}
+
+
+def compare(path, report):
+    """Print the ratio of the medians of the report to the ones of an earlier report."""
+    with open(path, encoding='utf-8') as f:
+        previous = {(r['size'], r['benchmark']): r['median'] for r in json.load(f)['results']}
+    for result in report['results']:
+        before = previous.get((result['size'], result['benchmark']))
+        if before:
+            print(f"{result['size']:>8} {result['benchmark']:<48} {result['median'] / before:6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Startup benchmark of the app: the cold-start time of the WSGI module and the memory of the master and its workers.
+
+Usage: python -m benchmarks.startup [--module wsgi] [--workers 4] [--repeat 5] [--output startup.json]
+
+Each run starts a new interpreter that imports the module like the uWSGI master and forks the given number of workers,
+which run a garbage collection and report their memory. The runs are done with and without preloading (ELV_PRELOAD),
+so the memory shared copy-on-write between the master and the workers can be compared. The memory is read from
+/proc/<pid>/smaps_rollup and therefore only reported on Linux.
+"""
+import argparse
+import datetime
+import gc
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.run import ROOT
+
+# Fields of smaps_rollup in KiB, private is the memory of a process that is not shared with any other process
+MEMORY_FIELDS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty', 'Shared_Clean', 'Shared_Dirty')
+
+
+def memory(pid='self'):
+    """Return the memory of the given process in MiB, an empty dictionary if smaps_rollup is not available."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as f:
+            values = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split(':')[0] in MEMORY_FIELDS}
+    except OSError:
+        return {}
+    return {'rss': values['Rss'] / 1024, 'pss': values['Pss'] / 1024,
+            'private': (values['Private_Clean'] + values['Private_Dirty']) / 1024,
+            'shared': (values['Shared_Clean'] + values['Shared_Dirty']) / 1024}
+
+
+def run_child(module, workers):
+    """Import the module, fork the workers and print the timings and memory as JSON."""
+    start = time.perf_counter()
+    importlib.import_module(module)
+    result = {'import': time.perf_counter() - start, 'master': memory(), 'workers': []}
+    pipes = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        if os.fork() == 0:
+            os.close(read)
+            gc.collect()  # Touches every tracked object unless they were frozen by the preloading
+            os.write(write, json.dumps(memory()).encode())
+            os._exit(0)
+        os.close(write)
+        pipes.append(read)
+    time.sleep(0.5)  # Let all workers finish the collection, so the shared memory is divided among all of them
+    for read in pipes:
+        with os.fdopen(read) as f:
+            result['workers'].append(json.loads(f.read() or '{}'))
+    for _ in pipes:
+        os.wait()
+    json.dump(result, sys.stdout)
+
+
+def summarize(runs):
+    """Return the medians of the runs of one configuration."""
+    summary = {'cold_start': statistics.median(r['cold_start'] for r in runs),
+               'import': statistics.median(r['import'] for r in runs)}
+    for key in ('rss', 'pss', 'private', 'shared'):
+        masters = [r['master'][key] for r in runs if key in r['master']]
+        workers = [w[key] for r in runs for w in r['workers'] if key in w]
+        if masters:
+            summary[f'master_{key}'] = statistics.median(masters)
+        if workers:
+            summary[f'worker_{key}'] = statistics.median(workers)
+    return summary
+
+
+def main():
+    """Run the startup benchmark with and without preloading and write the report."""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--module', default='wsgi', help="module loaded by the uWSGI master, defaults to wsgi")
+    parser.add_argument('--workers', type=int, default=4, help="number of forked workers")
+    parser.add_argument('--repeat', type=int, default=5, help="number of runs per configuration")
+    parser.add_argument('--output', default='startup.json', help="path of the JSON report")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.module, args.workers)
+        return
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'module': args.module,
+        'workers': args.workers,
+        'results': {},
+    }
+    for preload in ('1', '0'):
+        env = dict(os.environ, ELV_PRELOAD=preload)
+        runs = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, '-W', 'ignore', '-m', 'benchmarks.startup', '--child', '--module',
+                                     args.module, '--workers', str(args.workers)], cwd=ROOT, env=env,
+                                    capture_output=True, text=True, check=True)
+            runs.append(dict(json.loads(output.stdout), cold_start=time.perf_counter() - start))
+        name = 'preload' if preload == '1' else 'no_preload'
+        report['results'][name] = summary = summarize(runs)
+        print(f"{name:>10}: cold start {summary['cold_start']:.2f} s, import {summary['import']:.2f} s" +
+              ''.join(f", {key} {summary[key]:.1f} MiB" for key in ('master_rss', 'worker_pss', 'worker_private')
+                      if key in summary))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,2 @@
 # Provide DefaultLoadProfile class
-from dlp.default_load_profile import DefaultLoadProfile
+from dlp.default_load_profile import DefaultLoadProfile, get_default_load_profile, preload_holidays
@@ -1,20 +1,62 @@
 import datetime
+import functools
 import os
 import pathlib
+import threading
 
 import holidays
+import numpy as np
 import pandas as pd
 
+SEASONS = ["winter", "transition", "summer"]
+DAY_TYPES = ["weekday", "saturday", "sunday"]
+
+_shared_instance = None
+_shared_instance_lock = threading.Lock()
+
+
+def get_default_load_profile():
+    """
+    Return the DefaultLoadProfile instance shared by the whole process, it is created on the first call.
+
+    :return: DefaultLoadProfile instance
+    """
+    global _shared_instance
+    if _shared_instance is None:
+        with _shared_instance_lock:
+            if _shared_instance is None:
+                _shared_instance = DefaultLoadProfile()
+    return _shared_instance
+
+
+@functools.lru_cache(maxsize=None)
+def _holidays(year: int) -> frozenset:
+    """Returns the german public holidays of the given year."""
+    return frozenset(holidays.Germany(years=year))
+
+
+def preload_holidays(years):
+    """Calculate the holidays of the given years in advance, e.g. before the worker processes are forked."""
+    for year in years:
+        _holidays(year)
+
 
 class DefaultLoadProfile:
     def __init__(self):
         """
         Class to calculate the default load profile of a given day for the household customer group.
         Uses the data of two .csv files as lookup tables for the load profile data, these files must be present.
+        Use get_default_load_profile to avoid reading the files more than once.
         """
         parent = pathlib.Path(os.path.realpath(__file__)).parent
-        self._static_lookup = pd.read_csv(parent / 'profile.csv', header=[0, 1], index_col=0).transpose()
-        self._dynamic_lookup = pd.read_csv(parent / 'factors.csv').set_index('day_no')
+        static_lookup = pd.read_csv(parent / 'profile.csv', header=[0, 1], index_col=0).transpose()
+        # Static profile values indexed by season, day type and quarter hour (0:15 to 0:00)
+        self._static_lookup = np.stack([np.stack([static_lookup.loc[(season, day_type)].to_numpy(dtype='float64')
+                                                  for day_type in DAY_TYPES]) for season in SEASONS])
+        # Quarter hours set to zero on the daylight saving times switch (2:15 to 3:00)
+        self._dst_slice = slice(static_lookup.columns.get_loc('2:15'), static_lookup.columns.get_loc('3:00') + 1)
+        # Dynamization factors indexed by the day of the year - 1
+        self._dynamic_lookup = pd.read_csv(parent / 'factors.csv').sort_values('day_no')['value'].to_numpy('float64')
 
     def calculate_profile(self, date: str, energy_usage: float = 1000, shift=False):
         """
@@ -27,35 +69,79 @@ class DefaultLoadProfile:
         """
         date = datetime.date.fromisoformat(date)
         static_profile_values = self._static_profile_values(date, energy_usage)
-        profile_values = static_profile_values.mul(self._dynamization_factor(date)).round(1)
+        profile_values = np.round(static_profile_values * self._dynamization_factor(date), 1)
 
         # Handle daylight saving times switch
         if date.month == 3 and date.day >= 25 and date.weekday() == 6:  # Check if date is the last sunday of march
-            profile_values.loc['2:15':'3:00'] = 0
+            profile_values[self._dst_slice] = 0
 
         # Adjust index if necessary
         if shift:
             idx = pd.date_range(date, date + datetime.timedelta(1), freq='15T')[:-1]
         else:
             idx = pd.date_range(date, date + datetime.timedelta(1), freq='15T')[1:]
-        profile_values.index = idx
 
-        return profile_values
+        return pd.Series(profile_values, index=idx)
+
+    def calculate_profile_range(self, start: str, end: str, energy_usage: float = 1000, shift=False):
+        """
+        Calculate the default load profile for all days from start to end (inclusive) at once. The result is equal to
+        concatenating the results of calculate_profile for each day, but the season and day type of all days are
+        determined in one vectorized pass.
+
+        :param start: First date of the range
+        :param end: Last date of the range
+        :param energy_usage: Yearly energy usage in kWh, defaults to 1000 kWh if not specified.
+        :param shift: Shift the index by 15 minutes to the left, e.g. 0:00-23:45 instead of 0:15-0:00
+        :return: Pandas series with the default load profile values for the given range
+        """
+        days = pd.date_range(start, end, freq='D')
+        static_values = self._static_lookup[self._season_types(days), self._day_types(days)] * (energy_usage / 1000)
+        factors = self._dynamic_lookup[days.dayofyear - 1]
+        profile_values = np.round(static_values * factors[:, np.newaxis], 1)
+
+        # Handle daylight saving times switch on the last sunday of march
+        dst_switch = (days.month == 3) & (days.day >= 25) & (days.dayofweek == 6)
+        profile_values[dst_switch, self._dst_slice] = 0
+
+        idx = pd.date_range(days[0], days[-1] + datetime.timedelta(1), freq='15T')
+        idx = idx[:-1] if shift else idx[1:]
+        return pd.Series(profile_values.ravel(), index=idx)
+
+    @staticmethod
+    def _season_types(days: pd.DatetimeIndex) -> np.ndarray:
+        """Returns the positions of the seasons in SEASONS for the provided days, see _season_type."""
+        month_day = days.month * 100 + days.day
+        seasons = np.zeros(days.size, dtype=int)  # Winter
+        seasons[((month_day >= 321) & (month_day < 515)) | ((month_day >= 915) & (month_day < 1101))] = 1
+        seasons[(month_day >= 515) & (month_day < 915)] = 2
+        return seasons
+
+    @staticmethod
+    def _day_types(days: pd.DatetimeIndex) -> np.ndarray:
+        """Returns the positions of the day types in DAY_TYPES for the provided days, see _day_type."""
+        holiday_dates = pd.DatetimeIndex(sorted(set().union(*(_holidays(year) for year in set(days.year)))))
+        day_types = np.zeros(days.size, dtype=int)  # Weekday
+        # Saturdays as well as christmas eve and new years eve
+        day_types[(days.dayofweek == 5) | ((days.month == 12) & ((days.day == 24) | (days.day == 31)))] = 1
+        day_types[days.isin(holiday_dates) | (days.dayofweek == 6)] = 2
+        return day_types
 
-    def _static_profile_values(self, date: datetime.date, energy_usage: float) -> pd.Series:
+    def _static_profile_values(self, date: datetime.date, energy_usage: float) -> np.ndarray:
         """Returns the static profile values for the provided day."""
-        values = self._static_lookup.loc[self._season_type(date), self._day_type(date)]
-        values = values.mul(energy_usage / 1000)    # Account for normalization
+        values = self._static_lookup[SEASONS.index(self._season_type(date)), DAY_TYPES.index(self._day_type(date))]
+        values = values * (energy_usage / 1000)    # Account for normalization
         return values
 
-    def _dynamization_factor(self, date: datetime.date) -> pd.Series:
+    def _dynamization_factor(self, date: datetime.date) -> float:
         """Returns the dynamization factor for the provided day."""
-        return self._dynamic_lookup.loc[date.timetuple().tm_yday]['value']
+        return self._dynamic_lookup[date.timetuple().tm_yday - 1]
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def _day_type(d):
         """Returns the type of day according to the default load profile specifications."""
-        if d in holidays.Germany() or d.isoweekday() == 7:
+        if d in _holidays(d.year) or d.isoweekday() == 7:
             return "sunday"
         # Handle christmas eve
         elif d.month == 12 and d.day == 24 and d.weekday() != 6:
@@ -69,6 +155,7 @@ class DefaultLoadProfile:
             return "weekday"
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def _season_type(d):
         """Returns the corresponding season according to the default load profile specifications."""
         if d < datetime.date(d.year, 3, 21):
@@ -1,3 +1,14 @@
-from elv.datahandler import DataHandler
-
-dh = DataHandler()
+def __getattr__(name):
+    """
+    Import the DataHandler and create the shared instance on first access, so that importing elv neither loads pandas
+    nor touches the database, e.g. for the ingestion or before the uWSGI workers are forked.
+    """
+    global DataHandler, dh
+    if name == 'DataHandler':
+        from elv.datahandler import DataHandler
+        return DataHandler
+    if name == 'dh':
+        from elv.datahandler import DataHandler
+        dh = DataHandler()
+        return dh
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
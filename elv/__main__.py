@@ -0,0 +1,113 @@
+import argparse
+import sys
+
+from elv import ingest
+from elv.datahandler import database_path
+
+
+def main():
+    """Run the maintenance commands for the database."""
+    parser = argparse.ArgumentParser(prog='python -m elv',
+                                     description="Maintenance commands of the electric load viewer database.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rollup = subparsers.add_parser('rollup', help="build or update the daily rollup table")
+    rollup.add_argument('meters', nargs='*', help="meters to be updated, defaults to all meters")
+    rollup.add_argument('--rebuild', action='store_true', help="recalculate all days instead of only new ones")
+
+    deviations = subparsers.add_parser('deviations', help="compare the meters with the default load profile")
+    deviations.add_argument('meters', nargs='*', help="meters to be compared, defaults to all meters")
+    deviations.add_argument('--workers', type=int, help="number of worker processes, defaults to the number of CPUs")
+
+    scan = subparsers.add_parser('quality', help="scan the meter values for gaps, duplicates and decreases")
+    scan.add_argument('meters', nargs='*', help="meters to be scanned, defaults to all meters")
+    scan.add_argument('--workers', type=int, help="number of worker processes, defaults to the number of CPUs")
+
+    indexes = subparsers.add_parser('indexes', help="create missing indexes and verify the query plans")
+    indexes.add_argument('--check-only', action='store_true', help="only verify the query plans")
+    indexes.add_argument('--strict', action='store_true', help="exit with an error if a query scans a whole table")
+
+    columnar = subparsers.add_parser('columnar', help="export the meter values to the columnar storage")
+    columnar.add_argument('--output', help="target directory, defaults to ELV_COLUMNAR_DIR or itp.columnar")
+
+    synthetic = subparsers.add_parser('synthetic', help="generate a database with synthetic meter values")
+    synthetic.add_argument('path', help="path of the new database")
+    synthetic.add_argument('--meters', type=int, default=3, help="number of meters, defaults to 3")
+    synthetic.add_argument('--years', type=int, default=1, help="years of meter values per meter, defaults to 1")
+    synthetic.add_argument('--seed', type=int, default=0, help="seed of the random number generator, defaults to 0")
+
+    warmup = subparsers.add_parser('warmup', help="fill the cache for all meters and again after each modification")
+    warmup.add_argument('--once', action='store_true', help="exit after the first warm-up")
+
+    ingestion = subparsers.add_parser('ingest', help="import meter values and meters from CSV files")
+    ingestion.add_argument('readings', nargs='*', type=argparse.FileType('r', encoding='utf-8'),
+                           help="CSV files with the columns zaehler_id, datum_zeit and obis_180")
+    ingestion.add_argument('--meters', type=argparse.FileType('r', encoding='utf-8'),
+                           help="CSV file with the columns zaehler_id, kunde_name, kunde_vorname, plz and ort")
+    ingestion.add_argument('--delimiter', default=',', help="delimiter of the CSV files, defaults to ','")
+    ingestion.add_argument('--batch-size', type=int, default=ingest.BATCH_SIZE,
+                           help=f"rows per transaction, defaults to {ingest.BATCH_SIZE}")
+    ingestion.add_argument('--no-rollup', action='store_true', help="do not update the rollup of the ingested meters")
+
+    args = parser.parse_args()
+    if args.command == 'ingest':
+        run_ingest(args)
+        return
+    elif args.command == 'warmup':
+        import logging
+        from elv.warmup import run
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        run(once=args.once)
+        return
+    elif args.command == 'synthetic':
+        from elv.synthetic import generate_database
+        written = generate_database(args.path, args.meters, args.years, seed=args.seed)
+        print(f"{written} meter values written to {args.path}.")
+        return
+
+    from elv import dh
+    if args.command == 'rollup':
+        written = dh.update_rollup(args.meters or None, rebuild=args.rebuild)
+        print(f"{written} days written to the rollup table.")
+    elif args.command == 'deviations':
+        compared = dh.update_deviations(args.meters or None, workers=args.workers)
+        print(f"{compared} meters compared with the default load profile.")
+    elif args.command == 'quality':
+        scanned = dh.update_quality(args.meters or None, workers=args.workers)
+        print(f"{scanned} meters scanned for data-quality problems.")
+    elif args.command == 'columnar':
+        written = dh.build_columnar_storage(args.output)
+        print(f"{written} meter values written to the columnar storage.")
+    elif args.command == 'indexes':
+        if not args.check_only:
+            for name in dh.ensure_indexes():
+                print(f"Created index {name}.")
+        for name, details in dh.query_plans().items():
+            print(f"{name}: {'; '.join(details)}")
+        if dh.check_query_plans() and args.strict:
+            sys.exit(1)
+
+
+def run_ingest(args):
+    """Run the ingest command and report the progress."""
+    con = ingest.connect(database_path())
+    if args.meters is not None:
+        print(f"{ingest.ingest_meters(con, args.meters, args.delimiter)} meters written.")
+    meter_ids = set()
+    for file in args.readings:
+        result = ingest.ingest_readings(
+            con, file, args.batch_size, args.delimiter,
+            progress=lambda rows, seconds: print(f"{file.name}: {rows} rows read ({rows / seconds:.0f} rows/s)",
+                                                 end='\r', file=sys.stderr))
+        print(f"{file.name}: {result.rows_read} rows read, {result.rows_inserted} inserted, {result.duplicates} "
+              f"duplicates skipped in {result.seconds:.1f} s ({result.rows_per_second:.0f} rows/s)")
+        meter_ids |= result.meter_ids
+    con.close()
+    if meter_ids and not args.no_rollup:
+        from elv import dh
+        written = dh.update_rollup(sorted(meter_ids))
+        print(f"{written} days written to the rollup table.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 import dash
 import dash_bootstrap_components as dbc
 
+from elv import export, metrics
+
 app = dash.Dash(
     __name__,
     meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
     external_stylesheets=[dbc.themes.BOOTSTRAP]
 )
 app.config['suppress_callback_exceptions'] = True
+metrics.init_app(app.server)
+export.init_app(app.server)
@@ -0,0 +1,150 @@
+// Clientside callbacks of the detail view, see update_day_dataset in callbacks.py. The day dataset contains the
+// quarter hour values of the selected day, hourly values and statistics are derived from it in the browser.
+
+function hourlyValues(dateTimes, columns) {
+    // Resample quarter hour values to hours, columns maps each column to its values and aggregation (first or sum)
+    var result = {date_time: []};
+    var names = Object.keys(columns);
+    names.forEach(function (name) {
+        result[name] = [];
+    });
+    dateTimes.forEach(function (dateTime, i) {
+        var label = dateTime.slice(0, 13) + ":00";
+        if (result.date_time[result.date_time.length - 1] !== label) {
+            result.date_time.push(label);
+            names.forEach(function (name) {
+                result[name].push(columns[name].aggregation === "sum" ? 0 : null);
+            });
+        }
+        var last = result.date_time.length - 1;
+        names.forEach(function (name) {
+            var value = columns[name].values[i];
+            if (value === null || value === undefined) {
+                return;
+            }
+            if (columns[name].aggregation === "sum") {
+                result[name][last] += value;
+            } else if (result[name][last] === null) {
+                result[name][last] = value;
+            }
+        });
+    });
+    return result;
+}
+
+function dayValues(dataset, quarter) {
+    // Return the meter values and the default load profile of the day in the requested resolution
+    if (quarter) {
+        return {meter: dataset, profile: {date_time: dataset.profile_date_time, profile: dataset.profile}};
+    }
+    return {
+        meter: hourlyValues(dataset.date_time, {
+            obis_180: {values: dataset.obis_180, aggregation: "first"},
+            diff: {values: dataset.diff, aggregation: "sum"},
+            interpolation: {values: dataset.interpolation, aggregation: "first"},
+            dlp: {values: dataset.dlp, aggregation: "sum"}
+        }),
+        profile: hourlyValues(dataset.profile_date_time, {
+            profile: {values: dataset.profile, aggregation: "sum"}
+        })
+    };
+}
+
+function roundValue(value) {
+    // Round to two decimals like round(value, 2) in Python
+    return value === null ? null : Number(value.toFixed(2));
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    detail: {
+        figure: function (dataset, selector) {
+            if (!dataset || !dataset.date_time) {
+                return {data: [], layout: dataset ? dataset.layout : {}};
+            }
+            var quarter = selector.indexOf("quarter") !== -1;
+            var showMeter = selector.indexOf("meter") !== -1;
+            var unit = quarter ? "15 min" : "60 min";
+            var values = dayValues(dataset, quarter);
+            var day = values.meter;
+
+            var layout = JSON.parse(JSON.stringify(dataset.layout));
+            layout.yaxis.title = {text: "kWh / " + unit};
+            layout.margin.r = showMeter ? 75 : 0;
+
+            // Color interpolation bars if necessary
+            var colors = "#007BFF";
+            if (day.interpolation.some(Boolean)) {
+                colors = day.interpolation.map(function (interpolation) {
+                    return interpolation ? "#EF553B" : "#007BFF";
+                });
+            }
+
+            // Add profile trace
+            var data = [{
+                type: "bar", x: day.date_time, y: day.diff, name: "Lastgang", marker: {color: colors},
+                hovertemplate: "%{y} kWh / " + unit, xaxis: "x", yaxis: "y"
+            }];
+
+            // Add meter value trace
+            if (showMeter) {
+                data.push({
+                    type: "scatter", x: day.date_time, y: day.obis_180, name: "Zählerstand",
+                    line: {color: "#00CC96"}, hovertemplate: "%{y} kWh", xaxis: "x", yaxis: "y2"
+                });
+                layout.yaxis2.title = {text: "kWh"};
+            }
+
+            // Add default load profile trace
+            if (selector.indexOf("dlp") !== -1) {
+                data.push({
+                    type: "bar", x: values.profile.date_time, y: values.profile.profile, name: "Standardlastprofil",
+                    marker: {color: "#B3B8F6"}, hovertemplate: "%{y} kWh / " + unit, xaxis: "x", yaxis: "y"
+                });
+            }
+
+            return {data: data, layout: layout};
+        },
+
+        stats: function (dataset, selector) {
+            if (!dataset || !dataset.date_time) {
+                return ["-", "-", "-", "-"];
+            }
+            var diff = dayValues(dataset, selector.indexOf("quarter") !== -1).meter.diff.filter(function (value) {
+                return value !== null;
+            });
+            if (diff.length === 0) {
+                return ["-", "-", "-", "-"];
+            }
+            var sum = diff.reduce(function (a, b) {
+                return a + b;
+            }, 0);
+            return [roundValue(Math.min.apply(null, diff)), roundValue(Math.max.apply(null, diff)),
+                roundValue(sum / diff.length), roundValue(sum)];
+        },
+
+        table: function (dataset, selector) {
+            if (!dataset || !dataset.date_time) {
+                return null;
+            }
+            var day = dayValues(dataset, selector.indexOf("quarter") !== -1).meter;
+            return day.date_time.map(function (dateTime, i) {
+                return {
+                    date_time: dateTime.slice(-5),  // HH:MM
+                    obis_180: roundValue(day.obis_180[i]),
+                    diff: roundValue(day.diff[i]),
+                    dlp: roundValue(day.dlp[i])
+                };
+            });
+        },
+
+        columns: function (selector) {
+            var unit = selector.indexOf("quarter") !== -1 ? "[kWh / 15 min]" : "[kWh / h]";
+            return [
+                {name: "Zeitpunkt", id: "date_time"},
+                {name: "Zählerstand [kWh]", id: "obis_180"},
+                {name: "Zählervorschub " + unit, id: "diff"},
+                {name: "Standardlastprofil " + unit, id: "dlp"}
+            ];
+        }
+    }
+});
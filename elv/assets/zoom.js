@@ -0,0 +1,33 @@
+// Clientside callbacks debouncing the zoom of the overview and portfolio figures, see change_overview_figure in
+// callbacks.py. Dragging the range slider emits a relayout event per frame, only the last one is sent to the server,
+// so the figure is rebuilt once per zoom instead of on every step of the drag.
+
+var ZOOM_DELAY = 300;  // Milliseconds without a relayout event after which the zoom is finished
+var zoomEvents = {};  // Last relayout event and its time by graph ID
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    zoom: {
+        debounce: function (relayoutData, nIntervals, graphId) {
+            // Called on every relayout event and on every tick of the timer, which runs while a zoom is pending.
+            // Returns the finished relayout event and whether the timer is disabled.
+            var noUpdate = window.dash_clientside.no_update;
+            if (!relayoutData) {
+                return [noUpdate, true];
+            }
+            var event = JSON.stringify(relayoutData);
+            var last = zoomEvents[graphId];
+            if (!last || last.event !== event) {
+                zoomEvents[graphId] = {event: event, time: Date.now(), sent: false};
+                return [noUpdate, false];
+            }
+            if (last.sent) {
+                return [noUpdate, true];
+            }
+            if (Date.now() - last.time < ZOOM_DELAY) {
+                return [noUpdate, noUpdate];
+            }
+            last.sent = true;
+            return [relayoutData, true];
+        }
+    }
+});
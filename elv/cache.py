@@ -0,0 +1,132 @@
+import math
+import os
+import pathlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from flask_caching.backends import FileSystemCache, NullCache
+
+# Maximum number of cached values of small databases, see cache_threshold
+DEFAULT_THRESHOLD = 500
+
+# Number of values cached per meter by the warm-up: metadata, overview and yearly energy usage, see elv.warmup
+ENTRIES_PER_METER = 3
+
+# Share of the cache threshold the warm-up may fill, the rest is left for the values cached by the requests
+CACHE_SHARE = 0.5
+
+
+class DataCache:
+    def __init__(self, backend, threshold=None):
+        """
+        Cache for the results of the DataHandler, counting the hits and misses of the current process.
+
+        :param backend: flask_caching backend storing the values
+        :param threshold: Maximum number of values of the backend before old ones are evicted, None if unlimited
+        """
+        self._backend = backend
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_or_set(self, key, func):
+        """
+        Return the cached value for the given key. If it is not cached yet, it is calculated by calling func and
+        stored afterwards.
+
+        :param key: Cache key
+        :param func: Function without arguments calculating the value
+        :return: The cached or calculated value
+        """
+        value = self._backend.get(key)
+        if value is not None:
+            with self._lock:
+                self._hits += 1
+            return value
+        with self._lock:
+            self._misses += 1
+        value = func()
+        self._backend.set(key, value)
+        return value
+
+    def clear(self):
+        """Remove all cached values."""
+        self._backend.clear()
+
+    def stats(self):
+        """
+        Return the number of cache hits and misses of the current process.
+
+        :return: Dictionary with the keys hits and misses
+        """
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses}
+
+
+class LRUStore:
+    def __init__(self, maxsize):
+        """
+        Dictionary of the values memoized in the current process, see DataHandler._memoize. Once it holds maxsize
+        entries, the least recently used one is removed for each new entry, so the memory of a long-running worker
+        does not grow with the number of requested meters.
+
+        :param maxsize: Maximum number of entries
+        """
+        if maxsize < 1:
+            raise ValueError(f"Invalid size {maxsize}.")
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value of the given key and mark it as recently used, or default if it is not stored."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def cache_threshold(meters):
+    """
+    Return the default cache threshold for a database with the given number of meters: large enough that the warm-up
+    can keep the values of all meters in its share of the cache, but at least DEFAULT_THRESHOLD.
+
+    :param meters: Number of meters in the database
+    :return: Maximum number of cached values
+    """
+    return max(DEFAULT_THRESHOLD, math.ceil(meters * ENTRIES_PER_METER / CACHE_SHARE))
+
+
+def cache_from_env(meters=0):
+    """
+    Return a DataCache configured by the environment variables. By default, the values are stored as files in the
+    directory elv-cache of the temporary directory, so that all uWSGI workers share them.
+
+    ELV_CACHE_TYPE: filesystem (default) or null to disable caching
+    ELV_CACHE_DIR: Directory of the cache files
+    ELV_CACHE_THRESHOLD: Maximum number of cached values before old ones are evicted, defaults to cache_threshold
+    ELV_CACHE_TIMEOUT: Time in seconds after which a value expires, defaults to 3600
+
+    :param meters: Number of meters in the database
+    :return: DataCache instance
+    """
+    if os.environ.get('ELV_CACHE_TYPE', 'filesystem') == 'null':
+        return DataCache(NullCache())
+    cache_dir = os.environ.get('ELV_CACHE_DIR', str(pathlib.Path(tempfile.gettempdir()) / 'elv-cache'))
+    threshold = int(os.environ.get('ELV_CACHE_THRESHOLD', cache_threshold(meters)))
+    return DataCache(FileSystemCache(cache_dir, threshold=threshold,
+                                     default_timeout=int(os.environ.get('ELV_CACHE_TIMEOUT', 3600))), threshold)
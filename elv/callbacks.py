@@ -2,10 +2,21 @@ import re
 from datetime import datetime
 from typing import Optional, Tuple
 
-from dash.dependencies import Input, Output, State
+from dash import callback_context
+from dash.exceptions import PreventUpdate
+from dash.dependencies import ClientsideFunction, Input, Output, State
 
-from elv import figures, dh
+import elv
+from elv import figures, metrics
 from elv.app import app
+from elv.quality import DECREASE, DUPLICATE, GAP
+
+# Labels of the problems found by the data-quality scan and the format of their amount, see MeterScan.problems
+QUALITY_PROBLEMS = {
+    GAP: ("Lücke", "{:.0f} Viertelstunden"),
+    DUPLICATE: ("Doppelter Eintrag", "{:.0f} zusätzliche Einträge"),
+    DECREASE: ("Rückgang des Zählerstands", "{:.3f} kWh")
+}
 
 
 def date_from_range_slider(slider_data: dict) -> Tuple[Optional[datetime], Optional[datetime]]:
@@ -55,19 +66,61 @@ def date_from_str(date_str: str) -> Optional[datetime]:
     return datetime.strptime(date_str, date_fmt)
 
 
+def search_options(search_value, selected):
+    """
+    Return the dropdown options of the meters matching the search value. The selected meters are always included, as
+    the dropdown could not show them otherwise.
+
+    :param search_value: Text entered in the dropdown
+    :param selected: Selected meter ID or list of meter IDs
+    :return: List of options
+    """
+    selected = [selected] if isinstance(selected, str) else list(selected or [])
+    selected = [meter_id for meter_id in selected if meter_id]
+    index = elv.dh.meter_index()
+    options = [{'label': index.label(meter_id), 'value': meter_id} for meter_id in selected]
+    options.extend({'label': label, 'value': meter_id} for meter_id, label in elv.dh.search_meters(search_value)
+                   if meter_id not in selected)
+    return options
+
+
+@app.callback(Output('meter-selector', 'options'),
+              [Input('meter-selector', 'search_value')],
+              [State('meter-selector', 'value')])
+@metrics.timed_callback
+def search_meter_options(search_value, meter):
+    """Show the meters matching the entered text."""
+    if not search_value:
+        raise PreventUpdate  # Keep the options, e.g. after a meter was selected
+    return search_options(search_value, meter)
+
+
+@app.callback(Output('portfolio-selector', 'options'),
+              [Input('portfolio-selector', 'search_value')],
+              [State('portfolio-selector', 'value')])
+@metrics.timed_callback
+def search_portfolio_options(search_value, meter_ids):
+    """Show the meters matching the entered text in addition to the selected ones."""
+    if not search_value:
+        raise PreventUpdate
+    return search_options(search_value, meter_ids)
+
+
 @app.callback(Output('user-info', 'children'),
               [Input('meter-selector', 'value')])
+@metrics.timed_callback
 def update_user_info(meter_id):
     """Show information of selected user."""
     if meter_id == '':
         return "Bitte einen Zählpunkt auswählen..."
-    m = dh.meter_info(meter_id)
+    m = elv.dh.metadata(meter_id).info
     return f"{m[1]} {m[0]}, {m[2]} {m[3]}"  # First name, last name, City, PLZ
 
 
 @app.callback(Output('content', 'style'),
               [Input('select-meter', 'n_clicks')],
               [State('meter-selector', 'value')])
+@metrics.timed_callback
 def change_overview_visibility(n_clicks, meter):
     """Show graph is meter is selected."""
     if n_clicks is None or meter == '':
@@ -76,14 +129,101 @@ def change_overview_visibility(n_clicks, meter):
         return {'display': 'block'}  # Show graph
 
 
+# The relayout events of the zoomable figures are debounced in the browser, see assets/zoom.js. The store of a figure
+# receives the relayout event of a finished zoom, so the figure is not rebuilt while the range slider is dragged.
+for graph in ('overview', 'portfolio'):
+    app.clientside_callback(
+        ClientsideFunction(namespace='zoom', function_name='debounce'),
+        [Output(f'{graph}-zoom', 'data'),
+         Output(f'{graph}-zoom-timer', 'disabled')],
+        [Input(f'graph-{graph}', 'relayoutData'),
+         Input(f'{graph}-zoom-timer', 'n_intervals')],
+        [State(f'graph-{graph}', 'id')]
+    )
+
+
 @app.callback(Output('graph-overview', 'figure'),
-              [Input('select-meter', 'n_clicks')],
+              [Input('select-meter', 'n_clicks'),
+               Input('overview-zoom', 'data')],
               [State('meter-selector', 'value')])
-def change_overview_figure(n_clicks, meter):
-    """Show overview figure."""
+@metrics.timed_callback
+def change_overview_figure(n_clicks, relayout_data, meter):
+    """Show overview figure, with a higher resolution for the visible interval when zoomed in."""
     if n_clicks is None or meter == '':
         return figures.empty_graph()
-    return figures.overview_figure(meter)
+    start_date, end_date = None, None
+    if callback_context.triggered[0]['prop_id'] == 'overview-zoom.data':
+        start_date, end_date = date_from_range_slider(relayout_data)
+        if start_date is None and not relayout_data.get('xaxis.autorange'):
+            raise PreventUpdate  # Neither zoomed in nor out
+    return figures.overview_figure(meter, start_date, end_date)
+
+
+@app.callback(Output('graph-portfolio', 'figure'),
+              [Input('portfolio-selector', 'value'),
+               Input('portfolio-zoom', 'data')])
+@metrics.timed_callback
+def change_portfolio_figure(meter_ids, relayout_data):
+    """Show the load profile summed over the selected meters, zoomed in like the overview figure."""
+    if not meter_ids:
+        return figures.empty_graph()
+    start_date, end_date = None, None
+    if callback_context.triggered[0]['prop_id'] == 'portfolio-zoom.data':
+        start_date, end_date = date_from_range_slider(relayout_data)
+        if start_date is None and not relayout_data.get('xaxis.autorange'):
+            raise PreventUpdate  # Neither zoomed in nor out
+    return figures.portfolio_figure(meter_ids, start_date, end_date)
+
+
+@app.callback(Output('quality-info', 'children'),
+              [Input('select-meter', 'n_clicks')],
+              [State('meter-selector', 'value')])
+@metrics.timed_callback
+def update_quality_info(n_clicks, meter):
+    """Show the result of the data-quality scan of the selected meter."""
+    if n_clicks is None or meter == '':
+        return ''
+    summary = elv.dh.data_quality(meter)
+    if summary is None:
+        return "Datenqualität: noch nicht geprüft."
+    last = summary.last_time[:10] if summary.last_time else '-'
+    return (f"Datenqualität der Werte bis {last}: {summary.gaps} Lücken mit {summary.missing_quarter_hours} "
+            f"interpolierten Viertelstunden (längste: {summary.longest_gap}), "
+            f"{summary.duplicates} doppelte Einträge, {summary.decreases} Rückgänge des Zählerstands, "
+            f"{summary.off_grid} Einträge außerhalb des Rasters.")
+
+
+@app.callback(Output('quality-table', 'data'),
+              [Input('overview-zoom', 'data'),
+               Input('select-meter', 'n_clicks')],
+              [State('meter-selector', 'value')])
+@metrics.timed_callback
+def update_quality_table(relayout_data, n_clicks, meter):
+    """Show the problems found by the data-quality scan in the visible interval of the overview figure."""
+    if n_clicks is None or meter == '':
+        return []
+    summary = elv.dh.data_quality(meter)
+    if summary is None or summary.first_time is None:
+        return []
+    start_date, end_date = date_from_range_slider(relayout_data)
+    problems = elv.dh.data_problems(meter, start_date or summary.first_time, end_date or summary.last_time)
+    return [{'kind': QUALITY_PROBLEMS[kind][0], 'start_time': start_time[:16], 'end_time': end_time[:16],
+             'amount': QUALITY_PROBLEMS[kind][1].format(amount)}
+            for kind, start_time, end_time, amount in problems.itertuples(index=False)]
+
+
+@app.callback([Output('deviation-table', 'data'),
+               Output('deviation-year', 'options')],
+              [Input('deviation-year', 'value')])
+@metrics.timed_callback
+def update_deviation_table(year):
+    """Show the deviations of all meters from the default load profile in the selected or the last year."""
+    years = elv.dh.deviation_years()
+    options = [{'label': y, 'value': y} for y in reversed(years)]
+    if not years:
+        return [], options
+    df = elv.dh.deviations(year or years[-1])
+    return df.round({'rmse': 3, 'peak_ratio': 2, 'energy_delta': 1}).to_dict('records'), options
 
 
 @app.callback([Output('date-picker-single', 'initial_visible_month'),
@@ -91,106 +231,83 @@ def change_overview_figure(n_clicks, meter):
                Output('date-picker-single', 'max_date_allowed')],
               [Input('select-meter', 'n_clicks')],
               [State('meter-selector', 'value')])
+@metrics.timed_callback
 def update_date_picker_limits(n_clicks, meter):
     """Update date picker according to selection in overview figure."""
     if n_clicks is None or meter == '':
         return None, None, None
-    return dh.last_date(meter), dh.first_date(meter), dh.last_date(meter)
+    metadata = elv.dh.metadata(meter)
+    return metadata.last_date, metadata.first_date, metadata.last_date
 
 
 @app.callback([Output('min-span-overview', 'children'),
                Output('max-span-overview', 'children'),
                Output('mean-span-overview', 'children'),
                Output('sum-span-overview', 'children')],
-              [Input('graph-overview', 'relayoutData'),
+              [Input('overview-zoom', 'data'),
                Input('select-meter', 'n_clicks')],
               [State('meter-selector', 'value')])
+@metrics.timed_callback
 def update_stats_overview(relayout_data, n_clicks, meter):
     """Update the overview statistics."""
     if n_clicks is None or meter == '':
         return '-', '-', '-', '-'
     start_date, end_date = date_from_range_slider(relayout_data)
-    df = dh.overview(meter, start_date, end_date)
-    return round(float(df['diff'].min()), 2), round(float(df['diff'].max()), 2), \
-           round(float(df['diff'].mean()), 2), round(float(df['diff'].sum()), 2)
+    return elv.dh.overview_stats(meter, start_date, end_date)
 
 
 @app.callback(Output('date-picker-single', 'date'),
               [Input('graph-overview', 'clickData')],
               [State('meter-selector', 'value')])
+@metrics.timed_callback
 def display_click_data(click_data, meter):
     """Change the date-picker-single date to the date selected on the overview graph."""
     if meter == '':
         return None
     elif not click_data:
-        return dh.last_date(meter)
+        return elv.dh.metadata(meter).last_date
     else:
-        return click_data['points'][0]['x']
+        return click_data['points'][0]['x'][:10]  # Date of the clicked day or quarter hour
 
 
-@app.callback(Output('graph-detail', 'figure'),
-              [Input('date-picker-single', 'date'),
-               Input('detail-toggle', 'value')],
-              [State('meter-selector', 'value')])
-def update_detail_graph(date, selector, meter):
-    """Update the detail graph."""
-    if meter == '':
-        return figures.empty_graph()
-    m = True if 'meter' in selector else False
-    q = True if 'quarter' in selector else False
-    d = True if 'dlp' in selector else False
-    return figures.detail_figure(meter, date, quarter=q, meter=m, default_load_profile=d)
-
-
-@app.callback([Output('min-span-detail', 'children'),
-               Output('max-span-detail', 'children'),
-               Output('mean-span-detail', 'children'),
-               Output('sum-span-detail', 'children')],
-              [Input('date-picker-single', 'date'),
-               Input('detail-toggle', 'value')],
+@app.callback(Output('day-dataset', 'data'),
+              [Input('date-picker-single', 'date')],
               [State('meter-selector', 'value')])
-def update_detail_stats(date, selector, meter):
-    """Update the detail statistics."""
-    if meter == '':
-        return '-', '-', '-', '-'
-    df = dh.day(meter, date)
-    if 'quarter' in selector:
-        rule = '15T'
-    else:
-        rule = '60T'
-    df = df.resample(rule).agg({'obis_180': 'first', 'diff': 'sum', 'interpolation': 'first'})
-    return round(float(df['diff'].min()), 2), round(float(df['diff'].max()), 2), \
-           round(float(df['diff'].mean()), 2), round(float(df['diff'].sum()), 2)
+@metrics.timed_callback
+def update_day_dataset(date, meter):
+    """Send the data of the selected day to the browser, which updates the detail graph, statistics and table."""
+    if meter == '' or date is None:
+        return {'layout': figures.empty_graph()['layout']}
+    return figures.day_dataset(meter, date)
 
 
-@app.callback(Output('table', 'data'),
-              [Input('date-picker-single', 'date'),
-               Input('detail-toggle', 'value')],
-              [State('meter-selector', 'value')])
-def update_table_data(date, selector, meter):
-    """Update the detail table."""
-    if meter == '':
-        return
-    q = True if 'quarter' in selector else False
-    return figures.table_data(meter, date, quarter=q)
-
-
-@app.callback(Output('table', 'columns'),
-              [Input('detail-toggle', 'value')])
-def update_table_heading(selector):
-    """Update the detail table."""
-    return [
-        {
-            'name': "Zeitpunkt",
-            'id': 'date_time'
-        }, {
-            'name': "Zählerstand [kWh]",
-            'id': 'obis_180'
-        }, {
-            'name': f"Zählervorschub {'[kWh / 15 min]' if 'quarter' in selector else '[kWh / h]'}",
-            'id': 'diff'
-        }, {
-            'name': f"Standardlastprofil {'[kWh / 15 min]' if 'quarter' in selector else '[kWh / h]'}",
-            'id': 'dlp'
-        }
-    ]
+# The detail view is derived from the day dataset in the browser, see assets/detail.js
+app.clientside_callback(
+    ClientsideFunction(namespace='detail', function_name='figure'),
+    Output('graph-detail', 'figure'),
+    [Input('day-dataset', 'data'),
+     Input('detail-toggle', 'value')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='detail', function_name='stats'),
+    [Output('min-span-detail', 'children'),
+     Output('max-span-detail', 'children'),
+     Output('mean-span-detail', 'children'),
+     Output('sum-span-detail', 'children')],
+    [Input('day-dataset', 'data'),
+     Input('detail-toggle', 'value')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='detail', function_name='table'),
+    Output('table', 'data'),
+    [Input('day-dataset', 'data'),
+     Input('detail-toggle', 'value')]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='detail', function_name='columns'),
+    Output('table', 'columns'),
+    [Input('detail-toggle', 'value')]
+)
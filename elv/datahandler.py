@@ -1,26 +1,587 @@
+import concurrent.futures
+import functools
+import json
 import os
 import pathlib
 import sqlite3
+import re
+import threading
+import time
+import warnings
+from typing import List, NamedTuple, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import arrow
+from pandas.tseries.frequencies import to_offset
+
+from elv import deviation, metrics, quality
+from elv.cache import LRUStore, cache_from_env
+from elv.meterindex import MeterIndex
+from elv.rangestats import RangeStatistics
+from elv.storage import MANIFEST_FILE, ColumnarStorage, Storage, write_columnar
+
+# Number of meter values read at once by DataHandler.iter_interval
+EXPORT_CHUNK_SIZE = 10000
+
+# Number of meters whose metadata, yearly energy usage and data quality are kept in memory by each process, see
+# DataHandler._memoize
+MEMO_SIZE = 1024
+
+# Number of meters whose RangeStatistics are kept in memory by each process, see DataHandler.range_statistics
+RANGE_STATISTICS_SIZE = 64
+
+# Maximum number of meters returned by DataHandler.search_meters
+MAX_SEARCH_RESULTS = 20
+
+# Pragmas applied to every pooled connection, tuned for a read-mostly workload. They can be overridden with the
+# pragmas argument of DataHandler or the ELV_SQLITE_PRAGMAS environment variable, e.g. "mmap_size=0,cache_size=-2000".
+DEFAULT_PRAGMAS = {
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -16384,    # 16 MiB, negative values are interpreted as KiB by SQLite
+    'temp_store': 'MEMORY',
+    'query_only': 'ON',
+}
+
+# Daily rollup of zaehlwerte and the resulting yearly energy usage, see DataHandler.update_rollup
+ROLLUP_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS tageswerte (
+        zaehler_id TEXT NOT NULL,
+        datum TEXT NOT NULL,
+        obis_180 REAL,
+        diff REAL,
+        interpolation INTEGER NOT NULL,
+        PRIMARY KEY (zaehler_id, datum)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS jahresverbrauch (
+        zaehler_id TEXT NOT NULL PRIMARY KEY,
+        verbrauch REAL NOT NULL
+    ) WITHOUT ROWID;
+    """,
+]
+
+# Deviations of the meters from their default load profile per day and year, see DataHandler.update_deviations
+DEVIATION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS tagesabweichung (
+        zaehler_id TEXT NOT NULL,
+        datum TEXT NOT NULL,
+        rmse REAL,
+        peak_ratio REAL,
+        energy_delta REAL,
+        quarter_hours INTEGER NOT NULL,
+        PRIMARY KEY (zaehler_id, datum)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS jahresabweichung (
+        zaehler_id TEXT NOT NULL,
+        jahr TEXT NOT NULL,
+        rmse REAL,
+        peak_ratio REAL,
+        energy_delta REAL,
+        quarter_hours INTEGER NOT NULL,
+        PRIMARY KEY (zaehler_id, jahr)
+    ) WITHOUT ROWID;
+    """,
+    "CREATE INDEX IF NOT EXISTS jahresabweichung_jahr_rmse ON jahresabweichung (jahr, rmse);",
+]
+
+# Data-quality scan of the meter values, see DataHandler.update_quality. The problems of each meter (gaps, duplicate
+# points in time and decreasing meter values) are stored in datenfehler, their counts in datenqualitaet.
+QUALITY_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS datenqualitaet (
+        zaehler_id TEXT NOT NULL PRIMARY KEY,
+        row_count INTEGER NOT NULL,
+        first_time TEXT,
+        last_time TEXT,
+        gaps INTEGER NOT NULL,
+        missing_quarter_hours INTEGER NOT NULL,
+        longest_gap INTEGER NOT NULL,
+        duplicates INTEGER NOT NULL,
+        decreases INTEGER NOT NULL,
+        off_grid INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS datenfehler (
+        zaehler_id TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (zaehler_id, start_time, kind)
+    ) WITHOUT ROWID;
+    """,
+]
+
+# Indexes required by the queries below, see DataHandler.ensure_indexes
+INDEX_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS zaehlwerte_zaehler_id_datum_zeit ON zaehlwerte (zaehler_id, datum_zeit, obis_180);",
+    "CREATE INDEX IF NOT EXISTS zaehlpunkte_zaehler_id ON zaehlpunkte (zaehler_id);",
+]
+
+# Tables of the meter data, created by the ingestion if necessary, see elv.ingest
+TABLE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS zaehlpunkte (zaehler_id TEXT, kunde_name TEXT, kunde_vorname TEXT, plz TEXT, "
+    "ort TEXT);",
+    "CREATE TABLE IF NOT EXISTS zaehlwerte (zaehler_id TEXT, datum_zeit TEXT, obis_180 REAL);",
+]
+
+# Unique indexes enforcing a single entry per meter and point in time, the read path skips the removal of duplicate
+# entries if they exist
+UNIQUE_READINGS_INDEX = 'zaehlwerte_zaehler_id_datum_zeit_unique'
+UNIQUE_INDEX_SCHEMA = [
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_READINGS_INDEX} ON zaehlwerte (zaehler_id, datum_zeit);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS zaehlpunkte_zaehler_id_unique ON zaehlpunkte (zaehler_id);",
+]
+
+# All queries of the DataHandler, kept in one place to be able to verify their query plans
+QUERIES = {
+    'meters_in_database': "SELECT zaehler_id FROM zaehlpunkte;",
+    'meter_index': "SELECT zaehler_id, kunde_name, kunde_vorname, plz, ort FROM zaehlpunkte;",
+    'metadata': "SELECT kunde_name, kunde_vorname, plz, ort, "
+                "(SELECT date(datum_zeit) FROM zaehlwerte WHERE zaehler_id = ?1 ORDER BY datum_zeit LIMIT 1), "
+                "(SELECT date(datum_zeit) FROM zaehlwerte WHERE zaehler_id = ?1 ORDER BY datum_zeit DESC LIMIT 1), "
+                "(SELECT count(*) FROM zaehlwerte WHERE zaehler_id = ?1), "
+                "(SELECT group_concat(DISTINCT strftime('%Y-%m', datum_zeit)) FROM zaehlwerte WHERE zaehler_id = ?1) "
+                "FROM zaehlpunkte WHERE zaehler_id = ?1;",
+    'day': "SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE datum_zeit BETWEEN (?) AND (?) AND zaehler_id = (?);",
+    'overview': "SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE time(datum_zeit) = '00:00:00' "
+                "AND zaehler_id = (?);",
+    'readings_version': "SELECT max(rowid), count(*) FROM zaehlwerte;",
+    'table_exists': "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = (?);",
+    'index_exists': "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = (?);",
+    'rollup_overview': "SELECT datum, obis_180, interpolation, diff FROM tageswerte WHERE zaehler_id = (?) "
+                       "ORDER BY datum;",
+    'rollup_tail': "SELECT datum, obis_180, interpolation, diff FROM tageswerte WHERE zaehler_id = (?) "
+                   "ORDER BY datum DESC LIMIT 366;",
+    'yearly_energy_usage': "SELECT verbrauch FROM jahresverbrauch WHERE zaehler_id = (?);",
+    'rollup_anchor': "SELECT max(datum) FROM tageswerte WHERE zaehler_id = (?) AND interpolation = 0;",
+    'readings': "SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE zaehler_id = (?) ORDER BY datum_zeit;",
+    'export_readings': "SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE zaehler_id = (?) "
+                       "AND datum_zeit BETWEEN (?) AND (?) ORDER BY datum_zeit;",
+    'rollup_source': "SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE zaehler_id = (?) AND datum_zeit >= (?) "
+                     "AND time(datum_zeit) = '00:00:00';",
+    'quality': "SELECT row_count, first_time, last_time, gaps, missing_quarter_hours, longest_gap, duplicates, "
+               "decreases, off_grid FROM datenqualitaet WHERE zaehler_id = (?);",
+    'quality_problems': "SELECT kind, start_time, end_time, amount FROM datenfehler "
+                        "WHERE zaehler_id = ?1 AND start_time <= ?3 AND end_time >= ?2 ORDER BY start_time;",
+    'deviation_years': "SELECT DISTINCT jahr FROM jahresabweichung ORDER BY jahr;",
+    'deviation_ranking': "SELECT zaehler_id, rmse, peak_ratio, energy_delta, quarter_hours FROM jahresabweichung "
+                         "WHERE jahr = (?) ORDER BY rmse DESC;",
+    'deviation_days': "SELECT datum, rmse, peak_ratio, energy_delta, quarter_hours FROM tagesabweichung "
+                      "WHERE zaehler_id = (?) AND datum BETWEEN (?) AND (?) ORDER BY datum;",
+    # The meter IDs of the portfolio queries are passed as a JSON array, so the queries stay the same for any number
+    # of meters
+    'portfolio_readings': "SELECT zaehler_id, datum_zeit, obis_180 FROM zaehlwerte "
+                          "WHERE zaehler_id IN (SELECT value FROM json_each(?1)) AND datum_zeit BETWEEN ?2 AND ?3 "
+                          "ORDER BY zaehler_id, datum_zeit;",
+    'portfolio_overview': "SELECT zaehler_id, datum_zeit, obis_180 FROM zaehlwerte "
+                          "WHERE zaehler_id IN (SELECT value FROM json_each(?1)) AND time(datum_zeit) = '00:00:00' "
+                          "ORDER BY zaehler_id, datum_zeit;",
+    'rollup_missing': "SELECT value FROM json_each(?1) "
+                      "WHERE NOT EXISTS (SELECT 1 FROM tageswerte WHERE zaehler_id = value);",
+    'rollup_portfolio': "SELECT datum, sum(diff) AS diff, max(interpolation) AS interpolation, count(diff) AS meters "
+                        "FROM tageswerte WHERE zaehler_id IN (SELECT value FROM json_each(?1)) "
+                        "GROUP BY datum ORDER BY datum;",
+}
+
+# Queries that are expected to read a whole table
+FULL_SCAN_QUERIES = {'meters_in_database', 'meter_index', 'readings_version', 'table_exists', 'index_exists',
+                     'deviation_years'}
+
+
+def read_query(con, name, params=(), **kwargs) -> pd.DataFrame:
+    """Run the query with the given name with pandas and record its duration and number of rows, see elv.metrics."""
+    start = time.perf_counter()
+    df = pd.read_sql_query(QUERIES[name], con, params=params, **kwargs)
+    metrics.observe_query(name, time.perf_counter() - start, len(df))
+    return df
+
+
+def execute_query(con, name, params=()) -> list:
+    """Run the query with the given name and record its duration and number of rows, see elv.metrics."""
+    start = time.perf_counter()
+    rows = con.execute(QUERIES[name], params).fetchall()
+    metrics.observe_query(name, time.perf_counter() - start, len(rows))
+    return rows
+
+
+# DataHandler of a worker process of DataHandler._map_meters
+_worker_dh = None
+
+
+def _init_worker(db_path):
+    """Create the DataHandler of a worker process."""
+    global _worker_dh
+    _worker_dh = DataHandler(db_path=db_path)
+
+
+def _run_worker(func, meter_id):
+    """Return the meter ID and func(DataHandler, meter_id) in a worker process, ValueErrors are returned as well."""
+    try:
+        return meter_id, func(_worker_dh, meter_id)
+    except ValueError as e:  # E.g. a meter without any values
+        return meter_id, e
+
+
+class MeterMetadata(NamedTuple):
+    """Static information of a meter, see DataHandler.metadata."""
+    meter_id: str
+    info: Tuple[str, str, str, str]  # kunde_name, kunde_vorname, plz, ort
+    first_date: Optional[str]
+    last_date: Optional[str]
+    row_count: int
+    available_months: List[str]
+    available_years: List[str]
+
+
+class ConnectionPool:
+    def __init__(self, db_path, pragmas=None):
+        """
+        Pool of read-only SQLite connections with one persistent connection per thread.
+
+        uWSGI loads the application in the master process before forking the workers, so connections opened there
+        must not be shared with the children. Whenever the pool is accessed from a new process, the inherited
+        connections are discarded and new ones are opened on demand.
+
+        :param db_path: Path to the SQLite database
+        :param pragmas: Dictionary with pragmas applied to each new connection
+        """
+        self._uri = pathlib.Path(db_path).resolve().as_uri() + '?mode=ro'
+        self._pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        for name, value in self._pragmas.items():
+            if not name.isidentifier() or not str(value).lstrip('-').isalnum():
+                raise ValueError(f"Invalid pragma {name}={value}.")
+        self._lock = threading.Lock()
+        self._inherited = []
+        self._local = None
+        self._reset()
+
+    def _reset(self):
+        """Forget all connections, e.g. after the process has been forked."""
+        # Keep a reference to inherited connections, closing them in the child could interfere with the parent process
+        self._inherited.append(self._local)
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._opened = 0
+        self._reused = 0
+        self._changes = 0
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return the connection of the calling thread, opening it first if necessary.
+
+        :return: Read-only SQLite connection
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        con = getattr(self._local, 'connection', None)
+        if con is not None:
+            with self._lock:
+                self._reused += 1
+            return con
+        con = sqlite3.connect(self._uri, uri=True)
+        for name, value in self._pragmas.items():
+            con.execute(f"PRAGMA {name} = {value};")
+        self._local.connection = con
+        with self._lock:
+            self._opened += 1
+        return con
+
+    def changes(self):
+        """
+        Return a counter that is incremented whenever a connection of the pool notices that the database was modified
+        by another connection since its last check, according to PRAGMA data_version.
+
+        :return: Number of noticed modifications in the current process
+        """
+        version = self.connection().execute("PRAGMA data_version;").fetchone()[0]
+        if getattr(self._local, 'data_version', version) != version:
+            with self._lock:
+                self._changes += 1
+        self._local.data_version = version
+        return self._changes
+
+    def stats(self):
+        """
+        Return the usage statistics of the pool in the current process.
+
+        :return: Dictionary with the keys pid, opened and reused
+        """
+        with self._lock:
+            return {'pid': self._pid, 'opened': self._opened, 'reused': self._reused}
+
+
+def pragmas_from_env():
+    """
+    Return the default pragmas updated with the ones set in the ELV_SQLITE_PRAGMAS environment variable.
+
+    :return: Dictionary with pragma names and values
+    """
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for item in os.environ.get('ELV_SQLITE_PRAGMAS', '').split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            pragmas[name.strip()] = value.strip()
+    return pragmas
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, pool: ConnectionPool):
+        """
+        Storage reading the meter values from the database, see Storage.
+
+        :param pool: ConnectionPool of the database
+        """
+        self._pool = pool
+
+    def readings(self, meter_id, start, end):
+        return read_query(self._pool.connection(), 'day', [start, end, meter_id], parse_dates='datum_zeit')
+
+    def daily_readings(self, meter_id):
+        return read_query(self._pool.connection(), 'overview', [meter_id], parse_dates='datum_zeit')
+
+    def rollup_overview(self, meter_id):
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['tageswerte']):
+            return None
+        df = read_query(con, 'rollup_overview', [meter_id], parse_dates='datum')
+        if df.empty:
+            return None
+        df = df.set_index('datum').asfreq('D')
+        df.index.name = None
+        df['interpolation'] = df['interpolation'].astype(bool)
+        df['date_time'] = df.index
+        return df
+
+    def iter_readings(self, meter_id, start, end, chunk_size):
+        begin, rows = time.perf_counter(), 0
+        cursor = self._pool.connection().execute(QUERIES['export_readings'], [meter_id, start, end])
+        try:
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                rows += len(chunk)
+                df = pd.DataFrame.from_records(chunk, columns=['datum_zeit', 'obis_180'])
+                df['datum_zeit'] = pd.to_datetime(df['datum_zeit'])
+                yield df
+        finally:
+            cursor.close()
+            # Includes the time spent by the consumer between the chunks
+            metrics.observe_query('export_readings', time.perf_counter() - begin, rows)
+
+    def portfolio_readings(self, meter_ids, start, end):
+        return read_query(self._pool.connection(), 'portfolio_readings', [json.dumps(sorted(meter_ids)), start, end],
+                          parse_dates='datum_zeit')
+
+    def portfolio_daily_readings(self, meter_ids):
+        return read_query(self._pool.connection(), 'portfolio_overview', [json.dumps(sorted(meter_ids))],
+                          parse_dates='datum_zeit')
+
+    def rollup_portfolio(self, meter_ids):
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['tageswerte']):
+            return None
+        meters = json.dumps(sorted(meter_ids))
+        if execute_query(con, 'rollup_missing', [meters]):
+            return None
+        df = read_query(con, 'rollup_portfolio', [meters], parse_dates='datum')
+        if df.empty:
+            return None
+        df = df.set_index('datum').asfreq('D')
+        df.index.name = None
+        df['interpolation'] = df['interpolation'].fillna(0).astype(bool)
+        df['meters'] = df['meters'].fillna(0).astype(int)
+        df['date_time'] = df.index
+        return df
+
+    def unique_readings(self):
+        return bool(execute_query(self._pool.connection(), 'index_exists', [UNIQUE_READINGS_INDEX]))
+
+
+def storage_from_env():
+    """
+    Return the directory of the columnar storage if it is enabled by setting the ELV_STORAGE environment variable to
+    "columnar". The directory defaults to itp.columnar next to the database and can be set with ELV_COLUMNAR_DIR.
+
+    :return: Path of the directory or None if the SQLite storage is used
+    """
+    storage_type = os.environ.get('ELV_STORAGE', 'sqlite')
+    if storage_type == 'sqlite':
+        return None
+    elif storage_type == 'columnar':
+        return columnar_path()
+    raise ValueError(f"Unknown storage type {storage_type}.")
+
+
+def columnar_path():
+    """Return the directory of the columnar storage, see storage_from_env."""
+    return pathlib.Path(os.environ.get('ELV_COLUMNAR_DIR', database_path().with_name('itp.columnar')))
+
+
+def database_path():
+    """
+    Return the path of the database, which is located in the root project directory and named itp.db unless another
+    path is set with the ELV_DATABASE environment variable.
+
+    :return: Path of the database file
+    """
+    if os.environ.get('ELV_DATABASE'):
+        return pathlib.Path(os.environ['ELV_DATABASE'])
+    database_filename = "itp.db"
+    if os.environ.get('DOCKER_CONTAINER', False):
+        return pathlib.Path('/app') / database_filename
+    p = pathlib.Path(os.path.realpath(__file__)).parent
+    return p / '..' / database_filename
+
+
+def _portfolio(meter_ids):
+    """Return the sorted unique meter IDs of a portfolio, so the same portfolio always results in the same queries."""
+    meter_ids = sorted(set(meter_ids or []))
+    if not meter_ids:
+        raise ValueError("No meters selected.")
+    return meter_ids
 
 
 class DataHandler:
-    def __init__(self):
+    def __init__(self, pragmas=None, cache=None, db_path=None):
         """
         Class to retrieve and prepare the meter data for later use in the callbacks. The database must be located in
         the root project directory and with the name itp.db.
+
+        :param pragmas: Pragmas for the database connections, defaults to DEFAULT_PRAGMAS and ELV_SQLITE_PRAGMAS
+        :param cache: DataCache for the DataFrames of day and overview, configured by the environment and sized for the
+            meters in the database if not specified
+        :param db_path: Path of the database, defaults to database_path
         """
         # Setup database
-        database_filename = "itp.db"
-        if os.environ.get('DOCKER_CONTAINER', False):
-            self._db_path = pathlib.Path('/app') / database_filename
-        else:
-            p = pathlib.Path(os.path.realpath(__file__)).parent
-            self._db_path = p / '..' / database_filename
+        self._db_path = database_path() if db_path is None else pathlib.Path(db_path)
         if not self._db_path.exists():
             raise ValueError("Database file not found.")
+        self._pool = ConnectionPool(self._db_path, pragmas_from_env() if pragmas is None else pragmas)
+        self._metadata = LRUStore(MEMO_SIZE)
+        self._range_statistics = LRUStore(RANGE_STATISTICS_SIZE)
+        self._yearly_energy_usage = LRUStore(MEMO_SIZE)
+        self._schema = LRUStore(MEMO_SIZE)
+        self._meter_index = LRUStore(MEMO_SIZE)
+        self._quality = LRUStore(MEMO_SIZE)
+        self._sqlite = SQLiteStorage(self._pool)
+        self._columnar_path = storage_from_env()
+        self._columnar = None
+        self._columnar_modified = None
+        self.cache = cache_from_env(len(self.meters_in_database())) if cache is None else cache
+
+    def storage(self) -> Storage:
+        """
+        Return the storage of the meter values. The columnar storage is used if it is enabled and was built from the
+        current meter values, see readings_version, otherwise the values are read from the database.
+
+        :return: ColumnarStorage or SQLiteStorage
+        """
+        if self._columnar_path is None:
+            return self._sqlite
+        try:
+            modified = (self._columnar_path / MANIFEST_FILE).stat().st_mtime_ns
+        except FileNotFoundError:
+            modified = None
+        if modified is None:
+            self._columnar = None
+        elif self._columnar is None or self._columnar_modified != modified:
+            self._columnar, self._columnar_modified = ColumnarStorage(self._columnar_path), modified
+        if self._columnar is not None and self._columnar.version == self.readings_version():
+            return self._columnar
+        warnings.warn("The columnar storage is missing or outdated, the database is used instead. "
+                      "Run python -m elv columnar to build it.", RuntimeWarning)
+        return self._sqlite
+
+    def connection_stats(self):
+        """
+        Return how often connections were opened and reused by the current process.
+
+        :return: Dictionary with the keys pid, opened and reused
+        """
+        return self._pool.stats()
+
+    def data_version(self):
+        """
+        Return a string that changes whenever the database file is modified. As it is based on the modification times
+        and sizes of the database and its write-ahead log, it is the same for all processes.
+
+        :return: Version string
+        """
+        version = []
+        for path in (self._db_path, self._db_path.with_name(self._db_path.name + '-wal')):
+            try:
+                stat = path.stat()
+                version.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+            except FileNotFoundError:
+                version.append('-')
+        return '/'.join(version)
+
+    def readings_version(self):
+        """
+        Return a string that changes whenever meter values are added to or removed from zaehlwerte, based on the
+        largest rowid and the number of rows. Unlike data_version, it does not change when other tables are written,
+        e.g. by update_rollup. It is queried again only after the database was modified.
+
+        :return: Version string
+        """
+        return self._memoize(self._schema, 'readings_version',
+                             lambda _: '{}:{}'.format(*execute_query(self._pool.connection(), 'readings_version')[0]))
+
+    def metadata(self, meter_id) -> MeterMetadata:
+        """
+        Return the metadata of the given meter. It is queried once and kept in memory and in the cache until the
+        database is modified.
+
+        :param meter_id: The ID of the meter to be queried
+        :return: MeterMetadata of the meter
+        """
+        return self._memoize(self._metadata, meter_id, lambda m: self._shared('metadata', m, self._query_metadata))
+
+    def _query_metadata(self, meter_id):
+        """Query the MeterMetadata returned by metadata."""
+        res = next(iter(execute_query(self._pool.connection(), 'metadata', [meter_id])), None)
+        if res is None:
+            raise ValueError(f"Meter {meter_id} not found.")
+        months = sorted(res[7].split(',')) if res[7] else []
+        metadata = MeterMetadata(meter_id=meter_id, info=tuple(res[:4]), first_date=res[4], last_date=res[5],
+                                 row_count=res[6], available_months=months,
+                                 available_years=sorted({m[:4] for m in months}))
+        return metadata
+
+    def _shared(self, name, meter_id, func):
+        """Return func(meter_id) from the cache shared by all processes or calculate and store it."""
+        return self.cache.get_or_set(f"{name}/{meter_id}/{self.data_version()}", lambda: func(meter_id))
+
+    def _memoize(self, store, meter_id, func):
+        """Return func(meter_id) from the given LRUStore or calculate and store it if the database was modified."""
+        version = (self.data_version(), self._pool.changes())
+        cached = store.get(meter_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = func(meter_id)
+        store[meter_id] = (version, value)
+        return value
+
+    def unique_readings(self):
+        """
+        Return whether the storage holds a single entry per meter and point in time, see elv.ingest. Otherwise,
+        duplicate entries have to be removed whenever meter values are read.
+
+        :return: True if the unique index of zaehlwerte exists or the columnar storage is used
+        """
+        storage = self.storage()
+        return self._memoize(self._schema, type(storage).__name__, lambda _: storage.unique_readings())
 
     def meters_in_database(self):
         """
@@ -28,11 +589,30 @@ class DataHandler:
         
         :return: List of meters
         """
-        con = sqlite3.connect(self._db_path)
-        meters = [x[0] for x in con.execute("SELECT zaehler_id FROM zaehlpunkte;").fetchall()]
-        con.close()
+        con = self._pool.connection()
+        meters = [x[0] for x in execute_query(con, 'meters_in_database')]
         return meters
 
+    def meter_index(self) -> MeterIndex:
+        """
+        Return the search index over the meters and their customers. It is built once and kept in memory until the
+        database is modified.
+
+        :return: MeterIndex of all meters in the database
+        """
+        return self._memoize(self._meter_index, 'zaehlpunkte',
+                             lambda _: MeterIndex(execute_query(self._pool.connection(), 'meter_index')))
+
+    def search_meters(self, query, limit=MAX_SEARCH_RESULTS):
+        """
+        Return the meters best matching the query, see MeterIndex.search.
+
+        :param query: Search string with parts of the meter ID, the customer name, the PLZ or the Ort
+        :param limit: Maximum number of returned meters
+        :return: List of tuples (meter ID, label)
+        """
+        return self.meter_index().search(query, limit)
+
     def meter_info(self, meter_id):
         """
         Query the meter information from the database.
@@ -40,11 +620,7 @@ class DataHandler:
         :param meter_id: The ID of the meter to be queried
         :return: Tuple as (kunde_name, kunde_name, plz, ort)
         """
-        con = sqlite3.connect(self._db_path)
-        meter_info = con.execute("SELECT kunde_name, kunde_vorname, plz, ort FROM zaehlpunkte WHERE zaehler_id = (?);",
-                                 [meter_id]).fetchall()[0]
-        con.close()
-        return meter_info
+        return self.metadata(meter_id).info
 
     def day(self, meter_id, date):
         """Return a DataFrame with all entries for the given meter and the given day.
@@ -54,13 +630,65 @@ class DataHandler:
         :param meter_id: The ID of the meter to be queried
         :param date: The DataFrame for the requested day
         """
+        return self.cache.get_or_set(f"day/{meter_id}/{date}/{self.data_version()}",
+                                     lambda: self._query_day(meter_id, date))
+
+    def _query_day(self, meter_id, date):
+        """Query and prepare the DataFrame returned by day."""
         next_day = arrow.get(date).shift(days=1).strftime("%Y-%m-%d")
-        con = sqlite3.connect(self._db_path)
-        df = pd.read_sql_query("SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE datum_zeit BETWEEN (?) AND (?) "
-                               "AND zaehler_id = (?);", con, params=[f"{date} 00:00", f"{next_day} 00:01", meter_id],
-                               parse_dates='datum_zeit')
-        con.close()
-        return self._prepare_dataframe(df, '15T')
+        df = self.storage().readings(meter_id, f"{date} 00:00", f"{next_day} 00:01")
+        return self._prepare_dataframe(df, '15T', deduplicate=not self.unique_readings())
+
+    def interval(self, meter_id, start, end):
+        """
+        Return a DataFrame with all quarter hour entries for the given meter between start and end, in the same format
+        as day.
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first point in time of the interval
+        :param end: The last point in time of the interval
+        :return: The DataFrame for the requested interval or None if there are no entries
+        """
+        df = self.storage().readings(meter_id, pd.Timestamp(start).strftime("%Y-%m-%d %H:%M:%S"),
+                                     pd.Timestamp(end).strftime("%Y-%m-%d %H:%M:%S"))
+        if df.empty:
+            return None
+        return self._prepare_dataframe(df, '15T', deduplicate=not self.unique_readings())
+
+    def iter_interval(self, meter_id, start, end, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Return the quarter hour entries of interval in chunks, so that the memory usage does not depend on the length
+        of the interval. The last meter value on the grid of each chunk is prepared again with the next chunk, which
+        results in the same entries as interval without any gaps or overlaps between the chunks.
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first point in time of the interval
+        :param end: The last point in time of the interval
+        :param chunk_size: Number of meter values read at once
+        :return: Iterator of DataFrames in the format of interval
+        """
+        deduplicate = not self.unique_readings()
+        step = pd.Timedelta(to_offset('15T')).value
+        origin, carry = None, None
+        for df in self.storage().iter_readings(meter_id, pd.Timestamp(start).strftime("%Y-%m-%d %H:%M:%S"),
+                                               pd.Timestamp(end).strftime("%Y-%m-%d %H:%M:%S"), chunk_size):
+            if carry is not None:
+                df = pd.concat([carry, df], ignore_index=True)
+            timestamps = df['datum_zeit'].to_numpy(dtype='datetime64[ns]').view('int64')
+            origin = timestamps[0] if origin is None else origin
+            # Split at the first entry of the last point in time on the grid, the rows are sorted by datum_zeit
+            last = timestamps[np.flatnonzero((timestamps - origin) % step == 0)[-1]]
+            split = np.searchsorted(timestamps, last, 'left')
+            prepared = self._prepare_dataframe(df.iloc[:np.searchsorted(timestamps, last, 'right')], '15T',
+                                               deduplicate=deduplicate)
+            carry = df.iloc[split:]
+            if not prepared.empty:
+                yield prepared
+        if carry is not None and len(carry) > 1:
+            # Entries after the last point in time on the grid, prepared like the end of interval
+            prepared = self._prepare_dataframe(carry, '15T', deduplicate=deduplicate)
+            if not prepared.empty:
+                yield prepared
 
     def overview(self, meter_id, start=None, end=None):
         """Return a DataFrame with all daily entries for the given meter in the given interval. If no interval is
@@ -72,16 +700,396 @@ class DataHandler:
         :param end: The last day of the interval
         :return: The DataFrame for the requested meter
         """
-        con = sqlite3.connect(self._db_path)
-        df = pd.read_sql_query("SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE time(datum_zeit) = '00:00:00' "
-                               "AND zaehler_id = (?);", con, params=[meter_id], parse_dates='datum_zeit')
-        df = self._prepare_dataframe(df, 'D')
-        con.close()
+        df = self.cache.get_or_set(f"overview/{meter_id}/{self.data_version()}",
+                                   lambda: self._query_overview(meter_id))
+        if start is not None and end is not None:
+            return df.loc[start:end]
+        else:
+            return df
+
+    def _query_overview(self, meter_id):
+        """Query and prepare the DataFrame returned by overview, preferably from the rollup table."""
+        storage = self.storage()
+        # The rollup tables are part of the database, they are used with the columnar storage as well
+        df = self._sqlite.rollup_overview(meter_id)
+        if df is None:
+            df = self._prepare_dataframe(storage.daily_readings(meter_id), 'D', deduplicate=not self.unique_readings())
+        return df
+
+    def portfolio_interval(self, meter_ids, start, end):
+        """
+        Return the quarter hour diffs summed over the given meters between start and end. The values of all meters
+        are read at once and each meter is interpolated separately before the diffs are added up.
+
+        :param meter_ids: List of the meter IDs of the portfolio
+        :param start: The first point in time of the interval
+        :param end: The last point in time of the interval
+        :return: DataFrame with the columns diff, interpolation, meters and date_time or None if there are no entries
+        """
+        df = self.storage().portfolio_readings(_portfolio(meter_ids), pd.Timestamp(start).strftime("%Y-%m-%d %H:%M:%S"),
+                                               pd.Timestamp(end).strftime("%Y-%m-%d %H:%M:%S"))
+        if df.empty:
+            return None
+        return self._sum_meters(df, '15T')
+
+    def portfolio_overview(self, meter_ids, start=None, end=None):
+        """
+        Return the daily diffs summed over the given meters in the given interval, see overview. They are summed up
+        by a single grouped query if the rollup table holds all meters, otherwise the midnight values of all meters
+        are read at once and summed up like in portfolio_interval.
+
+        :param meter_ids: List of the meter IDs of the portfolio
+        :param start: The starting day of the interval
+        :param end: The last day of the interval
+        :return: DataFrame with the columns diff, interpolation, meters and date_time
+        """
+        meter_ids = _portfolio(meter_ids)
+        df = self.cache.get_or_set(f"portfolio_overview/{','.join(meter_ids)}/{self.data_version()}",
+                                   lambda: self._query_portfolio_overview(meter_ids))
         if start is not None and end is not None:
             return df.loc[start:end]
         else:
             return df
 
+    def _query_portfolio_overview(self, meter_ids):
+        """Query and prepare the DataFrame returned by portfolio_overview, preferably from the rollup table."""
+        storage = self.storage()
+        df = self._sqlite.rollup_portfolio(meter_ids)  # Also with the columnar storage, see _query_overview
+        if df is None:
+            df = self._sum_meters(storage.portfolio_daily_readings(meter_ids), 'D')
+        return df
+
+    def _sum_meters(self, df, frequency):
+        """
+        Prepare the readings of each meter with _prepare_dataframe, so gaps are interpolated per meter, and add up
+        their diffs on a common grid. A time step is marked as interpolated if any of the meters was interpolated.
+
+        :param df: DataFrame with the columns zaehler_id, datum_zeit and obis_180 sorted by zaehler_id
+        :param frequency: Frequency of the grid
+        :return: DataFrame with the columns diff, interpolation, meters (number of summed meters) and date_time
+        """
+        meter_ids = df['zaehler_id'].to_numpy()
+        if meter_ids.size == 0:
+            raise ValueError("No meter values found.")
+        bounds = np.concatenate(([0], np.flatnonzero(meter_ids[1:] != meter_ids[:-1]) + 1, [meter_ids.size]))
+        deduplicate = not self.unique_readings()
+        frames = [self._prepare_dataframe(df.iloc[first:stop], frequency, deduplicate=deduplicate)
+                  for first, stop in zip(bounds[:-1], bounds[1:])]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            raise ValueError("No meter values found.")
+        idx = pd.date_range(min(f.index[0] for f in frames), max(f.index[-1] for f in frames), freq=frequency)
+        diff = np.zeros(idx.size)
+        interpolation = np.zeros(idx.size, dtype=bool)
+        meters = np.zeros(idx.size, dtype=int)
+        for f in frames:
+            positions = idx.get_indexer(f.index)  # -1 for meters whose values are not aligned to the grid
+            values = f['diff'].to_numpy()
+            known = (positions >= 0) & ~np.isnan(values)
+            diff[positions[known]] += values[known]
+            meters[positions[known]] += 1
+            interpolation[positions[positions >= 0]] |= f['interpolation'].to_numpy()[positions >= 0]
+        diff[meters == 0] = np.nan
+        return pd.DataFrame({'diff': diff, 'interpolation': interpolation, 'meters': meters, 'date_time': idx},
+                            index=idx)
+
+    def update_rollup(self, meter_ids=None, rebuild=False):
+        """
+        Create the daily rollup table if necessary and add the days that are missing for the given meters.
+
+        The rollup table tageswerte holds the midnight meter value of each day, the difference to the next day and
+        whether the value was interpolated. Meters are updated incrementally starting at the last day with a measured
+        value, so the command can be run again whenever new values were added to zaehlwerte.
+
+        :param meter_ids: List of the meter IDs to be updated, all meters are updated if not specified
+        :param rebuild: Drop the stored days of the meters and calculate them again
+        :return: Number of written days
+        """
+        meter_ids = self.meters_in_database() if meter_ids is None else meter_ids
+        con = self._writable_connection()
+        for statement in ROLLUP_SCHEMA:
+            con.execute(statement)
+        written = 0
+        for meter_id in meter_ids:
+            with con:
+                if rebuild:
+                    con.execute("DELETE FROM tageswerte WHERE zaehler_id = (?);", [meter_id])
+                anchor = execute_query(con, 'rollup_anchor', [meter_id])[0][0]
+                df = read_query(con, 'rollup_source', [meter_id, anchor or ''], parse_dates='datum_zeit')
+                if not df.empty:
+                    df = self._prepare_dataframe(df, 'D', deduplicate=not self.unique_readings())
+                    con.executemany("INSERT OR REPLACE INTO tageswerte (zaehler_id, datum, obis_180, diff, "
+                                    "interpolation) VALUES (?, ?, ?, ?, ?);",
+                                    zip([meter_id] * len(df), df.index.strftime("%Y-%m-%d"), df['obis_180'].tolist(),
+                                        df['diff'].tolist(), df['interpolation'].astype(int).tolist()))
+                    written += len(df)
+                # Update the yearly energy usage from the last 366 days
+                tail = read_query(con, 'rollup_tail', [meter_id], index_col='datum')
+                if not tail.empty:
+                    tail = tail.iloc[::-1].astype({'interpolation': bool})
+                    con.execute("INSERT OR REPLACE INTO jahresverbrauch (zaehler_id, verbrauch) VALUES (?, ?);",
+                                [meter_id, self.energy_usage_from_overview(tail)])
+        con.close()
+        return written
+
+    def update_deviations(self, meter_ids=None, workers=None):
+        """
+        Compare the given meters with their default load profile and store the daily and yearly metrics in the tables
+        tagesabweichung and jahresabweichung, see elv.deviation. The meters are processed in parallel by a pool of
+        worker processes, each with its own DataHandler, and the results are written by the calling process.
+
+        :param meter_ids: List of the meter IDs to be compared, all meters are compared if not specified
+        :param workers: Number of worker processes, defaults to the number of CPUs, 1 runs in the calling process
+        :return: Number of compared meters
+        """
+        meter_ids = self.meters_in_database() if meter_ids is None else meter_ids
+        con = self._writable_connection()
+        for statement in DEVIATION_SCHEMA:
+            con.execute(statement)
+        written = 0
+        try:
+            for meter_id, result in self._map_meters(deviation.meter_deviations, meter_ids, workers):
+                if isinstance(result, ValueError):
+                    warnings.warn(f"Deviations of meter {meter_id} failed: {result}", RuntimeWarning)
+                    continue
+                with con:
+                    con.execute("DELETE FROM tagesabweichung WHERE zaehler_id = (?);", [meter_id])
+                    con.execute("DELETE FROM jahresabweichung WHERE zaehler_id = (?);", [meter_id])
+                    if result is None:
+                        continue
+                    for table, column, df in (('tagesabweichung', 'datum', result[0]),
+                                              ('jahresabweichung', 'jahr', result[1])):
+                        con.executemany(f"INSERT INTO {table} (zaehler_id, {column}, rmse, peak_ratio, energy_delta, "
+                                        f"quarter_hours) VALUES (?, ?, ?, ?, ?, ?);",
+                                        zip([meter_id] * len(df), df.index, df['rmse'].tolist(),
+                                            df['peak_ratio'].tolist(), df['energy_delta'].tolist(),
+                                            df['quarter_hours'].tolist()))
+                written += 1
+        finally:
+            con.close()
+        return written
+
+    def _map_meters(self, func, meter_ids, workers):
+        """
+        Calculate func(dh, meter_id) for each of the given meters in a pool of worker processes, each with its own
+        DataHandler dh, or in the calling process with this DataHandler if workers is 1.
+
+        :param func: Function of a DataHandler and a meter ID, defined at module level so it can be pickled
+        :param meter_ids: List of meter IDs
+        :param workers: Number of worker processes, defaults to the number of CPUs
+        :return: Iterator of tuples (meter ID, result) in the order of meter_ids, the result is the raised exception
+            if func raised a ValueError
+        """
+        if workers == 1:
+            for meter_id in meter_ids:
+                try:
+                    yield meter_id, func(self, meter_id)
+                except ValueError as e:
+                    yield meter_id, e
+            return
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                    initargs=(str(self._db_path),)) as executor:
+            yield from executor.map(functools.partial(_run_worker, func), meter_ids, chunksize=4)
+
+    def stored_readings(self, meter_id, chunk_size=quality.SCAN_CHUNK_SIZE):
+        """
+        Return all entries of the given meter in zaehlwerte in chunks, as they are stored: including duplicates and
+        entries off the grid, and read from the database even if the columnar storage is enabled.
+
+        :param meter_id: The ID of the meter to be queried
+        :param chunk_size: Number of meter values read at once
+        :return: Iterator of DataFrames with the columns datum_zeit and obis_180, sorted by datum_zeit
+        """
+        return self._sqlite.iter_readings(meter_id, '0000-01-01 00:00:00', '9999-12-31 23:59:59', chunk_size)
+
+    def update_quality(self, meter_ids=None, workers=None):
+        """
+        Scan the stored entries of the given meters for gaps, duplicate points in time, decreasing meter values and
+        entries off the grid, see elv.quality. Each meter is read in chunks by a pool of worker processes, so the
+        memory usage does not depend on the number of values, and the results are written by the calling process to
+        the tables datenqualitaet and datenfehler, replacing the ones of an earlier scan.
+
+        :param meter_ids: List of the meter IDs to be scanned, all meters are scanned if not specified
+        :param workers: Number of worker processes, defaults to the number of CPUs, 1 runs in the calling process
+        :return: Number of scanned meters
+        """
+        meter_ids = self.meters_in_database() if meter_ids is None else meter_ids
+        con = self._writable_connection()
+        for statement in QUALITY_SCHEMA:
+            con.execute(statement)
+        scanned = 0
+        try:
+            for meter_id, result in self._map_meters(quality.meter_quality, meter_ids, workers):
+                if isinstance(result, ValueError):
+                    warnings.warn(f"Data-quality scan of meter {meter_id} failed: {result}", RuntimeWarning)
+                    continue
+                summary, problems = result
+                with con:
+                    con.execute("DELETE FROM datenfehler WHERE zaehler_id = (?);", [meter_id])
+                    con.execute(f"INSERT OR REPLACE INTO datenqualitaet (zaehler_id, {', '.join(summary._fields)}) "
+                                f"VALUES (?{', ?' * len(summary._fields)});", [meter_id, *summary])
+                    con.executemany("INSERT INTO datenfehler (zaehler_id, start_time, kind, end_time, amount) "
+                                    "VALUES (?, ?, ?, ?, ?);",
+                                    zip([meter_id] * len(problems), problems['start_time'], problems['kind'],
+                                        problems['end_time'], problems['amount'].tolist()))
+                scanned += 1
+        finally:
+            con.close()
+        return scanned
+
+    def data_quality(self, meter_id) -> Optional[quality.QualitySummary]:
+        """
+        Return the result of the last data-quality scan of the given meter, see update_quality. It is kept in memory
+        until the database is modified.
+
+        :param meter_id: The ID of the meter to be queried
+        :return: QualitySummary or None if the meter was not scanned yet
+        """
+        return self._memoize(self._quality, meter_id, self._query_quality)
+
+    def _query_quality(self, meter_id):
+        """Query the QualitySummary returned by data_quality."""
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['datenqualitaet']):
+            return None
+        res = next(iter(execute_query(con, 'quality', [meter_id])), None)
+        return None if res is None else quality.QualitySummary(*res)
+
+    def data_problems(self, meter_id, start, end):
+        """
+        Return the problems found by the last data-quality scan of the given meter that overlap the given interval,
+        see update_quality and MeterScan.problems.
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first point in time of the interval
+        :param end: The last point in time of the interval
+        :return: DataFrame with the columns kind, start_time, end_time and amount, sorted by start_time
+        """
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['datenfehler']):
+            return pd.DataFrame(columns=['kind', 'start_time', 'end_time', 'amount'])
+        return read_query(con, 'quality_problems', [meter_id, pd.Timestamp(start).strftime("%Y-%m-%d %H:%M:%S"),
+                                                    pd.Timestamp(end).strftime("%Y-%m-%d %H:%M:%S")])
+
+    def deviation_years(self):
+        """
+        Return the years of the stored deviations, see update_deviations.
+
+        :return: Sorted list of years (YYYY), empty if the deviations were not calculated yet
+        """
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['jahresabweichung']):
+            return []
+        return [row[0] for row in execute_query(con, 'deviation_years')]
+
+    def deviations(self, year):
+        """
+        Return the stored deviations of all meters from their default load profile in the given year, see
+        update_deviations.
+
+        :param year: The year in question (YYYY)
+        :return: DataFrame with the columns zaehler_id, rmse, peak_ratio, energy_delta and quarter_hours, sorted by
+            descending rmse
+        """
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['jahresabweichung']):
+            return pd.DataFrame(columns=['zaehler_id', 'rmse', 'peak_ratio', 'energy_delta', 'quarter_hours'])
+        return read_query(con, 'deviation_ranking', [str(year)])
+
+    def deviation_days(self, meter_id, start, end):
+        """
+        Return the stored daily deviations of a meter from its default load profile, see update_deviations.
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first day (YYYY-MM-DD)
+        :param end: The last day (YYYY-MM-DD)
+        :return: DataFrame indexed by day with the columns rmse, peak_ratio, energy_delta and quarter_hours
+        """
+        con = self._pool.connection()
+        if not execute_query(con, 'table_exists', ['tagesabweichung']):
+            return pd.DataFrame(columns=['rmse', 'peak_ratio', 'energy_delta', 'quarter_hours'])
+        return read_query(con, 'deviation_days', [meter_id, start, end], index_col='datum')
+
+    def build_columnar_storage(self, directory=None):
+        """
+        Export the meter values of all meters to the columnar storage, see ColumnarStorage. The storage is only used
+        until meter values are added or removed, so it has to be built again afterwards.
+
+        :param directory: Target directory, defaults to the one of this DataHandler or the environment, see
+            storage_from_env
+        :return: Number of written values
+        """
+        version = self.readings_version()
+        con = self._pool.connection()
+        meters = ((meter_id, read_query(con, 'readings', [meter_id], parse_dates='datum_zeit'))
+                  for meter_id in self.meters_in_database())
+        if directory is None:
+            directory = columnar_path() if self._columnar_path is None else self._columnar_path
+        return write_columnar(directory, version, meters)
+
+    def _writable_connection(self):
+        """Return a new connection with write access for the maintenance methods, which has to be closed after use."""
+        return sqlite3.connect(self._db_path)
+
+    def ensure_indexes(self):
+        """
+        Create the indexes required by the queries of the DataHandler if they do not exist yet.
+
+        :return: List with the names of the created indexes
+        """
+        con = self._writable_connection()
+        existing = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'index';")}
+        with con:
+            for statement in INDEX_SCHEMA:
+                con.execute(statement)
+        created = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'index';")
+                   if r[0] not in existing]
+        if created:
+            con.execute("ANALYZE;")
+        con.close()
+        return created
+
+    def query_plans(self):
+        """
+        Return the query plan of each query of the DataHandler.
+
+        :return: Dictionary with the query names as keys and lists of the plan details as values
+        """
+        con = self._pool.connection()
+        plans = {}
+        for name, query in QUERIES.items():
+            numbered = [int(n) for n in re.findall(r"\?(\d+)", query)]
+            parameters = [None] * (max(numbered) if numbered else query.count('?'))
+            try:
+                plan = con.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()
+            except sqlite3.OperationalError as e:
+                if 'no such table' in str(e):
+                    continue  # The rollup tables are optional
+                raise
+            plans[name] = [row[-1] for row in plan]
+        return plans
+
+    def check_query_plans(self, strict=False):
+        """
+        Verify that no query of the DataHandler scans a whole table unless expected. Each offending query results in
+        a warning, or in an exception if strict is set.
+
+        :param strict: Raise a RuntimeError instead of warning
+        :return: Dictionary with the offending query names as keys and the scan details as values
+        """
+        offending = {}
+        for name, details in self.query_plans().items():
+            # Full scans are reported as "SCAN <table>", which is only fine for a few queries
+            scans = [d for d in details if re.match(r"SCAN (TABLE )?(zaehlwerte|zaehlpunkte|tageswerte)\b", d)]
+            if scans and name not in FULL_SCAN_QUERIES:
+                offending[name] = scans
+        for name, scans in offending.items():
+            message = f"Query {name} falls back to a full scan: {', '.join(scans)}"
+            if strict:
+                raise RuntimeError(message)
+            warnings.warn(message, RuntimeWarning)
+        return offending
+
     def first_date(self, meter_id):
         """
         Return the first date stored in the database for the given meter.
@@ -89,10 +1097,7 @@ class DataHandler:
         :param meter_id: The ID of the meter to be queried
         :return: String with the first date
         """
-        conn = sqlite3.connect(self._db_path)
-        res = conn.execute("SELECT date(min(datum_zeit)) FROM zaehlwerte WHERE zaehler_id = (?)", [meter_id]).fetchone()
-        conn.close()
-        return res[0]
+        return self.metadata(meter_id).first_date
 
     def last_date(self, meter_id):
         """
@@ -101,10 +1106,7 @@ class DataHandler:
         :param meter_id: The ID of the meter to be queried
         :return: String with the last date
         """
-        conn = sqlite3.connect(self._db_path)
-        res = conn.execute("SELECT date(max(datum_zeit)) FROM zaehlwerte WHERE zaehler_id = (?)", [meter_id]).fetchone()
-        conn.close()
-        return res[0]
+        return self.metadata(meter_id).last_date
 
     def available_months(self, meter_id):
         """
@@ -113,11 +1115,7 @@ class DataHandler:
         :param meter_id: The ID of the meter to be queried
         :return: List of formatted strings
         """
-        conn = sqlite3.connect(self._db_path)
-        res = conn.execute("SELECT strftime('%Y-%m', datum_zeit) AS year_month FROM zaehlwerte WHERE zaehler_id = (?) "
-                           "GROUP BY year_month", [meter_id]).fetchall()
-        conn.close()
-        return [r[0] for r in res]
+        return self.metadata(meter_id).available_months
 
     def available_years(self, meter_id):
         """
@@ -126,11 +1124,71 @@ class DataHandler:
         :param meter_id: The ID of the meter to be queried
         :return: List of formatted strings
         """
-        conn = sqlite3.connect(self._db_path)
-        res = conn.execute("SELECT strftime('%Y', datum_zeit) AS year_month FROM zaehlwerte WHERE zaehler_id = (?) "
-                           "GROUP BY year_month", [meter_id]).fetchall()
-        conn.close()
-        return [r[0] for r in res]
+        return self.metadata(meter_id).available_years
+
+    def range_statistics(self, meter_id) -> RangeStatistics:
+        """
+        Return the RangeStatistics of the daily diff values of the given meter. They are built once from the overview
+        and kept in memory until the database is modified, for at most RANGE_STATISTICS_SIZE meters.
+
+        :param meter_id: The ID of the meter to be queried
+        :return: RangeStatistics of the daily diff values
+        """
+        return self._memoize(self._range_statistics, meter_id, lambda m: RangeStatistics(self.overview(m)['diff']))
+
+    def yearly_energy_usage(self, meter_id):
+        """
+        Return the yearly energy usage of the given meter, see energy_usage_from_overview. It is read from the rollup
+        table jahresverbrauch, which is updated together with the daily values, or calculated from the overview if the
+        meter is not part of it. The value is kept in memory and in the cache until the database is modified.
+
+        :param meter_id: The ID of the meter to be queried
+        :return: The yearly energy usage
+        """
+        return self._memoize(self._yearly_energy_usage, meter_id,
+                             lambda m: self._shared('yearly_energy_usage', m, self._query_yearly_energy_usage))
+
+    def _query_yearly_energy_usage(self, meter_id):
+        """Query or calculate the value returned by yearly_energy_usage."""
+        con = self._pool.connection()
+        if execute_query(con, 'table_exists', ['jahresverbrauch']):
+            res = next(iter(execute_query(con, 'yearly_energy_usage', [meter_id])), None)
+            if res is not None:
+                return res[0]
+        return self.energy_usage_from_overview(self.overview(meter_id).iloc[-366:])
+
+    @staticmethod
+    def energy_usage_from_overview(df):
+        """
+        Calculate the previous yearly energy usage from the daily values of a meter.
+
+        If the number of days in the dataset is > 365 (one year), the sum of all meter values for the last 365 days is
+        returned. Otherwise, the currently stored meter values are summed up and interpolated to the a duration of one
+        year. Only the last 366 days of the overview are required.
+
+        :param df: DataFrame as returned by overview, at least the last 366 rows
+        :return: The yearly energy usage
+        """
+        if df.index.size < 365:  # Dataset smaller than one year
+            energy_used = df.sum(axis=1, numeric_only=True).div(4).sum()
+            energy_used = energy_used / df.index.size * 365  # Scale to one year
+        else:
+            energy_used = df.iloc[-366:-1].sum(axis=1, numeric_only=True).div(4).sum()  # Sum of last 365 values
+        return round(energy_used / 1000, 2)  # Convert Wh to kWh
+
+    def overview_stats(self, meter_id, start=None, end=None):
+        """
+        Return the minimum, maximum, mean and sum of the daily diff values for a given date range, rounded to two
+        decimals. If no range is specified, all values in the database are used.
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first date of the range
+        :param end: The last date of the range
+        :return: Tuple as (min, max, mean, sum)
+        """
+        statistics = self.range_statistics(meter_id)
+        return tuple(round(f(start, end), 2) for f in (statistics.min, statistics.max, statistics.mean,
+                                                       statistics.sum))
 
     def min(self, meter_id, start=None, end=None):
         """
@@ -142,9 +1200,7 @@ class DataHandler:
         :param end: The last date of the range (YYYY-MM-DD)
         :return: Minimum value
         """
-        start = self.first_date(meter_id) if start is None else start
-        end = self.last_date(meter_id) if end is None else end
-        return round(float(self.overview(meter_id)[start:end]['diff'].min()), 2)
+        return round(self.range_statistics(meter_id).min(start, end), 2)
 
     def max(self, meter_id, start=None, end=None):
         """
@@ -155,9 +1211,7 @@ class DataHandler:
         :param end: The last date of the range (YYYY-MM-DD)
         :return: Maximum value
         """
-        start = self.first_date(meter_id) if start is None else start
-        end = self.last_date(meter_id) if end is None else end
-        return round(float(self.overview(meter_id)[start:end]['diff'].max()), 2)
+        return round(self.range_statistics(meter_id).max(start, end), 2)
 
     def mean(self, meter_id, start=None, end=None):
         """
@@ -168,9 +1222,7 @@ class DataHandler:
         :param end: The last date of the range (YYYY-MM-DD)
         :return: Mean value
         """
-        start = self.first_date(meter_id) if start is None else start
-        end = self.last_date(meter_id) if end is None else end
-        return round(float(self.overview(meter_id)[start:end]['diff'].mean()), 2)
+        return round(self.range_statistics(meter_id).mean(start, end), 2)
 
     def sum(self, meter_id, start=None, end=None):
         """
@@ -181,24 +1233,36 @@ class DataHandler:
         :param end: The last date of the range (YYYY-MM-DD)
         :return: Summed value
         """
-        start = self.first_date(meter_id) if start is None else start
-        end = self.last_date(meter_id) if end is None else end
-        return round(float(self.overview(meter_id)[start:end]['diff'].sum()), 2)
+        return round(self.range_statistics(meter_id).sum(start, end), 2)
 
     @staticmethod
-    def _prepare_dataframe(df, frequency):
+    def _prepare_dataframe(df, frequency, deduplicate=True):
         """Return a DataFrame with each quarter hour value (:15, :30, :45, :00) in the the database
-         for the requested meter."""
-        # Remove duplicate entries
-        df = df.set_index('datum_zeit')
-        df = df.loc[~df.index.duplicated(keep='first')]
-        # Reindex to add missing dates
-        idx = pd.date_range(df.index.min(), df.index.max(), freq=frequency)
-        df = df.reindex(idx)
-        # Interpolate if necessary and calculate meter diffs
-        df['interpolation'] = df['obis_180'].isna()
-        df = df.interpolate()
-        df['diff'] = df['obis_180'].diff().shift(-1)
-        df.drop(df.tail(1).index, inplace=True)
-        df['date_time'] = df.index  # Required for aggregation
-        return df
+         for the requested meter. Duplicate entries are removed unless deduplicate is False."""
+        timestamps = df['datum_zeit'].to_numpy(dtype='datetime64[ns]').view('int64')
+        values = df['obis_180'].to_numpy(dtype='float64')
+        if timestamps.size == 0:
+            raise ValueError("No meter values found.")
+        step = pd.Timedelta(to_offset(frequency)).value
+        # Remove duplicate entries and sort by time
+        if deduplicate:
+            timestamps, first = np.unique(timestamps, return_index=True)
+            values = values[first]
+        elif np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, values = timestamps[order], values[order]
+        # Place the values on a regular grid starting at the first entry, entries between grid points are dropped
+        offsets = timestamps - timestamps[0]
+        on_grid = offsets % step == 0
+        obis_180 = np.full(offsets[-1] // step + 1, np.nan)
+        obis_180[offsets[on_grid] // step] = values[on_grid]
+        # Interpolate missing values linearly, missing values at the end are set to the last known value
+        interpolation = np.isnan(obis_180)
+        known = np.flatnonzero(~interpolation)
+        if known.size:
+            positions = np.arange(known[0], obis_180.size)
+            obis_180[known[0]:] = np.interp(positions, known, obis_180[known])
+        # Calculate meter diffs, the last entry is dropped as its diff is unknown
+        idx = pd.date_range(pd.Timestamp(timestamps[0]), periods=obis_180.size - 1, freq=frequency)
+        return pd.DataFrame({'obis_180': obis_180[:-1], 'interpolation': interpolation[:-1],
+                             'diff': np.diff(obis_180), 'date_time': idx}, index=idx)
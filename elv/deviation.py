@@ -0,0 +1,58 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dlp import get_default_load_profile
+
+
+def deviation_metrics(load: pd.Series, profile: pd.Series, keys) -> pd.DataFrame:
+    """
+    Compare quarter hour load values with the default load profile for each group of the given keys, e.g. days or
+    years. Quarter hours without a load or profile value are ignored.
+
+    :param load: Quarter hour load values in kWh
+    :param profile: Default load profile values in kWh with the same index as load
+    :param keys: Group of each quarter hour, an array with the length of load
+    :return: DataFrame indexed by the groups with the columns rmse (root mean square error in kWh), peak_ratio (maximum
+        load divided by the maximum of the profile), energy_delta (energy of the load minus the one of the profile in
+        kWh) and quarter_hours (number of compared quarter hours)
+    """
+    load = load.to_numpy(dtype='float64')
+    profile = profile.to_numpy(dtype='float64')
+    valid = ~(np.isnan(load) | np.isnan(profile))
+    df = pd.DataFrame({'squared_error': (load - profile) ** 2, 'load': load, 'profile': profile})[valid]
+    groups = df.groupby(np.asarray(keys)[valid])
+    sums, maxima = groups.sum(), groups.max()
+    counts = groups.size()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        peak_ratio = np.where(maxima['profile'] > 0, maxima['load'] / maxima['profile'], np.nan)
+    return pd.DataFrame({'rmse': np.sqrt(sums['squared_error'] / counts), 'peak_ratio': peak_ratio,
+                         'energy_delta': sums['load'] - sums['profile'], 'quarter_hours': counts})
+
+
+def meter_deviations(dh, meter_id) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Compare the whole history of a meter with its default load profile, scaled to its yearly energy usage, see
+    deviation_metrics. The profile of all days is calculated at once with calculate_profile_range.
+
+    :param dh: DataHandler of the database
+    :param meter_id: The ID of the meter to be compared
+    :return: Tuple of the daily and the yearly metrics, indexed by day (YYYY-MM-DD) and year (YYYY), or None if the
+        meter has no values
+    """
+    metadata = dh.metadata(meter_id)
+    if metadata.first_date is None:
+        return None
+    # The values of the last day are followed by the one at midnight, which is required for the last diff
+    df = dh.interval(meter_id, metadata.first_date, pd.Timestamp(metadata.last_date) + pd.Timedelta(days=1))
+    if df is None or df.empty:
+        return None
+    profile = get_default_load_profile().calculate_profile_range(
+        df.index[0].strftime("%Y-%m-%d"), df.index[-1].strftime("%Y-%m-%d"), dh.yearly_energy_usage(meter_id),
+        shift=True)
+    profile = profile.mul(1E-3).reindex(df.index)  # Scale to kWh like in figures.day_dataset
+    daily = deviation_metrics(df['diff'], profile, df.index.strftime("%Y-%m-%d"))
+    yearly = deviation_metrics(df['diff'], profile, df.index.strftime("%Y"))
+    return daily, yearly
+
@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def minmax_downsample(values, max_points):
+    """
+    Return the positions of the values to be plotted, so that at most max_points values remain. The values are split
+    into max_points / 2 buckets of equal size and the minimum and maximum of each bucket are kept, which preserves the
+    peaks of a load profile. NaN values are only kept if a bucket contains nothing else.
+
+    :param values: Array of values
+    :param max_points: Maximum number of returned positions
+    :return: Sorted array of positions
+    """
+    values = np.asarray(values, dtype='float64')
+    if values.size <= max_points:
+        return np.arange(values.size)
+    bucket_size = int(np.ceil(values.size / (max_points // 2)))
+    buckets = int(np.ceil(values.size / bucket_size))
+    padded = np.full(buckets * bucket_size, np.nan)
+    padded[:values.size] = values
+    padded = padded.reshape(buckets, bucket_size)
+    offsets = np.arange(buckets) * bucket_size
+    minima = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    maxima = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    positions = np.unique(np.concatenate((minima, maxima)))
+    return positions[positions < values.size]
@@ -0,0 +1,152 @@
+import io
+import re
+from typing import Iterable, Iterator
+
+import flask
+import pandas as pd
+
+from dlp import get_default_load_profile
+from elv.datahandler import EXPORT_CHUNK_SIZE, DataHandler
+
+# Exported columns, dlp is only included on request
+COLUMNS = ['date_time', 'obis_180', 'diff', 'interpolation']
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def export_frames(dh: DataHandler, meter_id, start, end, dlp=False, chunk_size=EXPORT_CHUNK_SIZE) \
+        -> Iterator[pd.DataFrame]:
+    """
+    Return the quarter hour values of the given meter between start and end in chunks, see DataHandler.iter_interval.
+    The default load profile of each chunk is calculated separately, so the memory usage does not depend on the length
+    of the interval either.
+
+    :param dh: DataHandler of the database
+    :param meter_id: The ID of the meter to be exported
+    :param start: The first point in time of the interval
+    :param end: The last point in time of the interval
+    :param dlp: Add the column dlp with the default load profile in kWh, aligned like in figures.day_dataset
+    :param chunk_size: Number of meter values read at once
+    :return: Iterator of DataFrames with the columns of COLUMNS and optionally dlp
+    """
+    energy_usage = dh.yearly_energy_usage(meter_id) if dlp else None
+    for df in dh.iter_interval(meter_id, start, end, chunk_size):
+        df = df[COLUMNS]
+        if dlp:
+            profile = get_default_load_profile().calculate_profile_range(
+                df.index[0].strftime("%Y-%m-%d"), df.index[-1].strftime("%Y-%m-%d"), energy_usage, shift=True)
+            df = df.assign(dlp=profile.mul(1E-3))  # Scale to kWh
+        yield df
+
+
+def csv_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[str]:
+    """Encode the DataFrames as one CSV file, one chunk per DataFrame with the header in the first one."""
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header, date_format="%Y-%m-%d %H:%M")
+        header = False
+
+
+class _ChunkSink(io.RawIOBase):
+    """Writable file collecting the written bytes until they are taken, see parquet_chunks."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        """Return the bytes written since the last call."""
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+def parquet_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Encode the DataFrames as one Parquet file with one row group per DataFrame, each row group is returned as soon as
+    it is written. Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.take()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.take()
+
+
+def export_response(dh: DataHandler, meter_id, args) -> flask.Response:
+    """
+    Return the streamed export of a meter as requested by the query parameters start and end (dates, both inclusive,
+    defaulting to the first and last day of the meter), format (csv or parquet) and dlp (1 to add the default load
+    profile).
+
+    :param dh: DataHandler of the database
+    :param meter_id: The ID of the meter to be exported
+    :param args: Query parameters of the request
+    :return: Streamed response
+    """
+    try:
+        metadata = dh.metadata(meter_id)
+    except ValueError:
+        flask.abort(404, f"Meter {meter_id} not found.")
+    export_format = args.get('format', 'csv')
+    if export_format not in FORMATS:
+        flask.abort(400, f"Unknown format {export_format}, use one of {', '.join(FORMATS)}.")
+    if export_format == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            flask.abort(501, "The Parquet export requires pyarrow.")
+    start, end = args.get('start', metadata.first_date), args.get('end', metadata.last_date)
+    for date in (start, end):
+        if date is None or not re.fullmatch(r"\d{4}-\d{2}-\d{2}", date):
+            flask.abort(400, f"Invalid date {date}, use YYYY-MM-DD.")
+    if start > end:
+        flask.abort(400, f"The start date {start} is after the end date {end}.")
+    # The values of the end date are followed by the one at midnight, which is required for the last diff
+    frames = export_frames(dh, meter_id, f"{start} 00:00", pd.Timestamp(end) + pd.Timedelta(days=1),
+                           dlp=args.get('dlp') == '1')
+    chunks = csv_chunks(frames) if export_format == 'csv' else parquet_chunks(frames)
+    filename = f"{meter_id}_{start}_{end}.{export_format}"
+    return flask.Response(flask.stream_with_context(chunks), content_type=FORMATS[export_format],
+                          headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+def init_app(server: flask.Flask, dh: DataHandler = None):
+    """
+    Serve the export of the meter values on /export/<meter_id>, see export_response.
+
+    :param server: Flask server of the Dash app
+    :param dh: DataHandler of the database, defaults to the shared one of elv
+    """
+    def export(meter_id):
+        if dh is None:
+            from elv import dh as shared
+            return export_response(shared, meter_id, flask.request.args)
+        return export_response(dh, meter_id, flask.request.args)
+
+    server.add_url_rule('/export/<meter_id>', 'export', export)
@@ -1,242 +1,307 @@
+import datetime
+import functools
+
 import arrow
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-from elv import dh
-from dlp import DefaultLoadProfile
+import elv
+from elv import metrics
+from elv.downsampling import minmax_downsample
+from dlp import get_default_load_profile
+
+# Maximum number of points per trace of the overview figure
+MAX_POINTS = 2000
+
+# Figures with a layout template, see _template
+TEMPLATES = ('empty', 'load', 'detail')
+
+# Intervals up to this length are shown with quarter hour values in the overview figure
+HIGH_RESOLUTION_SPAN = datetime.timedelta(days=31)
 
 
 def yearly_energy_usage(meter_id):
     """
-    Calculate the previous yearly energy usage.
-
-    If the number of days in the dataset is > 365 (one year), the sum of all meter values for the last 365 days is
-    returned. Otherwise, the currently stored meter values are summed up and interpolated to the a duration of one
-    year.
+    Return the previous yearly energy usage, see DataHandler.yearly_energy_usage.
 
     :param meter_id: The ID of the meter in question
     :return: The yearly energy usage
     """
-    df = dh.overview(meter_id)
-    if df.index.size < 365:  # Dataset smaller than one year
-        energy_used = df.sum(axis=1).div(4).sum()
-        energy_used = energy_used / df.index.size * 365  # Scale to one year
-    else:
-        energy_used = df.iloc[-366:-1].sum(axis=1).div(
-            4).sum()  # Calculate sum of last 365 values
-    return round(energy_used / 1000, 2)  # Convert Wh to kWh
-
-
-def empty_graph():
-    """Return a empty figure as a placeholder."""
-    fig = make_subplots()
-    fig.update_layout(
-        xaxis={
-            'visible': False
-        },
-        yaxis={'visible': False},
-        margin=dict(t=25, b=38, l=0, r=0),
-        modebar={'orientation': 'v'},
-        plot_bgcolor='#FFFFFF'
-    )
-    return fig
+    return elv.dh.yearly_energy_usage(meter_id)
 
 
-def overview_figure(meter_id):
+@functools.lru_cache(maxsize=None)
+def _template(name):
     """
-    Return a Plotly GraphObj showing the full load profile of a given meter.
+    Return the validated layout and trace templates of the given figure, which are built with make_subplots only once
+    per process. The figures are returned as dictionaries, so only the trace data and the parts of the layout that
+    depend on the request have to be filled in. The returned dictionaries are shared and must not be modified.
 
-    :param meter_id: The meter whose profile is to be plotted
-    :return: List of dictionaries with the keys date_time, obis_180 and diff
+    :param name: Name of the figure, one of TEMPLATES
+    :return: Dictionary with the keys layout and traces, the latter mapping trace names to trace dictionaries
     """
-    # Create empty figure with secondary y-axis
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    traces = {}
+    if name == 'empty':
+        fig = make_subplots()
+        fig.update_layout(
+            xaxis={
+                'visible': False
+            },
+            yaxis={'visible': False},
+            margin=dict(t=25, b=38, l=0, r=0),
+            modebar={'orientation': 'v'},
+            plot_bgcolor='#FFFFFF'
+        )
+    elif name == 'load':
+        # Create empty figure with secondary y-axis
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+        # Set x-axis title
+        fig.update_xaxes(title_text="Datum")
+
+        # Additional figure settings
+        fig.update_layout(
+            xaxis=dict(
+                rangeslider=dict(
+                    visible=True
+                ),
+                type="date"
+            ),
+            margin=dict(t=25, b=38, l=0, r=0),
+            hovermode='x',
+            modebar={'orientation': 'v'},
+            yaxis={
+                'tickformat': '.2f',
+                'tickcolor': '#E1E1E1',
+                'gridcolor': '#E1E1E1'
+            },
+            plot_bgcolor='#FFFFFF',
+            showlegend=False
+        )
+        traces['load'] = go.Scattergl(name="Lastgang", mode='lines', line={'color': '#007BFF', 'shape': 'hv'},
+                                      fill='tozeroy').to_plotly_json()
+        traces['interpolated'] = go.Scattergl(name="Interpoliert", mode='markers',
+                                              marker={'color': '#EF553B', 'size': 4}).to_plotly_json()
+    elif name == 'detail':
+        # Create figure with secondary y-axis
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+        # Set x-axis title
+        fig.update_xaxes(title_text="Zeitpunkt")
+
+        # Additional figure settings
+        fig.update_layout(
+            legend={
+                'x': 0.01,
+                'y': 0.99,
+                'xanchor': 'left',
+                'yanchor': 'top'
+            },
+            margin={'t': 25, 'b': 0, 'l': 0, 'r': 0},
+            hovermode='x',
+            modebar={'orientation': 'v'},
+            yaxis={
+                'tickformat': '.2f',
+                'tickcolor': '#E1E1E1',
+                'gridcolor': '#E1E1E1'
+            },
+            yaxis2={
+                'showexponent': 'none',
+                'exponentformat': 'none',
+                'tickformat': '.f',
+                'tickcolor': '#E1E1E1',
+                'gridcolor': '#E1E1E1'
+            },
+            plot_bgcolor='#FFFFFF'
+        )
+    else:
+        raise ValueError(f"Unknown figure {name}.")
+    return {'layout': fig.to_plotly_json()['layout'], 'traces': traces}
 
-    df = dh.overview(meter_id)
 
-    # Set x-axis title
-    fig.update_xaxes(title_text="Datum")
+def preload_templates():
+    """Build the templates of all figures in advance, e.g. before the worker processes are forked."""
+    for name in TEMPLATES:
+        _template(name)
 
-    # Set y-axes titles
-    fig.update_yaxes(title_text="kWh / Tag")
 
-    x_values = df.index.date
+def json_values(values):
+    """
+    Return the values as a list that can be serialized without calling the default method of the JSON encoder, with
+    None instead of NaN.
 
-    # Color interpolation bars if necessary
-    if df['interpolation'].any():
-        colors = df['interpolation'].map({False: '#007BFF', True: '#EF553B'})
-    else:
-        colors = '#007BFF'
+    :param values: Array of floats
+    :return: List of floats and None
+    """
+    return [None if v != v else v for v in np.asarray(values, dtype='float64').tolist()]
 
-    # Add trace
-    fig.add_trace(
-        go.Bar(x=x_values, y=df['diff'], name="Lastgang", hovertemplate="%{y} kWh / Tag", marker_color=colors)
-    )
 
-    # Set title
-    fig.layout.title = {
-        'text': f"{arrow.get(df.index.min()).format('D. MMMM YYYY', locale='de_DE')} -- "
-                f"{arrow.get(df.index.max()).format('D. MMMM YYYY', locale='de_DE')}",
-        'x': 0.5,
-        'xanchor': 'center'
-    }
+def json_dates(index, unit):
+    """
+    Return the points in time of a DatetimeIndex as a list of ISO strings, see numpy.datetime_as_string.
 
-    # Additional figure settings
-    fig.update_layout(
-        xaxis=dict(
-            rangeslider=dict(
-                visible=True
-            ),
-            type="date"
-        ),
-        margin=dict(t=25, b=38, l=0, r=0),
-        hovermode='x',
-        modebar={'orientation': 'v'},
-        yaxis={
-            'tickformat': '.2f',
-            'tickcolor': '#E1E1E1',
-            'gridcolor': '#E1E1E1'
-        },
-        plot_bgcolor='#FFFFFF'
-    )
+    :param index: DatetimeIndex
+    :param unit: Precision of the strings, e.g. D for days and m for minutes
+    :return: List of strings
+    """
+    return np.datetime_as_string(index.to_numpy(dtype='datetime64[ns]'), unit=unit).tolist()
 
-    return fig
 
+@metrics.timed(metrics.FIGURE_DURATION)
+def empty_graph():
+    """Return a empty figure as a placeholder."""
+    return {'data': [], 'layout': _template('empty')['layout']}
 
-def detail_figure(meter_id, date, quarter, meter, default_load_profile):
+
+@metrics.timed(metrics.FIGURE_DURATION)
+def overview_figure(meter_id, start=None, end=None):
     """
-    Return a Plotly GraphObj showing the load profile of a given meter for a given day, either as hourly or quarterly
-    values. The meter values and the default load profile can be included as well.
+    Return a Plotly figure showing the load profile of a given meter. Without an interval, the daily values of the
+    whole history are shown. If the interval is shorter than HIGH_RESOLUTION_SPAN, the quarter hour values around it
+    are shown instead. In both cases, the values are downsampled to at most MAX_POINTS points in the visible interval,
+    see window_positions, and drawn with WebGL.
 
     :param meter_id: The meter whose profile is to be plotted
-    :param date: The date for which the load profile is requested
-    :param quarter: Use quarter hour values, if False hourly values are used
-    :param meter: Show meter values
-    :param default_load_profile: Calculate and show default load profile
-    :return: List of dictionaries with the keys date_time, obis_180 and diff
+    :param start: The first point in time of the visible interval
+    :param end: The last point in time of the visible interval
+    :return: Figure as a dictionary
     """
-    # Create figure with secondary y-axis
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    return load_figure(elv.dh.overview(meter_id), lambda s, e: elv.dh.interval(meter_id, s, e), start, end, meter_id)
 
-    # Set x-axis title
-    fig.update_xaxes(title_text="Zeitpunkt")
 
-    # Set y-axes titles
-    fig.update_yaxes(title_text=f"kWh / {'60 min' if not quarter else '15 min'}", secondary_y=False)
-
-    # Filter incomplete request
-    if date is not None:
-        day = dh.day(meter_id, date)
+@metrics.timed(metrics.FIGURE_DURATION)
+def portfolio_figure(meter_ids, start=None, end=None):
+    """
+    Return a Plotly figure showing the load profile summed over the given meters, like overview_figure.
 
-        if quarter:
-            rule = '15T'
-        else:
-            rule = '60T'
+    :param meter_ids: The meters of the portfolio
+    :param start: The first point in time of the visible interval
+    :param end: The last point in time of the visible interval
+    :return: Figure as a dictionary
+    """
+    return load_figure(elv.dh.portfolio_overview(meter_ids), lambda s, e: elv.dh.portfolio_interval(meter_ids, s, e),
+                       start, end, ','.join(sorted(meter_ids)))
 
-        # Resample to requested interval
-        day = day.resample(rule).agg({'obis_180': 'first', 'diff': 'sum', 'interpolation': 'first'})
 
-        x_values = day.index
+def window_positions(index, values, start, end):
+    """
+    Return the positions of the values to be plotted for a visible interval. The values within the interval are
+    downsampled to MAX_POINTS points and the values before and after it, which are only shown when panning, to
+    MAX_POINTS / 2 points each, see minmax_downsample.
+
+    :param index: Sorted DatetimeIndex of the values
+    :param values: Array of values
+    :param start: The first point in time of the visible interval
+    :param end: The last point in time of the visible interval
+    :return: Sorted array of positions
+    """
+    values = np.asarray(values, dtype='float64')
+    first, stop = index.searchsorted(start, side='left'), index.searchsorted(end, side='right')
+    parts = ((0, first, MAX_POINTS // 2), (first, stop, MAX_POINTS), (stop, values.size, MAX_POINTS // 2))
+    return np.concatenate([offset + minmax_downsample(values[offset:limit], points)
+                           for offset, limit, points in parts])
 
-        # Color interpolation bars if necessary
-        if day['interpolation'].any():
-            colors = day['interpolation'].map({False: '#007BFF', True: '#EF553B'})
-        else:
-            colors = '#007BFF'
 
-        # Add profile trace
-        fig.add_trace(
-            go.Bar(x=x_values, y=day['diff'], name="Lastgang", marker_color=colors,
-                   hovertemplate="%{y}" + f" kWh / {'60 min' if not quarter else '15 min'}"),
-            secondary_y=False,
-        )
+def load_figure(overview, interval, start=None, end=None, uirevision=None):
+    """
+    Return a Plotly figure showing the daily diffs of the overview or the quarter hour diffs returned by interval if
+    the visible interval is shorter than HIGH_RESOLUTION_SPAN, see overview_figure.
+
+    :param overview: DataFrame with the daily values as returned by DataHandler.overview
+    :param interval: Function returning the quarter hour values between two points in time or None
+    :param start: The first point in time of the visible interval
+    :param end: The last point in time of the visible interval
+    :param uirevision: Value identifying the shown data, the zoom is kept as long as it does not change
+    :return: Figure as a dictionary
+    """
+    template = _template('load')
+    df, unit = overview, "Tag"
+    if start is None or end is None:
+        df = df.iloc[minmax_downsample(df['diff'], MAX_POINTS)]
+    else:
+        # Send the surrounding intervals as well to be able to pan without losing the resolution
+        margin = end - start
+        if margin <= HIGH_RESOLUTION_SPAN:
+            high_resolution = interval(start - margin, end + margin)
+            if high_resolution is not None:
+                df, unit = high_resolution, "15 min"
+        df = df[(df.index >= start - margin) & (df.index <= end + margin)]
+        df = df.iloc[window_positions(df.index, df['diff'], start, end)]
+    x_values = np.array(json_dates(df.index, 'D' if unit == "Tag" else 'm'), dtype=object)
+    y_values = np.array(json_values(df['diff']), dtype=object)
 
-        # Add meter value trace
-        if meter:
-            fig.add_trace(
-                go.Scatter(x=x_values, y=day['obis_180'], name="Zählerstand", line={'color': '#00CC96'},
-                           hovertemplate="%{y} kWh"),
-                secondary_y=True
-            )
-            fig.update_yaxes(title_text="kWh", secondary_y=True)
-
-        # Add default load profile trace
-        if default_load_profile:
-            dlp = DefaultLoadProfile()
-            dlp_data = dlp.calculate_profile(date, yearly_energy_usage(meter_id), shift=True)
-            dlp_data = dlp_data.mul(1E-3).resample(rule).sum()  # Scale to kWh before resampling
-
-            fig.add_trace(
-                go.Bar(x=dlp_data.index, y=dlp_data.values, name="Standardlastprofil", marker={'color': '#B3B8F6'},
-                       hovertemplate="%{y}" + f" kWh / {'60 min' if not quarter else '15 min'}"),
-                secondary_y=False
-            )
-
-        fig.layout.title = {
-            'text': arrow.get(date).format('dddd, D. MMMM YYYY', locale='de_DE'),
+    # Add trace
+    data = [dict(template['traces']['load'], x=x_values.tolist(), y=y_values.tolist(),
+                 hovertemplate=f"%{{y}} kWh / {unit}")]
+
+    # Mark interpolated values if necessary
+    interpolated = df['interpolation'].to_numpy(dtype=bool)
+    if interpolated.any():
+        data.append(dict(template['traces']['interpolated'], x=x_values[interpolated].tolist(),
+                         y=y_values[interpolated].tolist(), hovertemplate=f"%{{y}} kWh / {unit}"))
+
+    layout = dict(
+        template['layout'],
+        # Set title
+        title={
+            'text': f"{arrow.get(overview.index.min()).format('D. MMMM YYYY', locale='de_DE')} -- "
+                    f"{arrow.get(overview.index.max()).format('D. MMMM YYYY', locale='de_DE')}",
             'x': 0.5,
             'xanchor': 'center'
-        }
-
-    # Additional figure settings
-    fig.update_layout(
-        legend={
-            'x': 0.01,
-            'y': 0.99,
-            'xanchor': 'left',
-            'yanchor': 'top'
         },
-        margin={'t': 25, 'b': 0, 'l': 0, 'r': 75 if meter else 0},
-        hovermode='x',
-        modebar={'orientation': 'v'},
-        yaxis={
-            'tickformat': '.2f',
-            'tickcolor': '#E1E1E1',
-            'gridcolor': '#E1E1E1'
-        },
-        yaxis2={
-            'showexponent': 'none',
-            'exponentformat': 'none',
-            'tickformat': '.f',
-            'tickcolor': '#E1E1E1',
-            'gridcolor': '#E1E1E1'
-        },
-        plot_bgcolor='#FFFFFF'
+        # Set y-axes titles
+        yaxis=dict(template['layout']['yaxis'], title={'text': f"kWh / {unit}"}),
+        yaxis2=dict(template['layout']['yaxis2'], title={'text': f"kWh / {unit}"}),
+        uirevision=uirevision  # Keep the zoom when the figure is replaced for another interval
     )
+    if start is not None and end is not None:
+        layout['xaxis'] = dict(template['layout']['xaxis'], range=[start.isoformat(), end.isoformat()])
 
-    return fig
+    return {'data': data, 'layout': layout}
 
 
-def table_data(meter_id, date, quarter):
+@metrics.timed(metrics.FIGURE_DURATION)
+def day_dataset(meter_id, date):
     """
-    Return the data for the given date as a list of dictionaries. If quarter is true, values are aggregated to 15
-    minutes, otherwise the aggregation is hourly.
+    Return the quarter hour values of the given day shown in the detail view: the meter values, the default load
+    profile and the layout of the detail figure. The result is sent to the browser once per date, where the detail
+    graph, statistics and table are derived from it by the clientside callbacks in assets/detail.js.
 
-    :param meter_id: The meter whose profile is to be displayed
+    :param meter_id: The meter whose data is requested
     :param date: Requested date as a string
-    :param quarter: Aggregate to 15 minute values
-    :return: DataFrame with date_time, obis_180 and diff
-    """
-    if date is not None:
-        day = dh.day(meter_id, date).copy(deep=True)
-
-        if quarter:
-            rule = '15T'
-        else:
-            rule = '60T'
-
-        dlp = DefaultLoadProfile()
-        dlp_data = dlp.calculate_profile(date, yearly_energy_usage(meter_id), shift=True)
-        day['dlp'] = dlp_data.mul(1E-3)   # Scale to kWh
-
-        td = day.resample(rule)\
-            .agg({'date_time': 'first', 'obis_180': 'first', 'diff': 'sum', 'dlp': 'sum'})\
-            .to_dict('records')
-        # Clean up data
-        for data in td:
-            data['date_time'] = data['date_time'].strftime("%H:%M")
-            data['obis_180'] = round(data['obis_180'], 2)
-            data['diff'] = round(data['diff'], 2)
-            data['dlp'] = round(data['dlp'], 2)
-
-        return td
+    :return: Dictionary with the keys date, layout, date_time, obis_180, diff, interpolation, dlp, profile_date_time
+        and profile
+    """
+    dlp = get_default_load_profile()
+    dlp_data = dlp.calculate_profile(date, yearly_energy_usage(meter_id), shift=True).mul(1E-3)  # Scale to kWh
+    day = elv.dh.day(meter_id, date).assign(dlp=dlp_data)
+    return {
+        'date': date,
+        'layout': detail_layout(date),
+        'date_time': day.index.strftime("%Y-%m-%d %H:%M").tolist(),
+        'obis_180': json_values(day['obis_180']),
+        'diff': json_values(day['diff']),
+        'interpolation': day['interpolation'].tolist(),
+        'dlp': json_values(day['dlp']),  # Default load profile aligned to the meter values
+        'profile_date_time': dlp_data.index.strftime("%Y-%m-%d %H:%M").tolist(),
+        'profile': json_values(dlp_data)  # Default load profile of the whole day
+    }
+
+
+def detail_layout(date):
+    """
+    Return the layout of the figure showing the load profile of a given day. The traces as well as the axis title and
+    margin depending on the selected options are added in the browser, see assets/detail.js.
+
+    :param date: The date for which the load profile is requested
+    :return: Layout as a dictionary
+    """
+    return dict(
+        _template('detail')['layout'],
+        title={
+            'text': arrow.get(date).format('dddd, D. MMMM YYYY', locale='de_DE'),
+            'x': 0.5,
+            'xanchor': 'center'
+        }
+    )
@@ -22,7 +22,7 @@ def display_page(pathname):
     if pathname == '/':
         return html.Div(children=[
             html.Div(session_id, id='session-id', style={'display': 'none'}),
-            main_layout
+            main_layout()
         ])
     else:
         return '404'
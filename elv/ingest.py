@@ -0,0 +1,149 @@
+import csv
+import datetime
+import sqlite3
+import time
+from typing import Callable, Iterable, NamedTuple, Optional, Set
+
+from elv.datahandler import INDEX_SCHEMA, QUERIES, TABLE_SCHEMA, UNIQUE_INDEX_SCHEMA, UNIQUE_READINGS_INDEX
+
+# Number of rows written per transaction
+BATCH_SIZE = 50000
+
+# Columns expected in the header of the CSV files
+READING_COLUMNS = ['zaehler_id', 'datum_zeit', 'obis_180']
+METER_COLUMNS = ['zaehler_id', 'kunde_name', 'kunde_vorname', 'plz', 'ort']
+
+
+class IngestResult(NamedTuple):
+    """Summary of an ingested file, see ingest_readings."""
+    rows_read: int
+    rows_inserted: int
+    seconds: float
+    meter_ids: Set[str]
+
+    @property
+    def duplicates(self):
+        return self.rows_read - self.rows_inserted
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else float('nan')
+
+
+def connect(db_path) -> sqlite3.Connection:
+    """
+    Open the database for the ingestion, creating it if necessary. The database is switched to WAL mode, so the viewer
+    can keep reading while new values are written, and all tables and indexes are created. Duplicate entries stored
+    before the unique indexes existed are removed, keeping the first one like the read path did.
+
+    :param db_path: Path of the SQLite database
+    :return: Writable connection, which has to be closed after use
+    """
+    con = sqlite3.connect(db_path)
+    con.execute("PRAGMA journal_mode = WAL;")
+    con.execute("PRAGMA synchronous = NORMAL;")
+    with con:
+        for statement in TABLE_SCHEMA:
+            con.execute(statement)
+        if con.execute(QUERIES['index_exists'], [UNIQUE_READINGS_INDEX]).fetchone() is None:
+            con.execute("DELETE FROM zaehlwerte WHERE rowid NOT IN "
+                        "(SELECT min(rowid) FROM zaehlwerte GROUP BY zaehler_id, datum_zeit);")
+            con.execute("DELETE FROM zaehlpunkte WHERE rowid NOT IN "
+                        "(SELECT max(rowid) FROM zaehlpunkte GROUP BY zaehler_id);")
+        for statement in UNIQUE_INDEX_SCHEMA + INDEX_SCHEMA:
+            con.execute(statement)
+    return con
+
+
+def _rows(file, columns, delimiter):
+    """Yield the rows of a CSV file with the given columns in their order, the header may contain further columns."""
+    reader = csv.reader(file, delimiter=delimiter)
+    header = [name.strip() for name in next(reader, [])]
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise ValueError(f"Missing columns {', '.join(missing)} in {getattr(file, 'name', 'CSV file')}.")
+    positions = [header.index(name) for name in columns]
+    for row in reader:
+        if row:
+            yield reader.line_num, [row[i] for i in positions]
+
+
+def _batches(rows: Iterable, size: int):
+    """Split rows into lists of the given size."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_reading(line_num, row):
+    """
+    Return a reading from the CSV file in the format of zaehlwerte. Points in time are stored as "YYYY-MM-DD HH:MM:SS",
+    so that equal points in time are detected as duplicates regardless of their notation in the file.
+
+    :param line_num: Line number of the row for error messages
+    :param row: List with the meter ID, the point in time in ISO format and the meter value
+    :return: Tuple (zaehler_id, datum_zeit, obis_180)
+    """
+    meter_id, date_time, value = row
+    try:
+        date_time = datetime.datetime.fromisoformat(date_time.strip()).strftime("%Y-%m-%d %H:%M:%S")
+        value = float(value.replace(',', '.')) if value.strip() else None
+    except ValueError as e:
+        raise ValueError(f"Invalid reading in line {line_num}: {e}") from None
+    return meter_id.strip(), date_time, value
+
+
+def ingest_readings(con: sqlite3.Connection, file, batch_size=BATCH_SIZE, delimiter=',',
+                    progress: Optional[Callable[[int, float], None]] = None) -> IngestResult:
+    """
+    Stream the meter values of a CSV file into zaehlwerte. The file is read and written in batches, each batch is
+    inserted by a single executemany in its own transaction. Entries for a meter and point in time that already exist
+    are ignored, which is enforced by the unique index. Meters without an entry in zaehlpunkte are added to it.
+
+    :param con: Connection returned by connect
+    :param file: Open text file with the columns zaehler_id, datum_zeit and obis_180
+    :param batch_size: Number of rows per transaction
+    :param delimiter: Delimiter of the CSV file
+    :param progress: Function called with the number of read rows and the elapsed seconds after each batch
+    :return: IngestResult of the file
+    """
+    start = time.perf_counter()
+    rows_read, rows_inserted, meter_ids = 0, 0, set()
+    readings = (parse_reading(line_num, row) for line_num, row in _rows(file, READING_COLUMNS, delimiter))
+    for batch in _batches(readings, batch_size):
+        new_meters = {row[0] for row in batch} - meter_ids
+        changes = con.total_changes
+        with con:
+            con.executemany("INSERT OR IGNORE INTO zaehlwerte (zaehler_id, datum_zeit, obis_180) VALUES (?, ?, ?);",
+                            batch)
+            rows_inserted += con.total_changes - changes
+            con.executemany("INSERT OR IGNORE INTO zaehlpunkte (zaehler_id) VALUES (?);",
+                            [[meter_id] for meter_id in new_meters])
+        meter_ids |= new_meters
+        rows_read += len(batch)
+        if progress is not None:
+            progress(rows_read, time.perf_counter() - start)
+    return IngestResult(rows_read, rows_inserted, time.perf_counter() - start, meter_ids)
+
+
+def ingest_meters(con: sqlite3.Connection, file, delimiter=',') -> int:
+    """
+    Write the meter information of a CSV file into zaehlpunkte, replacing the stored information of the same meters.
+
+    :param con: Connection returned by connect
+    :param file: Open text file with the columns zaehler_id, kunde_name, kunde_vorname, plz and ort
+    :param delimiter: Delimiter of the CSV file
+    :return: Number of written meters
+    """
+    written = 0
+    for batch in _batches((row for _, row in _rows(file, METER_COLUMNS, delimiter)), BATCH_SIZE):
+        with con:
+            con.executemany("INSERT OR REPLACE INTO zaehlpunkte (zaehler_id, kunde_name, kunde_vorname, plz, ort) "
+                            "VALUES (?, ?, ?, ?, ?);", [[value.strip() for value in row] for row in batch])
+        written += len(batch)
+    return written
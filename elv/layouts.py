@@ -1,160 +1,314 @@
+import functools
+
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_table
 import dash_bootstrap_components as dbc
 
-from elv import dh
 
-main_layout = dbc.Container(className=["pt-3"], children=[
-    dbc.Row(
-        dbc.Col(
-            html.H3("Digitale Lastgangsanzeige")
-        )
-    ),
-    html.Div(children=[
-        dbc.Row([
+@functools.lru_cache(maxsize=None)
+def main_layout():
+    """
+    Return the layout of the main page. It is built on the first request and does not contain any meter data, the
+    options of the meter selectors are searched on demand by the callbacks.
+    """
+    return dbc.Container(className=["pt-3"], children=[
+        dbc.Row(
             dbc.Col(
-                dcc.Dropdown(
-                    id='meter-selector',
-                    options=[{'label': x, 'value': x} for x in dh.meters_in_database()],
-                    value='',
-                    placeholder='Zähler auswählen...',
-                    clearable=False
+                html.H3("Digitale Lastgangsanzeige")
+            )
+        ),
+        html.Div(children=[
+            dbc.Row([
+                dbc.Col(
+                    dcc.Dropdown(
+                        id='meter-selector',
+                        options=[],  # Filled with the search results, see search_meter_options
+                        value='',
+                        placeholder='Zähler auswählen...',
+                        clearable=False
+                    ),
+                    md=4,
+                    className="mb-2 mb-md-0"
                 ),
-                md=4,
-                className="mb-2 mb-md-0"
-            ),
-            dbc.Col(
-                html.Span(id='user-info'),
-                md=4,
-                className="mb-2 mb-md-0 align-center"
+                dbc.Col(
+                    html.Span(id='user-info'),
+                    md=4,
+                    className="mb-2 mb-md-0 align-center"
+                ),
+                dbc.Col(
+                    dbc.Button('Auswählen', id='select-meter', color='primary', block=True),
+                    md=4
+                )
+            ]),
+            html.Hr()
+        ], className="sticky-top bg-white pt-3"),
+        html.Div(style={'display': 'none'}, id='content', children=[
+            dbc.Card(
+                dbc.CardBody(children=[
+                    dbc.Row(
+                        dbc.Col(
+                            html.H4("Übersicht", className="section-header"),
+                        )
+                    ),
+                    dbc.Row(
+                        dbc.Col(
+                            dcc.Loading(type="graph", children=[
+                                dcc.Graph(id='graph-overview', config={'displaylogo': False, 'locale': 'de-DE'}),
+                            ]),
+                        ),
+                        className="mb-3"
+                    ),
+                    # Finished zoom of the graph and the timer waiting for it, see assets/zoom.js
+                    dcc.Store(id='overview-zoom'),
+                    dcc.Interval(id='overview-zoom-timer', interval=100, disabled=True),
+                    html.Hr(),
+                    dbc.Row(
+                        dbc.Col(
+                            dbc.Table(children=[
+                                html.Thead([
+                                    html.Th("Minimum"),
+                                    html.Th("Maximum"),
+                                    html.Th("Durchschnitt"),
+                                    html.Th("Summe")
+                                ]),
+                                html.Tbody([
+                                    html.Td([html.Span(id='min-span-overview'), " kW"]),
+                                    html.Td([html.Span(id='max-span-overview'), " kW"]),
+                                    html.Td([html.Span(id='mean-span-overview'), " kW"]),
+                                    html.Td([html.Span(id='sum-span-overview'), " kW"]),
+                                ])
+                            ], responsive='md', className="mb-0")
+                        )
+                    ),
+                    dbc.Row(
+                        dbc.Col(
+                            html.Small(id='quality-info', className="text-muted")
+                        )
+                    ),
+                    dbc.Row(
+                        dbc.Col(
+                            dash_table.DataTable(
+                                id='quality-table',
+                                columns=[
+                                    {
+                                        'name': "Problem",
+                                        'id': 'kind'
+                                    }, {
+                                        'name': "Beginn",
+                                        'id': 'start_time'
+                                    }, {
+                                        'name': "Ende",
+                                        'id': 'end_time'
+                                    }, {
+                                        'name': "Umfang",
+                                        'id': 'amount'
+                                    }
+                                ],
+                                page_size=10,
+                                cell_selectable=False,
+                                style_data_conditional=[
+                                    {
+                                        'if': {'row_index': 'odd'},
+                                        'backgroundColor': 'rgb(248, 248, 248)'
+                                    }
+                                ],
+                                style_header={
+                                    'backgroundColor': 'rgb(230, 230, 230)',
+                                    'fontWeight': 'bold'
+                                },
+                                style_cell={
+                                    'font-family': '"Raleway", "HelveticaNeue", "Helvetica Neue", Helvetica, Arial, '
+                                                   'sans-serif'
+                                }
+                            ),
+                            className="mt-2"
+                        )
+                    ),
+                    html.Hr(),
+                ], className="pb-0"),
+                className="mb-3"
             ),
-            dbc.Col(
-                dbc.Button('Auswählen', id='select-meter', color='primary', block=True),
-                md=4
+            dbc.Card(
+                dbc.CardBody(children=[
+                    dbc.Row(
+                        dbc.Col(
+                            html.H4("Tagesansicht", className="section-header"),
+                        )
+                    ),
+                    dbc.Row(children=[
+                        dbc.Col(
+                            dcc.DatePickerSingle(
+                                id='date-picker-single',
+                                display_format="DD.MM.YYYY",
+                                month_format="MM.YYYY",
+                                placeholder='Datum'
+                            ),
+                            xs=6, md=4
+                        ),
+                        dbc.Col(
+                            dcc.Dropdown(
+                                id='detail-toggle',
+                                options=[
+                                    {'label': 'Viertelstunden', 'value': 'quarter'},
+                                    {'label': 'Zählerwerte', 'value': 'meter'},
+                                    {'label': 'Standardlastprofil', 'value': 'dlp'},
+                                ],
+                                value=[],
+                                placeholder="Optionen...",
+                                multi=True
+                            ),
+                            xs=6, md=4
+                        )
+                    ], justify='between', className="mb-3"),
+                    dcc.Store(id='day-dataset'),
+                    dbc.Row(children=[
+                        dbc.Col(
+                            dcc.Loading(type="graph", children=[
+                                dcc.Graph(id='graph-detail', config={'displaylogo': False, 'locale': 'de-DE'}),
+                            ])
+                        )
+                    ], className="mb-3"),
+                    html.Hr(),
+                    dbc.Row(children=[
+                        dbc.Col(
+                            dbc.Table(children=[
+                                html.Thead([
+                                    html.Th("Minimum"),
+                                    html.Th("Maximum"),
+                                    html.Th("Durchschnitt"),
+                                    html.Th("Summe")
+                                ]),
+                                html.Tbody([
+                                    html.Td([html.Span(id='min-span-detail'), " kW"]),
+                                    html.Td([html.Span(id='max-span-detail'), " kW"]),
+                                    html.Td([html.Span(id='mean-span-detail'), " kW"]),
+                                    html.Td([html.Span(id='sum-span-detail'), " kW"]),
+                                ])
+                            ], responsive='md', className="mb-0")
+                        )
+                    ]),
+                    html.Hr(),
+                    dbc.Row(children=[
+                        dbc.Col(
+                            dash_table.DataTable(
+                                id='table',
+                                columns=[
+                                    {
+                                        'name': "Zeitpunkt",
+                                        'id': 'date_time'
+                                    }, {
+                                        'name': "Zählerstand [kWh]",
+                                        'id': 'obis_180'
+                                    }, {
+                                        'name': "Zählervorschub [kWh / h]",
+                                        'id': 'diff'
+                                    }, {
+                                        'name': "Standardlastprofil [kWh / h]",
+                                        'id': 'dlp'
+                                    }
+                                ],
+                                page_size=24,
+                                sort_action='native',
+                                cell_selectable=False,
+                                style_data_conditional=[
+                                    {
+                                        'if': {'row_index': 'odd'},
+                                        'backgroundColor': 'rgb(248, 248, 248)'
+                                    }
+                                ],
+                                style_header={
+                                    'backgroundColor': 'rgb(230, 230, 230)',
+                                    'fontWeight': 'bold'
+                                },
+                                style_cell={
+                                    'font-family': '"Raleway", "HelveticaNeue", "Helvetica Neue", Helvetica, Arial, sans-serif',
+                                    'overflow': 'hidden',
+                                    'textOverflow': 'ellipsis',
+                                    'maxWidth': 0
+                                }
+                            ),
+                            className="mx-3 mt-2"
+                        )
+                    ])
+                ])
             )
         ]),
-        html.Hr()
-    ], className="sticky-top bg-white pt-3"),
-    html.Div(style={'display': 'none'}, id='content', children=[
         dbc.Card(
             dbc.CardBody(children=[
                 dbc.Row(
                     dbc.Col(
-                        html.H4("Übersicht", className="section-header"),
+                        html.H4("Portfolio", className="section-header"),
                     )
                 ),
                 dbc.Row(
                     dbc.Col(
-                        dcc.Loading(type="graph", children=[
-                            dcc.Graph(id='graph-overview', config={'displaylogo': False, 'locale': 'de-DE'}),
-                        ]),
+                        dcc.Dropdown(
+                            id='portfolio-selector',
+                            options=[],  # Filled with the search results, see search_meter_options
+                            value=[],
+                            placeholder='Zähler des Portfolios auswählen...',
+                            multi=True
+                        ),
                     ),
                     className="mb-3"
                 ),
-                html.Hr(),
                 dbc.Row(
                     dbc.Col(
-                        dbc.Table(children=[
-                            html.Thead([
-                                html.Th("Minimum"),
-                                html.Th("Maximum"),
-                                html.Th("Durchschnitt"),
-                                html.Th("Summe")
-                            ]),
-                            html.Tbody([
-                                html.Td([html.Span(id='min-span-overview'), " kW"]),
-                                html.Td([html.Span(id='max-span-overview'), " kW"]),
-                                html.Td([html.Span(id='mean-span-overview'), " kW"]),
-                                html.Td([html.Span(id='sum-span-overview'), " kW"]),
-                            ])
-                        ], responsive='md', className="mb-0")
+                        dcc.Loading(type="graph", children=[
+                            dcc.Graph(id='graph-portfolio', config={'displaylogo': False, 'locale': 'de-DE'}),
+                        ]),
                     )
                 ),
-                html.Hr(),
-            ], className="pb-0"),
-            className="mb-3"
+                dcc.Store(id='portfolio-zoom'),
+                dcc.Interval(id='portfolio-zoom-timer', interval=100, disabled=True)
+            ]),
+            className="my-3"
         ),
         dbc.Card(
             dbc.CardBody(children=[
                 dbc.Row(
                     dbc.Col(
-                        html.H4("Tagesansicht", className="section-header"),
+                        html.H4("Abweichung vom Standardlastprofil", className="section-header"),
                     )
                 ),
-                dbc.Row(children=[
-                    dbc.Col(
-                        dcc.DatePickerSingle(
-                            id='date-picker-single',
-                            display_format="DD.MM.YYYY",
-                            month_format="MM.YYYY",
-                            placeholder='Datum'
-                        ),
-                        xs=6, md=4
-                    ),
+                dbc.Row(
                     dbc.Col(
                         dcc.Dropdown(
-                            id='detail-toggle',
-                            options=[
-                                {'label': 'Viertelstunden', 'value': 'quarter'},
-                                {'label': 'Zählerwerte', 'value': 'meter'},
-                                {'label': 'Standardlastprofil', 'value': 'dlp'},
-                            ],
-                            value=[],
-                            placeholder="Optionen...",
-                            multi=True
+                            id='deviation-year',
+                            options=[],  # Filled with the years of the stored deviations, see update_deviation_table
+                            placeholder='Letztes Jahr',
+                            clearable=True
                         ),
                         xs=6, md=4
-                    )
-                ], justify='between', className="mb-3"),
-                dbc.Row(children=[
-                    dbc.Col(
-                        dcc.Loading(type="graph", children=[
-                            dcc.Graph(id='graph-detail', config={'displaylogo': False, 'locale': 'de-DE'}),
-                        ])
-                    )
-                ], className="mb-3"),
-                html.Hr(),
-                dbc.Row(children=[
-                    dbc.Col(
-                        dbc.Table(children=[
-                            html.Thead([
-                                html.Th("Minimum"),
-                                html.Th("Maximum"),
-                                html.Th("Durchschnitt"),
-                                html.Th("Summe")
-                            ]),
-                            html.Tbody([
-                                html.Td([html.Span(id='min-span-detail'), " kW"]),
-                                html.Td([html.Span(id='max-span-detail'), " kW"]),
-                                html.Td([html.Span(id='mean-span-detail'), " kW"]),
-                                html.Td([html.Span(id='sum-span-detail'), " kW"]),
-                            ])
-                        ], responsive='md', className="mb-0")
-                    )
-                ]),
-                html.Hr(),
-                dbc.Row(children=[
+                    ),
+                    className="mb-3"
+                ),
+                dbc.Row(
                     dbc.Col(
                         dash_table.DataTable(
-                            id='table',
+                            id='deviation-table',
                             columns=[
                                 {
-                                    'name': "Zeitpunkt",
-                                    'id': 'date_time'
+                                    'name': "Zähler",
+                                    'id': 'zaehler_id'
                                 }, {
-                                    'name': "Zählerstand [kWh]",
-                                    'id': 'obis_180'
+                                    'name': "RMSE [kWh / 15 min]",
+                                    'id': 'rmse',
+                                    'type': 'numeric'
                                 }, {
-                                    'name': "Zählervorschub [kWh / h]",
-                                    'id': 'diff'
+                                    'name': "Spitzenlastverhältnis",
+                                    'id': 'peak_ratio',
+                                    'type': 'numeric'
                                 }, {
-                                    'name': "Standardlastprofil [kWh / h]",
-                                    'id': 'dlp'
+                                    'name': "Energiedifferenz [kWh]",
+                                    'id': 'energy_delta',
+                                    'type': 'numeric'
                                 }
                             ],
-                            page_size=24,
+                            page_size=20,
                             sort_action='native',
+                            filter_action='native',
                             cell_selectable=False,
                             style_data_conditional=[
                                 {
@@ -175,8 +329,8 @@ main_layout = dbc.Container(className=["pt-3"], children=[
                         ),
                         className="mx-3 mt-2"
                     )
-                ])
-            ])
+                )
+            ]),
+            className="my-3"
         )
     ])
-])
@@ -0,0 +1,107 @@
+import bisect
+import unicodedata
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# Ranks of a matching search term, lower is better
+EXACT, PREFIX, SUBSTRING = 0, 1, 2
+
+
+def normalize(text: Optional[str]) -> str:
+    """Return the text in lower case without accents, so that e.g. "Müller" is found by "muller"."""
+    text = unicodedata.normalize('NFKD', (text or '').casefold())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def trigrams(text: str) -> set:
+    """Return the set of all substrings of length three of the text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class MeterIndex:
+    def __init__(self, rows: Iterable[Sequence[Optional[str]]]):
+        """
+        Search index over the meters in zaehlpunkte. Each search term is looked up as a prefix of the words of a meter
+        in a sorted word list and, if it has at least three characters, as a substring of its text in a trigram index,
+        so that only candidate meters have to be compared with the term.
+
+        :param rows: Rows with the columns zaehler_id, kunde_name, kunde_vorname, plz and ort
+        """
+        self._meter_ids = []
+        self._labels = []
+        self._texts = []
+        self._positions = {}
+        words = []
+        self._trigrams = {}
+        for position, (meter_id, name, first_name, plz, ort) in enumerate(rows):
+            text = ' '.join(normalize(field) for field in (meter_id, first_name, name, plz, ort) if field)
+            self._meter_ids.append(meter_id)
+            self._labels.append(meter_label(meter_id, name, first_name, plz, ort))
+            self._texts.append(text)
+            self._positions.setdefault(meter_id, position)
+            words.extend((word, position) for word in set(text.split()))
+            for trigram in trigrams(text):
+                self._trigrams.setdefault(trigram, set()).add(position)
+        words.sort()
+        self._words = [word for word, _ in words]
+        self._word_positions = [position for _, position in words]
+
+    def __len__(self):
+        return len(self._meter_ids)
+
+    def label(self, meter_id) -> str:
+        """Return the label of the given meter shown in the meter selectors, the meter ID if it is unknown."""
+        position = self._positions.get(meter_id)
+        return meter_id if position is None else self._labels[position]
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, str]]:
+        """
+        Return the meters matching all whitespace separated terms of the query. Meters with a word equal to a term are
+        ranked first, followed by words starting with a term and texts containing a term, ties are ordered by meter ID.
+
+        :param query: Search string, e.g. parts of the meter ID, the customer name, the PLZ or the Ort
+        :param limit: Maximum number of returned meters
+        :return: List of tuples (meter ID, label)
+        """
+        ranks = None
+        for term in normalize(query).split():
+            matches = self._match(term)
+            if ranks is None:
+                ranks = matches
+            else:
+                ranks = {position: rank + matches[position] for position, rank in ranks.items() if position in matches}
+            if not ranks:
+                return []
+        if ranks is None:
+            return []
+        best = sorted(ranks, key=lambda position: (ranks[position], self._meter_ids[position]))[:limit]
+        return [(self._meter_ids[position], self._labels[position]) for position in best]
+
+    def _match(self, term):
+        """Return a dictionary mapping the positions of the meters matching the term to the rank of the match."""
+        matches = {}
+        if len(term) >= 3:
+            candidates = None
+            for trigram in trigrams(term):
+                positions = self._trigrams.get(trigram)
+                if not positions:
+                    return {}
+                candidates = positions if candidates is None else candidates & positions
+            for position in candidates:
+                if term in self._texts[position]:
+                    matches[position] = SUBSTRING
+        first = bisect.bisect_left(self._words, term)
+        for i in range(first, len(self._words)):
+            word = self._words[i]
+            if not word.startswith(term):
+                break
+            position = self._word_positions[i]
+            matches[position] = min(matches.get(position, SUBSTRING), EXACT if word == term else PREFIX)
+        return matches
+
+
+def meter_label(meter_id, name=None, first_name=None, plz=None, ort=None) -> str:
+    """Return the label of a meter shown in the meter selectors, e.g. "123 (Max Mustermann, 12345 Musterstadt)"."""
+    person = ' '.join(field for field in (first_name, name) if field)
+    place = ' '.join(field for field in (plz, ort) if field)
+    details = ', '.join(field for field in (person, place) if field)
+    return f"{meter_id} ({details})" if details else str(meter_id)
@@ -0,0 +1,245 @@
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+
+import flask
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# Arguments of the timed callbacks reported in the slow request log
+CONTEXT_ARGUMENTS = ('meter', 'meter_id', 'date')
+
+_lock = threading.Lock()
+_histograms = []
+_pid = os.getpid()
+_last_dump = 0.
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_name, buckets=DURATION_BUCKETS):
+        """
+        Prometheus histogram with a single label, e.g. the name of the timed function.
+
+        :param name: Name of the metric
+        :param documentation: Description shown in the HELP line
+        :param label_name: Name of the label
+        :param buckets: Upper bounds of the buckets
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_name = label_name
+        self.buckets = buckets
+        self.values = {}  # Label value -> counts of the buckets followed by the sum and the count
+        _histograms.append(self)
+
+    def observe(self, value, label):
+        """Add an observation for the given label value."""
+        with _lock:
+            _check_pid()
+            values = self.values.setdefault(label, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+        _dump(force=False)
+
+
+CALLBACK_DURATION = Histogram('elv_callback_duration_seconds', "Duration of the Dash callbacks.", 'callback')
+CALLBACK_OVERHEAD = Histogram('elv_callback_overhead_seconds', "Time of a callback request spent outside of the "
+                              "callback, mainly serializing its outputs.", 'callback')
+REQUEST_DURATION = Histogram('elv_request_duration_seconds', "Duration of the requests by Flask endpoint.",
+                             'endpoint')
+QUERY_DURATION = Histogram('elv_query_duration_seconds', "Duration of the DataHandler queries.", 'query')
+QUERY_ROWS = Histogram('elv_query_rows', "Number of rows returned by the DataHandler queries.", 'query', ROW_BUCKETS)
+FIGURE_DURATION = Histogram('elv_figure_duration_seconds', "Duration of the figure construction.", 'figure')
+
+
+def _check_pid():
+    """Forget the observations inherited from the parent process after a fork, the lock must be held."""
+    global _pid
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        for histogram in _histograms:
+            histogram.values = {}
+
+
+def _metrics_dir():
+    """Return the directory shared by all processes, see ELV_METRICS_DIR in the README."""
+    directory = os.environ.get('ELV_METRICS_DIR')
+    return pathlib.Path(directory) if directory else None
+
+
+def _dump(force):
+    """Write the observations of the current process to the metrics directory, at most once per second."""
+    global _last_dump
+    directory = _metrics_dir()
+    if directory is None or (not force and time.monotonic() - _last_dump < 1):
+        return
+    with _lock:
+        _check_pid()
+        _last_dump = time.monotonic()
+        snapshot = {h.name: dict(h.values) for h in _histograms}
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{os.getpid()}.json"
+    with open(path.with_suffix('.tmp'), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(path.with_suffix('.tmp'), path)
+
+
+@atexit.register
+def _remove_dump():
+    """Remove the observations of the current process from the metrics directory when it exits."""
+    directory = _metrics_dir()
+    if directory is not None:
+        try:
+            os.remove(directory / f"{os.getpid()}.json")
+        except OSError:
+            pass
+
+
+def _running(pid):
+    """Return whether a process with the given ID exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Running as another user
+    return True
+
+
+def _snapshots():
+    """
+    Return the observations of all running processes, or only of the current one if no metrics directory is set. The
+    files of processes that exited without removing them, e.g. killed workers, are removed.
+    """
+    directory = _metrics_dir()
+    if directory is None:
+        with _lock:
+            _check_pid()
+            return [{h.name: dict(h.values) for h in _histograms}]
+    _dump(force=True)
+    snapshots = []
+    for path in directory.glob('*.json'):
+        if path.stem.isdigit() and not _running(int(path.stem)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Removed by another process
+            continue
+        try:
+            with open(path, encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # Replaced while reading
+    return snapshots
+
+
+def exposition():
+    """
+    Return all histograms in the Prometheus text format. If ELV_METRICS_DIR is set, the observations of all uWSGI
+    workers are summed up, otherwise only the ones of the worker answering the request are included.
+
+    :return: Metrics as a string
+    """
+    snapshots = _snapshots()
+    lines = []
+    for histogram in _histograms:
+        merged = {}
+        for snapshot in snapshots:
+            for label, values in snapshot.get(histogram.name, {}).items():
+                merged[label] = [a + b for a, b in zip(merged.get(label, [0] * len(values)), values)]
+        lines.append(f"# HELP {histogram.name} {histogram.documentation}")
+        lines.append(f"# TYPE {histogram.name} histogram")
+        for label in sorted(merged):
+            values = merged[label]
+            label = label.replace('\\', '\\\\').replace('"', '\\"')
+            for bound, count in zip(histogram.buckets + ('+Inf',), values[:-2] + values[-1:]):
+                lines.append(f'{histogram.name}_bucket{{{histogram.label_name}="{label}",le="{bound}"}} {count}')
+            lines.append(f'{histogram.name}_sum{{{histogram.label_name}="{label}"}} {values[-2]}')
+            lines.append(f'{histogram.name}_count{{{histogram.label_name}="{label}"}} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def observe_query(name, seconds, rows):
+    """Record the duration and number of returned rows of a DataHandler query."""
+    QUERY_DURATION.observe(seconds, name)
+    QUERY_ROWS.observe(rows, name)
+
+
+def timed(histogram):
+    """Decorator recording the duration of each call of the function in the given histogram."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, func.__name__)
+        return wrapper
+    return decorator
+
+
+def timed_callback(func):
+    """
+    Decorator of the Dash callbacks recording their duration. The callback and its meter and date arguments are kept
+    for the request, see after_request.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            CALLBACK_DURATION.observe(duration, func.__name__)
+            if flask.has_request_context():
+                arguments = signature.bind(*args, **kwargs).arguments
+                flask.g.elv_callback = (func.__name__, duration,
+                                        {name: arguments[name] for name in CONTEXT_ARGUMENTS if name in arguments})
+    return wrapper
+
+
+def before_request():
+    """Remember the start of the request."""
+    flask.g.elv_request_start = time.perf_counter()
+
+
+def after_request(response):
+    """Record the duration of the request and log it if it is slower than ELV_SLOW_REQUEST_SECONDS."""
+    start = getattr(flask.g, 'elv_request_start', None)
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    REQUEST_DURATION.observe(duration, flask.request.endpoint or 'unknown')
+    callback = getattr(flask.g, 'elv_callback', None)
+    if callback is not None:
+        CALLBACK_OVERHEAD.observe(max(duration - callback[1], 0), callback[0])
+    threshold = os.environ.get('ELV_SLOW_REQUEST_SECONDS')
+    if threshold and duration > float(threshold):
+        name, callback_duration, context = callback if callback is not None else ('-', 0., {})
+        logger.warning("Slow request %s: %.3f s, callback %s: %.3f s, %s", flask.request.path, duration, name,
+                       callback_duration, ', '.join(f"{k}={v}" for k, v in context.items()) or 'no context')
+    return response
+
+
+def init_app(server: flask.Flask):
+    """Time the requests of the Flask server and serve the metrics on /metrics."""
+    server.before_request(before_request)
+    server.after_request(after_request)
+    server.add_url_rule('/metrics', 'metrics', lambda: flask.Response(
+        exposition(), content_type='text/plain; version=0.0.4; charset=utf-8'))
@@ -0,0 +1,39 @@
+import datetime
+import gc
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Years before the current one whose holiday calendars are calculated in advance
+HOLIDAY_YEARS = 10
+
+
+def preload():
+    """
+    Import the heavy modules and build the read-only lookup tables once in the uWSGI master, before the workers are
+    forked: the default load profile, the holiday calendars, the figure templates and the layout. The database is not
+    accessed, the connections are opened by each worker. Afterwards, all objects are moved to the permanent generation
+    of the garbage collector, so that collections in the workers do not write to the pages shared with the master.
+    Disabled by setting ELV_PRELOAD to 0.
+
+    :return: Seconds spent preloading or None if disabled
+    """
+    if os.environ.get('ELV_PRELOAD', '1') == '0':
+        return None
+    start = time.perf_counter()
+    from dlp import get_default_load_profile, preload_holidays
+    from elv import figures, layouts
+
+    get_default_load_profile()
+    year = datetime.date.today().year
+    preload_holidays(range(year - HOLIDAY_YEARS, year + 2))
+    figures.preload_templates()
+    layouts.main_layout()
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    seconds = time.perf_counter() - start
+    logger.info("Preloaded in %.2f s", seconds)
+    return seconds
@@ -0,0 +1,144 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+# Kinds of the problems stored in the table datenfehler, see MeterScan.problems
+GAP = 'gap'
+DUPLICATE = 'duplicate'
+DECREASE = 'decrease'
+
+# Number of meter values read at once by meter_quality
+SCAN_CHUNK_SIZE = 50000
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class QualitySummary(NamedTuple):
+    """Result of the data-quality scan of a meter, see MeterScan and DataHandler.data_quality."""
+    row_count: int
+    first_time: Optional[str]
+    last_time: Optional[str]
+    gaps: int                   # Spans of missing quarter hours, interpolated when the values are read
+    missing_quarter_hours: int  # Quarter hours of all gaps
+    longest_gap: int            # Quarter hours of the longest gap
+    duplicates: int             # Additional entries of points in time stored more than once
+    decreases: int              # Meter values lower than the previous one, e.g. counter resets
+    off_grid: int               # Entries between the quarter hours, which are dropped when the values are read
+
+
+def _time(timestamp) -> str:
+    """Format a timestamp in nanoseconds like datum_zeit."""
+    return pd.Timestamp(int(timestamp)).strftime(TIME_FORMAT)
+
+
+class MeterScan:
+    def __init__(self, frequency='15T'):
+        """
+        Streaming data-quality scan of the meter values of one meter, finding the problems that are silently repaired
+        by DataHandler._prepare_dataframe: gaps, duplicate points in time, decreasing meter values and entries off the
+        grid. The values are added in chunks sorted by time, see add. Apart from the found problems, only the last
+        entry of the previous chunk is kept, so the memory usage does not depend on the number of values.
+
+        Like _prepare_dataframe, the grid starts at the first entry, only the first entry of a point in time is used
+        and the gaps are the missing points on the grid between two entries on the grid.
+
+        :param frequency: Frequency of the grid
+        """
+        self._step = pd.Timedelta(to_offset(frequency)).value
+        self._origin = None
+        self._last = None          # Timestamp and value of the last entry
+        self._last_on_grid = None  # Timestamp of the last entry on the grid
+        self.row_count = 0
+        self.off_grid = 0
+        self.first = None
+        self.gaps = []        # Tuples (last entry before, first entry after, missing quarter hours)
+        self.duplicates = {}  # Number of additional entries by timestamp
+        self.decreases = []   # Tuples (timestamp, previous value, value)
+
+    def add(self, df: pd.DataFrame):
+        """
+        Scan the next chunk of meter values.
+
+        :param df: DataFrame with the columns datum_zeit and obis_180, sorted by datum_zeit and following the chunks
+            added before
+        """
+        timestamps = df['datum_zeit'].to_numpy(dtype='datetime64[ns]').view('int64')
+        values = df['obis_180'].to_numpy(dtype='float64')
+        if timestamps.size == 0:
+            return
+        if self._origin is None:
+            self._origin = self.first = timestamps[0]
+        self.row_count += timestamps.size
+        on_grid = (timestamps - self._origin) % self._step == 0
+        self.off_grid += int(np.count_nonzero(~on_grid))
+        if self._last is not None:
+            timestamps = np.concatenate(([self._last[0]], timestamps))
+            values = np.concatenate(([self._last[1]], values))
+            on_grid = np.concatenate(([False], on_grid))  # The carried entry was already checked for gaps
+        deltas = np.diff(timestamps)
+        if np.any(deltas < 0):
+            raise ValueError("The meter values are not sorted by time.")
+        repeated = deltas == 0
+        if repeated.any():
+            for timestamp, count in zip(*np.unique(timestamps[1:][repeated], return_counts=True)):
+                self.duplicates[int(timestamp)] = self.duplicates.get(int(timestamp), 0) + int(count)
+            keep = np.concatenate(([True], ~repeated))
+            timestamps, values, on_grid = timestamps[keep], values[keep], on_grid[keep]
+        # Decreases of the meter value between consecutive points in time, NaN values are never reported
+        decreasing = np.flatnonzero(np.diff(values) < 0)
+        self.decreases.extend((int(timestamps[i + 1]), float(values[i]), float(values[i + 1])) for i in decreasing)
+        # Gaps between consecutive entries on the grid
+        grid = timestamps[on_grid]
+        if self._last_on_grid is not None:
+            grid = np.concatenate(([self._last_on_grid], grid))
+        deltas = np.diff(grid)
+        self.gaps.extend((int(grid[i]), int(grid[i + 1]), int(deltas[i] // self._step - 1))
+                         for i in np.flatnonzero(deltas > self._step))
+        if grid.size:
+            self._last_on_grid = grid[-1]
+        self._last = (timestamps[-1], values[-1])
+
+    def summary(self) -> QualitySummary:
+        """Return the counts of the problems found so far."""
+        missing = [gap[2] for gap in self.gaps]
+        return QualitySummary(
+            row_count=self.row_count,
+            first_time=None if self.first is None else _time(self.first),
+            last_time=None if self._last is None else _time(self._last[0]),
+            gaps=len(self.gaps), missing_quarter_hours=sum(missing), longest_gap=max(missing, default=0),
+            duplicates=sum(self.duplicates.values()), decreases=len(self.decreases), off_grid=self.off_grid)
+
+    def problems(self) -> pd.DataFrame:
+        """
+        Return the problems found so far, one row per gap, duplicate point in time and decrease.
+
+        :return: DataFrame with the columns kind (GAP, DUPLICATE or DECREASE), start_time and end_time (the entries
+            enclosing a gap, otherwise the point in time of the problem) and amount (missing quarter hours of a gap,
+            additional entries of a duplicate or the decrease of the meter value), sorted by start_time
+        """
+        rows = [(GAP, start, end, missing) for start, end, missing in self.gaps]
+        rows.extend((DUPLICATE, timestamp, timestamp, count) for timestamp, count in self.duplicates.items())
+        rows.extend((DECREASE, timestamp, timestamp, previous - value) for timestamp, previous, value in self.decreases)
+        df = pd.DataFrame(rows, columns=['kind', 'start_time', 'end_time', 'amount'])
+        df = df.sort_values(['start_time', 'kind'], kind='stable', ignore_index=True)
+        for column in ('start_time', 'end_time'):
+            df[column] = pd.to_datetime(df[column]).dt.strftime(TIME_FORMAT)
+        df['amount'] = df['amount'].astype('float64')
+        return df
+
+
+def meter_quality(dh, meter_id, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Scan all stored entries of a meter in chunks, see MeterScan.
+
+    :param dh: DataHandler of the database
+    :param meter_id: The ID of the meter to be scanned
+    :param chunk_size: Number of meter values read at once
+    :return: Tuple of the QualitySummary and the DataFrame of MeterScan.problems
+    """
+    scan = MeterScan()
+    for df in dh.stored_readings(meter_id, chunk_size):
+        scan.add(df)
+    return scan.summary(), scan.problems()
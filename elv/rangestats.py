@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+
+class RangeStatistics:
+    def __init__(self, series: pd.Series):
+        """
+        Answer min, max, mean and sum queries for arbitrary windows of a time series without touching its values
+        again. Sum and mean are derived from prefix sums in constant time, min and max are looked up in sparse tables
+        of the minima and maxima of all windows with a power of two length, also in constant time. NaN values are
+        ignored like in pandas.
+
+        :param series: Series with a sorted DatetimeIndex
+        """
+        self._index = series.index.values.astype('datetime64[ns]')
+        values = series.to_numpy(dtype='float64')
+        valid = ~np.isnan(values)
+        self._sums = np.concatenate(([0.], np.cumsum(np.where(valid, values, 0.))))
+        self._counts = np.concatenate(([0], np.cumsum(valid)))
+        self._minima = [values]
+        self._maxima = [values]
+        width = 1
+        while 2 * width <= values.size:
+            self._minima.append(np.fmin(self._minima[-1][:-width], self._minima[-1][width:]))
+            self._maxima.append(np.fmax(self._maxima[-1][:-width], self._maxima[-1][width:]))
+            width *= 2
+
+    def window(self, start=None, end=None):
+        """
+        Return the positions of the first value and the one after the last value within [start, end].
+
+        :param start: First timestamp of the window, the window is open to the left if not specified
+        :param end: Last timestamp of the window, the window is open to the right if not specified
+        :return: Tuple of positions (first, stop)
+        """
+        first = 0 if start is None else np.searchsorted(self._index, pd.Timestamp(start).to_datetime64(), 'left')
+        stop = self._index.size if end is None else np.searchsorted(self._index, pd.Timestamp(end).to_datetime64(),
+                                                                    'right')
+        return int(first), int(max(first, stop))
+
+    def min(self, start=None, end=None):
+        """Return the minimum value within [start, end]."""
+        return self._lookup(self._minima, np.fmin, *self.window(start, end))
+
+    def max(self, start=None, end=None):
+        """Return the maximum value within [start, end]."""
+        return self._lookup(self._maxima, np.fmax, *self.window(start, end))
+
+    def sum(self, start=None, end=None):
+        """Return the sum of the values within [start, end]."""
+        first, stop = self.window(start, end)
+        return float(self._sums[stop] - self._sums[first])
+
+    def mean(self, start=None, end=None):
+        """Return the mean of the values within [start, end]."""
+        first, stop = self.window(start, end)
+        count = self._counts[stop] - self._counts[first]
+        return float((self._sums[stop] - self._sums[first]) / count) if count else float('nan')
+
+    @staticmethod
+    def _lookup(table, func, first, stop):
+        """Combine the two overlapping power of two windows covering [first, stop)."""
+        if first == stop:
+            return float('nan')
+        level = (stop - first).bit_length() - 1
+        return float(func(table[level][first], table[level][stop - (1 << level)]))
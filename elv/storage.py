@@ -0,0 +1,223 @@
+import abc
+import json
+import os
+import pathlib
+import shutil
+import time
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from elv import metrics
+
+# Files of the columnar storage, see write_columnar
+MANIFEST_FILE = 'manifest.json'
+TIMESTAMP_FILE = 'datum_zeit.datetime64ns'
+VALUE_FILE = 'obis_180.float64'
+MIDNIGHT_FILE = 'midnight.int64'
+
+# Version of the file layout, storages written with another layout are treated as outdated
+FORMAT_VERSION = 2
+
+NANOSECONDS_PER_DAY = 86400 * 10 ** 9
+
+
+class Storage(abc.ABC):
+    """
+    Source of the meter values of the DataHandler. Readings are returned as a DataFrame with the columns datum_zeit
+    and obis_180, sorted by datum_zeit, which is passed to DataHandler._prepare_dataframe. Subclasses have to implement
+    readings and daily_readings, the other methods have default implementations.
+    """
+
+    @abc.abstractmethod
+    def readings(self, meter_id, start, end) -> pd.DataFrame:
+        """
+        Return the meter values of the given meter between start and end (inclusive).
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first point in time as a string "YYYY-MM-DD HH:MM[:SS]"
+        :param end: The last point in time as a string "YYYY-MM-DD HH:MM[:SS]"
+        :return: DataFrame with the columns datum_zeit and obis_180
+        """
+
+    @abc.abstractmethod
+    def daily_readings(self, meter_id) -> pd.DataFrame:
+        """
+        Return the meter values of the given meter at midnight.
+
+        :param meter_id: The ID of the meter to be queried
+        :return: DataFrame with the columns datum_zeit and obis_180
+        """
+
+    def iter_readings(self, meter_id, start, end, chunk_size) -> Iterator[pd.DataFrame]:
+        """
+        Return the meter values of the given meter between start and end (inclusive) in chunks of at most chunk_size
+        rows, in the format of readings. The default implementation reads all values at once and splits them.
+
+        :param meter_id: The ID of the meter to be queried
+        :param start: The first point in time as a string "YYYY-MM-DD HH:MM[:SS]"
+        :param end: The last point in time as a string "YYYY-MM-DD HH:MM[:SS]"
+        :param chunk_size: Maximum number of rows per chunk
+        :return: Iterator of DataFrames with the columns datum_zeit and obis_180, sorted by datum_zeit
+        """
+        df = self.readings(meter_id, start, end).sort_values('datum_zeit', kind='stable')
+        for first in range(0, len(df), chunk_size):
+            yield df.iloc[first:first + chunk_size]
+
+    def rollup_overview(self, meter_id) -> Optional[pd.DataFrame]:
+        """Return the prepared daily values of the given meter if the storage holds them, otherwise None."""
+        return None
+
+    def portfolio_readings(self, meter_ids, start, end) -> pd.DataFrame:
+        """
+        Return the meter values of all given meters between start and end (inclusive), sorted by meter and point in
+        time. The default implementation reads the meters one after another.
+
+        :param meter_ids: List of meter IDs
+        :param start: The first point in time as a string "YYYY-MM-DD HH:MM[:SS]"
+        :param end: The last point in time as a string "YYYY-MM-DD HH:MM[:SS]"
+        :return: DataFrame with the columns zaehler_id, datum_zeit and obis_180
+        """
+        return _concat_meters((meter_id, self.readings(meter_id, start, end)) for meter_id in sorted(meter_ids))
+
+    def portfolio_daily_readings(self, meter_ids) -> pd.DataFrame:
+        """Return the meter values of all given meters at midnight, in the format of portfolio_readings."""
+        return _concat_meters((meter_id, self.daily_readings(meter_id)) for meter_id in sorted(meter_ids))
+
+    def rollup_portfolio(self, meter_ids) -> Optional[pd.DataFrame]:
+        """
+        Return the daily diffs summed over the given meters if the storage holds the prepared daily values of all of
+        them, otherwise None.
+
+        :param meter_ids: List of meter IDs
+        :return: DataFrame indexed by day with the columns diff, interpolation and meters
+        """
+        return None
+
+    def unique_readings(self) -> bool:
+        """Return whether the storage holds a single entry per meter and point in time."""
+        return False
+
+
+class ColumnarStorage(Storage):
+    def __init__(self, directory):
+        """
+        Storage reading the meter values from memory-mapped arrays instead of SQLite. The timestamps of all meters
+        are stored as datetime64[ns] in one file and the meter values as float64 in another one, both sorted by meter
+        and point in time. The manifest holds the position of each meter within the arrays, so the values of a time
+        span are found by binary search and returned as views of the mapped files without any parsing or copying.
+        The positions of the values at midnight are stored in a third file for the overview. Use
+        DataHandler.build_columnar_storage to export the database.
+
+        :param directory: Directory written by write_columnar
+        """
+        self.directory = pathlib.Path(directory)
+        with open(self.directory / MANIFEST_FILE, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self._meters = {meter_id: tuple(positions) for meter_id, positions in manifest['meters'].items()}
+        if manifest.get('format') != FORMAT_VERSION:
+            self.version = None  # Never matches the version of the database, so it has to be built again
+            self._meters = {}
+        else:
+            self.version = manifest['version']
+        self._timestamps = self._memmap(TIMESTAMP_FILE, 'datetime64[ns]')
+        self._values = self._memmap(VALUE_FILE, 'float64')
+        self._midnight = self._memmap(MIDNIGHT_FILE, 'int64')
+
+    def _memmap(self, filename, dtype):
+        """Map the given file read-only, empty or missing files cannot be mapped."""
+        path = self.directory / filename
+        if not path.exists() or path.stat().st_size == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def _arrays(self, meter_id) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the timestamps and values of the given meter."""
+        first, stop = self._meters.get(meter_id, (0, 0))[:2]
+        return self._timestamps[first:stop], self._values[first:stop]
+
+    @staticmethod
+    def _frame(timestamps, values):
+        """Return the readings in the format of the SQLite storage, the columns are views of the given arrays."""
+        return pd.DataFrame({'datum_zeit': timestamps, 'obis_180': values}, copy=False)
+
+    @staticmethod
+    def _epoch(timestamp):
+        """Return the point in time given as a string as datetime64[ns]."""
+        return pd.Timestamp(timestamp).to_datetime64().astype('datetime64[ns]')
+
+    def readings(self, meter_id, start, end):
+        begin = time.perf_counter()
+        timestamps, values = self._arrays(meter_id)
+        first = np.searchsorted(timestamps, self._epoch(start), 'left')
+        stop = np.searchsorted(timestamps, self._epoch(end), 'right')
+        df = self._frame(timestamps[first:stop], values[first:stop])
+        metrics.observe_query('columnar_readings', time.perf_counter() - begin, len(df))
+        return df
+
+    def iter_readings(self, meter_id, start, end, chunk_size):
+        timestamps, values = self._arrays(meter_id)
+        first = np.searchsorted(timestamps, self._epoch(start), 'left')
+        stop = np.searchsorted(timestamps, self._epoch(end), 'right')
+        for position in range(first, stop, chunk_size):
+            begin = time.perf_counter()
+            df = self._frame(timestamps[position:min(position + chunk_size, stop)],
+                             values[position:min(position + chunk_size, stop)])
+            metrics.observe_query('columnar_iter_readings', time.perf_counter() - begin, len(df))
+            yield df
+
+    def daily_readings(self, meter_id):
+        begin = time.perf_counter()
+        first, stop = self._meters.get(meter_id, (0, 0, 0, 0))[2:]
+        midnight = self._midnight[first:stop]
+        df = self._frame(self._timestamps[midnight], self._values[midnight])
+        metrics.observe_query('columnar_daily_readings', time.perf_counter() - begin, len(df))
+        return df
+
+    def unique_readings(self):
+        return True  # Duplicates are removed by write_columnar
+
+
+def _concat_meters(frames: Iterable[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    """Concatenate the readings of several meters, adding the meter ID as the column zaehler_id."""
+    frames = [df.assign(zaehler_id=meter_id) for meter_id, df in frames]
+    if not frames:
+        return pd.DataFrame({'zaehler_id': [], 'datum_zeit': pd.to_datetime([]), 'obis_180': []})
+    return pd.concat(frames, ignore_index=True)[['zaehler_id', 'datum_zeit', 'obis_180']]
+
+
+def write_columnar(directory, version, meters: Iterable[Tuple[str, pd.DataFrame]]):
+    """
+    Write the columnar storage read by ColumnarStorage. The files are written to a temporary directory first, which
+    then replaces the given directory. Processes that still map the old files keep reading them until they notice
+    the new manifest.
+
+    :param directory: Target directory
+    :param version: Version of the exported meter values, see DataHandler.readings_version
+    :param meters: Pairs of meter ID and DataFrame with the columns datum_zeit and obis_180 sorted by datum_zeit
+    :return: Number of written values
+    """
+    directory = pathlib.Path(directory)
+    tmp_directory = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    tmp_directory.mkdir(parents=True)
+    positions, written = {}, 0
+    midnights = 0
+    with open(tmp_directory / TIMESTAMP_FILE, 'wb') as timestamps, open(tmp_directory / VALUE_FILE, 'wb') as values, \
+            open(tmp_directory / MIDNIGHT_FILE, 'wb') as midnight:
+        for meter_id, df in meters:
+            df = df.loc[~df['datum_zeit'].duplicated(keep='first')]
+            meter_timestamps = df['datum_zeit'].to_numpy(dtype='datetime64[ns]')
+            meter_timestamps.tofile(timestamps)
+            df['obis_180'].to_numpy(dtype='float64').tofile(values)
+            meter_midnight = np.flatnonzero(meter_timestamps.view('int64') % NANOSECONDS_PER_DAY == 0) + written
+            meter_midnight.astype('int64').tofile(midnight)
+            positions[meter_id] = [written, written + len(df), midnights, midnights + len(meter_midnight)]
+            written += len(df)
+            midnights += len(meter_midnight)
+    with open(tmp_directory / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'format': FORMAT_VERSION, 'version': version, 'meters': positions}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    return written
@@ -0,0 +1,83 @@
+import datetime
+import pathlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from dlp import get_default_load_profile
+from elv.datahandler import INDEX_SCHEMA, TABLE_SCHEMA
+
+NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz", "Hoffmann"]
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hannah", "Jonas", "Lena"]
+PLACES = [("79098", "Freiburg"), ("76131", "Karlsruhe"), ("70173", "Stuttgart"), ("68159", "Mannheim"),
+          ("69117", "Heidelberg"), ("78462", "Konstanz"), ("89073", "Ulm"), ("72070", "Tübingen")]
+
+
+def generate_database(path, meters=3, years=1, start='2018-01-01', seed=0, gaps_per_year=12, duplicate_rate=0.005):
+    """
+    Write a database with synthetic quarter hour meter values in the format of itp.db. The consumption of each meter
+    follows the default load profile of a random yearly energy usage with random noise. The history of each meter
+    starts within the first 90 days and ends at the same day for all meters. Outages from a quarter hour up to three
+    days leave gaps in the meter values and a share of the values is stored twice, like in exported databases. The
+    same arguments always result in the same data.
+
+    :param path: Path of the database, which must not exist yet
+    :param meters: Number of meters
+    :param years: Number of years of each meter
+    :param start: First day of the generated period
+    :param seed: Seed of the random number generator
+    :param gaps_per_year: Average number of gaps per meter and year
+    :param duplicate_rate: Share of the values stored twice
+    :return: Number of written meter values
+    """
+    path = pathlib.Path(path)
+    if path.exists():
+        raise ValueError(f"Database {path} already exists.")
+    rng = np.random.default_rng(seed)
+    dlp = get_default_load_profile()
+    start = pd.Timestamp(start)
+    end = start + pd.DateOffset(years=years)
+    con = sqlite3.connect(path)
+    written = 0
+    with con:
+        for statement in TABLE_SCHEMA:
+            con.execute(statement)
+        for number in range(meters):
+            meter_id = f"{number + 1:08d}"
+            plz, ort = PLACES[rng.integers(len(PLACES))]
+            con.execute("INSERT INTO zaehlpunkte (zaehler_id, kunde_name, kunde_vorname, plz, ort) "
+                        "VALUES (?, ?, ?, ?, ?);",
+                        [meter_id, NAMES[rng.integers(len(NAMES))], FIRST_NAMES[rng.integers(len(FIRST_NAMES))], plz,
+                         ort])
+            first_day = start + datetime.timedelta(days=int(rng.integers(90)))
+            readings = _readings(rng, dlp, first_day, end, energy_usage=rng.uniform(1500, 6000), years=years,
+                                 gaps_per_year=gaps_per_year, duplicate_rate=duplicate_rate)
+            con.executemany("INSERT INTO zaehlwerte (zaehler_id, datum_zeit, obis_180) VALUES (?, ?, ?);",
+                            zip([meter_id] * len(readings), readings.index.strftime("%Y-%m-%d %H:%M:%S"),
+                                readings.tolist()))
+            written += len(readings)
+        for statement in INDEX_SCHEMA:
+            con.execute(statement)
+    con.close()
+    return written
+
+
+def _readings(rng, dlp, first_day, end, energy_usage, years, gaps_per_year, duplicate_rate):
+    """Return the meter values of one meter as a series indexed by the point in time."""
+    last_day = end - datetime.timedelta(days=1)
+    consumption = dlp.calculate_profile_range(first_day.strftime("%Y-%m-%d"), last_day.strftime("%Y-%m-%d"),
+                                              energy_usage, shift=True).to_numpy() * 1E-3  # Scale to kWh
+    consumption *= rng.lognormal(0, 0.3, consumption.size)
+    values = np.round(rng.uniform(0, 50000) + np.concatenate(([0.], np.cumsum(consumption))), 3)
+    readings = pd.Series(values, index=pd.date_range(first_day, end, freq='15T'))
+    # Remove the values of random outages, the first and last value are kept
+    keep = np.ones(readings.size, dtype=bool)
+    for _ in range(rng.poisson(gaps_per_year * years)):
+        length = int(rng.choice([rng.integers(1, 8), rng.integers(8, 4 * 24 * 3)], p=[0.7, 0.3]))
+        first = int(rng.integers(1, readings.size - 1))
+        keep[first:min(first + length, readings.size - 1)] = False
+    readings = readings[keep]
+    # Store some values twice, directly after the original
+    duplicates = readings.iloc[np.sort(rng.choice(readings.size, int(readings.size * duplicate_rate), replace=False))]
+    return pd.concat([readings, duplicates]).sort_index(kind='mergesort')
@@ -0,0 +1,107 @@
+import logging
+import math
+import os
+import time
+
+from elv.cache import CACHE_SHARE, ENTRIES_PER_METER
+from elv.datahandler import DataHandler
+
+logger = logging.getLogger(__name__)
+
+# Share of the time the warm-up may spend working, it sleeps for the rest
+DUTY_CYCLE = 0.25
+
+# Seconds between two checks whether the database was modified
+POLL_INTERVAL = 30
+
+# Seconds between two progress reports
+PROGRESS_INTERVAL = 10
+
+
+def max_meters(cache):
+    """
+    Return the number of meters that can be warmed up without evicting values of the warm-up or the requests from
+    the cache, see CACHE_SHARE.
+
+    :param cache: DataCache of the DataHandler
+    :return: Number of meters or None if the cache is unlimited
+    """
+    if cache.threshold is None:
+        return None
+    return int(cache.threshold * CACHE_SHARE) // ENTRIES_PER_METER
+
+
+def warm_up(dh: DataHandler, meter_ids=None, duty_cycle=DUTY_CYCLE, progress=None):
+    """
+    Calculate the metadata, the overview and the yearly energy usage of the given meters, so that they are stored in
+    the cache shared with the uWSGI workers. After each meter, the warm-up sleeps long enough to use at most the given
+    share of the time, so interactive requests are not slowed down. If the cache cannot hold the values of all meters,
+    only the first meters are warmed up, see max_meters, as the cache would otherwise evict the values of the warm-up
+    and the requests again.
+
+    :param dh: DataHandler whose cache is filled
+    :param meter_ids: List of meter IDs, defaults to all meters in the database
+    :param duty_cycle: Share of the time spent working, between 0 (exclusive) and 1
+    :param progress: Function called with the number of finished meters and the number of all meters
+    :return: Number of meters that could be calculated
+    """
+    if not 0 < duty_cycle <= 1:
+        raise ValueError(f"Invalid duty cycle {duty_cycle}.")
+    meter_ids = dh.meters_in_database() if meter_ids is None else meter_ids
+    limit = max_meters(dh.cache)
+    if limit is not None and len(meter_ids) > limit:
+        logger.warning("The cache holds at most %d values, only %d of %d meters are warmed up. Set ELV_CACHE_THRESHOLD "
+                       "to at least %d to warm up all meters.", dh.cache.threshold, limit, len(meter_ids),
+                       math.ceil(len(meter_ids) * ENTRIES_PER_METER / CACHE_SHARE))
+        meter_ids = meter_ids[:limit]
+    finished = 0
+    for number, meter_id in enumerate(meter_ids, 1):
+        start = time.perf_counter()
+        try:
+            dh.metadata(meter_id)
+            dh.overview(meter_id)
+            dh.yearly_energy_usage(meter_id)
+            finished += 1
+        except ValueError as e:  # E.g. a meter without any values
+            logger.warning("Warm-up of meter %s failed: %s", meter_id, e)
+        if progress is not None:
+            progress(number, len(meter_ids))
+        time.sleep((time.perf_counter() - start) * (1 - duty_cycle) / duty_cycle)
+    return finished
+
+
+def log_progress(interval=PROGRESS_INTERVAL):
+    """Return a progress function for warm_up logging the progress at most every interval seconds."""
+    last = [0.]
+
+    def progress(finished, total):
+        if finished == total or time.monotonic() - last[0] >= interval:
+            last[0] = time.monotonic()
+            logger.info("Warm-up: %d of %d meters (%.0f %%)", finished, total, 100 * finished / total)
+    return progress
+
+
+def run(once=False, poll_interval=POLL_INTERVAL, duty_cycle=None):
+    """
+    Warm up the cache for all meters and again whenever the database is modified. Intended to run in a separate
+    process with a low priority, e.g. as a uWSGI mule, see warmup.py.
+
+    :param once: Return after the first warm-up instead of waiting for modifications
+    :param poll_interval: Seconds between two checks whether the database was modified
+    :param duty_cycle: Share of the time spent working, defaults to ELV_WARMUP_DUTY_CYCLE or DUTY_CYCLE
+    """
+    if duty_cycle is None:
+        duty_cycle = float(os.environ.get('ELV_WARMUP_DUTY_CYCLE', DUTY_CYCLE))
+    if hasattr(os, 'nice'):
+        os.nice(10)
+    dh = DataHandler()
+    version = None
+    while True:
+        if dh.data_version() != version:
+            version = dh.data_version()
+            start = time.perf_counter()
+            finished = warm_up(dh, duty_cycle=duty_cycle, progress=log_progress())
+            logger.info("Warm-up of %d meters finished in %.1f s", finished, time.perf_counter() - start)
+        if once:
+            return
+        time.sleep(poll_interval)
@@ -0,0 +1,48 @@
+import pathlib
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from flask_caching.backends import NullCache
+
+from elv.cache import DataCache
+from elv.datahandler import DataHandler
+from elv.synthetic import generate_database
+
+
+class SyntheticDatabaseTestCase(TestCase):
+    """
+    Test case with a DataHandler without cache on a synthetic database of one year, which is generated once for all
+    tests of the class. The attributes db_path, dh and meter (the first meter) are set for the tests. The database is
+    shared, so tests writing to it have to work on a copy, see copy_database.
+    """
+    meters = 1
+    seed = 0
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.db_path = pathlib.Path(cls.tmp_dir.name) / 'test.db'
+        generate_database(cls.db_path, meters=cls.meters, years=1, start='2018-01-01', seed=cls.seed)
+        cls.dh = cls.handler(cls.db_path)
+        cls.meter = cls.dh.meters_in_database()[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    @staticmethod
+    def handler(db_path):
+        """Return a DataHandler without cache on the given database."""
+        return DataHandler(cache=DataCache(NullCache()), db_path=db_path)
+
+    def copy_database(self):
+        """Return the path of a copy of the shared database, which is removed after the test."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        db_path = pathlib.Path(tmp_dir.name) / 'test.db'
+        source, copy = sqlite3.connect(self.db_path), sqlite3.connect(db_path)
+        source.backup(copy)
+        source.close()
+        copy.close()
+        return db_path
@@ -0,0 +1,43 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from flask_caching.backends import NullCache, SimpleCache
+
+from elv.cache import DEFAULT_THRESHOLD, DataCache, LRUStore, cache_from_env
+
+
+class TestDataCache(TestCase):
+    def test_get_or_set(self):
+        cache = DataCache(SimpleCache())
+        calls = []
+        for _ in range(3):
+            self.assertEqual(cache.get_or_set('key', lambda: calls.append(1) or 'value'), 'value')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1})
+
+    def test_null_cache(self):
+        cache = DataCache(NullCache())
+        cache.get_or_set('key', lambda: 'value')
+        self.assertEqual(cache.get_or_set('key', lambda: 'value'), 'value')
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 2})
+
+    def test_threshold_from_meters(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {'ELV_CACHE_DIR': directory}):
+            os.environ.pop('ELV_CACHE_THRESHOLD', None)
+            self.assertEqual(cache_from_env(10).threshold, DEFAULT_THRESHOLD)
+            # Three values per meter in half of the cache, see elv.warmup
+            self.assertEqual(cache_from_env(1000).threshold, 6000)
+            os.environ['ELV_CACHE_THRESHOLD'] = '100'
+            self.assertEqual(cache_from_env(1000).threshold, 100)
+
+
+class TestLRUStore(TestCase):
+    def test_eviction(self):
+        store = LRUStore(2)
+        store['a'], store['b'] = 1, 2
+        self.assertEqual(store.get('a'), 1)  # Marks a as recently used
+        store['c'] = 3
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual((store.get('a'), store.get('c')), (1, 3))
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import TestCase
+
+from elv.datahandler import ConnectionPool
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'test.db')
+        con = sqlite3.connect(self.db_path)
+        con.execute("CREATE TABLE zaehlpunkte (zaehler_id TEXT);")
+        con.execute("INSERT INTO zaehlpunkte VALUES ('1');")
+        con.commit()
+        con.close()
+        self.pool = ConnectionPool(self.db_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_connection_reused_per_thread(self):
+        con = self.pool.connection()
+        self.assertIs(con, self.pool.connection())
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.pool.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(con, other[0])
+        stats = self.pool.stats()
+        self.assertEqual(stats['opened'], 2)
+        self.assertEqual(stats['reused'], 1)
+
+    def test_connection_read_only(self):
+        con = self.pool.connection()
+        self.assertEqual(con.execute("SELECT zaehler_id FROM zaehlpunkte;").fetchall(), [('1',)])
+        with self.assertRaises(sqlite3.OperationalError):
+            con.execute("INSERT INTO zaehlpunkte VALUES ('2');")
+
+    def test_reset_after_fork(self):
+        con = self.pool.connection()
+        self.pool._pid = -1  # Simulate a forked process
+        self.assertIsNot(con, self.pool.connection())
+        self.assertEqual(self.pool.stats()['opened'], 1)
+
+    def test_invalid_pragma(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.db_path, {'cache_size': '1; DROP TABLE zaehlpunkte'})
@@ -1,9 +1,105 @@
-import elv
+import os
+import sqlite3
+from unittest import TestCase, mock
 
+import numpy as np
+import pandas as pd
 
-class TestStatistics:
-    dh = elv.datahandler.DataHandler()
-    assert dh.min("2018-10-11", "2018-11-02") == 3.38
-    assert dh.max("2018-10-11", "2018-11-02") == 17.99
-    assert dh.mean("2018-10-11", "2018-11-02") == 7.23
-    assert dh.sum("2018-10-11", "2018-11-02") == 141.98
+from elv.datahandler import DataHandler, SQLiteStorage
+from elv.storage import ColumnarStorage
+from tests.database import SyntheticDatabaseTestCase
+
+
+class TestDataHandler(SyntheticDatabaseTestCase):
+    meters = 2
+    seed = 1
+
+    def test_metadata(self):
+        con = sqlite3.connect(self.db_path)
+        first, last, count = con.execute("SELECT date(min(datum_zeit)), date(max(datum_zeit)), count(*) "
+                                         "FROM zaehlwerte WHERE zaehler_id = (?);", [self.meter]).fetchone()
+        con.close()
+        metadata = self.dh.metadata(self.meter)
+        self.assertEqual((metadata.first_date, metadata.last_date, metadata.row_count), (first, last, count))
+        self.assertEqual(metadata.available_years, ['2018', '2019'])
+        self.assertEqual(len(self.dh.meter_info(self.meter)), 4)
+        with self.assertRaises(ValueError):
+            self.dh.metadata('unknown')
+
+    def test_day(self):
+        df = self.dh.day(self.meter, '2018-10-28')
+        self.assertEqual(len(df), 96)
+        self.assertEqual(str(df.index[0]), '2018-10-28 00:00:00')
+        self.assertEqual(str(df.index[-1]), '2018-10-28 23:45:00')
+        self.assertFalse(df['diff'].isna().any())
+        self.assertTrue((df['diff'] >= 0).all())
+
+    def test_statistics(self):
+        start, end = "2018-10-11", "2018-11-02"
+        diff = self.dh.overview(self.meter).loc[start:end, 'diff']
+        self.assertAlmostEqual(self.dh.min(self.meter, start, end), round(diff.min(), 2))
+        self.assertAlmostEqual(self.dh.max(self.meter, start, end), round(diff.max(), 2))
+        self.assertAlmostEqual(self.dh.mean(self.meter, start, end), round(diff.mean(), 2))
+        self.assertAlmostEqual(self.dh.sum(self.meter, start, end), round(diff.sum(), 2), delta=0.011)
+
+    def test_duplicates_removed(self):
+        self.assertFalse(self.dh.unique_readings())
+        df = self.dh.interval(self.meter, '2018-04-01', '2018-12-01')
+        self.assertTrue(df.index.is_unique)
+        self.assertTrue(np.all(np.diff(df.index.values) == np.timedelta64(15, 'm')))
+
+    def test_rollup(self):
+        db_path = self.copy_database()
+        # Daily values prepared from the stored meter values at midnight
+        con = sqlite3.connect(db_path)
+        readings = pd.read_sql("SELECT datum_zeit, obis_180 FROM zaehlwerte WHERE zaehler_id = (?) "
+                               "AND time(datum_zeit) = '00:00:00';", con, params=[self.meter],
+                               parse_dates=['datum_zeit'])
+        con.close()
+        expected = DataHandler._prepare_dataframe(readings, 'D')
+        dh = self.handler(db_path)
+        self.assertGreater(dh.update_rollup([self.meter]), 0)
+        df = dh.overview(self.meter)
+        self.assertTrue(np.allclose(df['diff'], expected['diff'], equal_nan=True))
+        self.assertTrue(df['interpolation'].equals(expected['interpolation']))
+        self.assertAlmostEqual(dh.yearly_energy_usage(self.meter), dh.energy_usage_from_overview(expected))
+
+    def test_portfolio(self):
+        meters = self.dh.meters_in_database()
+        start, end = '2018-04-01', '2018-04-15'
+        df = self.dh.portfolio_interval(meters, start, end)
+        expected = pd.concat([self.dh.interval(m, start, end)['diff'] for m in meters], axis=1).sum(axis=1, min_count=1)
+        self.assertTrue(np.allclose(df['diff'], expected.reindex(df.index), equal_nan=True))
+        self.assertEqual(df['meters'].max(), len(meters))
+        df = self.dh.portfolio_overview(meters)
+        expected = pd.concat([self.dh.overview(m)['diff'] for m in meters], axis=1).sum(axis=1, min_count=1)
+        self.assertTrue(np.allclose(df['diff'], expected.reindex(df.index), equal_nan=True))
+        self.assertTrue(df.equals(self.dh.portfolio_overview(meters[::-1])))
+        with self.assertRaises(ValueError):
+            self.dh.portfolio_overview([])
+
+    def test_iter_interval(self):
+        start, end = '2018-03-20', '2018-04-10'
+        expected = self.dh.interval(self.meter, start, end)
+        for chunk_size in (1, 7, 500, 100000):
+            df = pd.concat(self.dh.iter_interval(self.meter, start, end, chunk_size))
+            self.assertTrue(df.equals(expected), chunk_size)
+
+    def test_columnar_storage(self):
+        db_path = self.copy_database()
+        directory = db_path.parent / 'columnar'
+        with mock.patch.dict(os.environ, {'ELV_STORAGE': 'columnar', 'ELV_COLUMNAR_DIR': str(directory)}):
+            dh = self.handler(db_path)
+        with self.assertWarns(RuntimeWarning):
+            self.assertIsInstance(dh.storage(), SQLiteStorage)
+        dh.build_columnar_storage()
+        self.assertIsInstance(dh.storage(), ColumnarStorage)
+        # Writing other tables than zaehlwerte does not outdate the columnar storage
+        dh.update_rollup([self.meter])
+        self.assertIsInstance(dh.storage(), ColumnarStorage)
+        con = sqlite3.connect(db_path)
+        with con:
+            con.execute("INSERT INTO zaehlwerte (zaehler_id, datum_zeit, obis_180) VALUES ('new', '2020-01-01', 0);")
+        con.close()
+        with self.assertWarns(RuntimeWarning):
+            self.assertIsInstance(dh.storage(), SQLiteStorage)
@@ -17,3 +17,11 @@ class TestDefaultLoadProfile(TestCase):
         calc_data = self.dlp.calculate_profile(sample_df.iloc[selection]['date'], 1000)
         sample_data = sample_df.iloc[selection][1:].astype('float64')
         self.assertTrue(np.allclose(calc_data.values, sample_data.values, rtol=0.1))
+
+    def test_calculate_profile_range(self):
+        for shift in (False, True):
+            calc_data = self.dlp.calculate_profile_range('2019-12-20', '2020-04-05', 3500, shift=shift)
+            sample_data = pd.concat([self.dlp.calculate_profile(d.strftime('%Y-%m-%d'), 3500, shift=shift)
+                                     for d in pd.date_range('2019-12-20', '2020-04-05')])
+            self.assertTrue(calc_data.index.equals(sample_data.index))
+            self.assertTrue(np.array_equal(calc_data.values, sample_data.values))
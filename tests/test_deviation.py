@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from elv.deviation import deviation_metrics
+from tests.database import SyntheticDatabaseTestCase
+
+
+class TestDeviationMetrics(TestCase):
+    def test_metrics(self):
+        index = pd.date_range('2020-01-01', periods=4, freq='15T')
+        load = pd.Series([1., 3., np.nan, 2.], index=index)
+        profile = pd.Series([1., 1., 1., 0.5], index=index)
+        df = deviation_metrics(load, profile, ['a', 'a', 'a', 'b'])
+        self.assertAlmostEqual(df.loc['a', 'rmse'], np.sqrt(2))
+        self.assertAlmostEqual(df.loc['a', 'peak_ratio'], 3)
+        self.assertAlmostEqual(df.loc['a', 'energy_delta'], 2)
+        self.assertEqual(df.loc['a', 'quarter_hours'], 2)
+        self.assertAlmostEqual(df.loc['b', 'peak_ratio'], 4)
+
+
+class TestUpdateDeviations(SyntheticDatabaseTestCase):
+    meters = 3
+    seed = 3
+
+    def test_update_deviations(self):
+        dh = self.handler(self.copy_database())
+        self.assertEqual(dh.deviation_years(), [])
+        self.assertEqual(dh.update_deviations(workers=2), 3)
+        self.assertEqual(dh.deviation_years(), ['2018'])
+        ranking = dh.deviations(2018)
+        self.assertEqual(sorted(ranking['zaehler_id']), dh.meters_in_database())
+        self.assertTrue(ranking['rmse'].is_monotonic_decreasing)
+        meter = ranking['zaehler_id'].iloc[0]
+        days = dh.deviation_days(meter, '2018-01-01', '2018-12-31')
+        self.assertEqual(days['quarter_hours'].sum(), ranking['quarter_hours'].iloc[0])
+        # Running it again in the calling process replaces the stored values
+        self.assertEqual(dh.update_deviations([meter], workers=1), 1)
+        self.assertTrue(dh.deviations(2018).equals(ranking))
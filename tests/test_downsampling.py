@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+import numpy as np
+
+from elv.downsampling import minmax_downsample
+
+
+class TestMinmaxDownsample(TestCase):
+    def test_short_series(self):
+        np.testing.assert_array_equal(minmax_downsample(np.arange(10.), 20), np.arange(10))
+
+    def test_peaks_are_kept(self):
+        rng = np.random.default_rng(0)
+        values = rng.uniform(0, 1, 10000)
+        values[[1234, 8765]] = [5, -5]
+        values[[10, 20]] = np.nan
+        positions = minmax_downsample(values, 500)
+        self.assertLessEqual(positions.size, 500)
+        self.assertTrue(np.all(np.diff(positions) > 0))
+        self.assertIn(1234, positions)
+        self.assertIn(8765, positions)
+        self.assertFalse(np.isnan(values[positions]).any())
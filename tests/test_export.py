@@ -0,0 +1,53 @@
+import io
+
+import flask
+import pandas as pd
+
+from elv import export
+from tests.database import SyntheticDatabaseTestCase
+
+
+class TestExport(SyntheticDatabaseTestCase):
+    seed = 2
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        server = flask.Flask(__name__)
+        export.init_app(server, cls.dh)
+        cls.client = server.test_client()
+
+    def test_csv(self):
+        response = self.client.get(f'/export/{self.meter}?start=2018-02-01&end=2018-02-02&dlp=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        df = pd.read_csv(io.StringIO(response.get_data(as_text=True)), parse_dates=['date_time'])
+        self.assertEqual(list(df.columns), export.COLUMNS + ['dlp'])
+        self.assertEqual(len(df), 2 * 96)
+        self.assertEqual(str(df['date_time'].iloc[-1]), '2018-02-02 23:45:00')
+        expected = self.dh.interval(self.meter, '2018-02-01', '2018-02-03')
+        self.assertTrue(((df['diff'] - expected['diff'].to_numpy()).abs() < 1E-6).all())
+        self.assertFalse(df['dlp'].isna().any())
+
+    def test_chunks_match_single_frame(self):
+        frames = list(export.export_frames(self.dh, self.meter, '2018-01-01', '2018-03-01', chunk_size=1000))
+        self.assertGreater(len(frames), 1)
+        expected = self.dh.interval(self.meter, '2018-01-01', '2018-03-01')[export.COLUMNS]
+        self.assertTrue(pd.concat(frames).equals(expected))
+
+    def test_parquet(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        response = self.client.get(f'/export/{self.meter}?start=2018-02-01&end=2018-02-28&format=parquet')
+        self.assertEqual(response.status_code, 200)
+        df = pd.read_parquet(io.BytesIO(response.get_data()))
+        self.assertEqual(list(df.columns), export.COLUMNS)
+        self.assertEqual(len(df), 28 * 96)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/export/unknown').status_code, 404)
+        self.assertEqual(self.client.get(f'/export/{self.meter}?format=xlsx').status_code, 400)
+        self.assertEqual(self.client.get(f'/export/{self.meter}?start=01.02.2018').status_code, 400)
+        self.assertEqual(self.client.get(f'/export/{self.meter}?start=2018-05-02&end=2018-05-01').status_code, 400)
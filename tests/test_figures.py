@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from elv import figures
+
+
+class TestFigures(TestCase):
+    def test_json_values(self):
+        self.assertEqual(figures.json_values(np.array([1.5, np.nan, 2])), [1.5, None, 2.0])
+        self.assertEqual(json.dumps(figures.json_values(pd.Series([np.nan]))), '[null]')
+
+    def test_json_dates(self):
+        index = pd.date_range('2020-01-01 23:45', periods=2, freq='15T')
+        self.assertEqual(figures.json_dates(index, 'm'), ['2020-01-01T23:45', '2020-01-02T00:00'])
+        self.assertEqual(figures.json_dates(index, 'D'), ['2020-01-01', '2020-01-02'])
+
+    def test_templates_unchanged(self):
+        template = json.dumps(figures._template('detail')['layout'], sort_keys=True)
+        layout = figures.detail_layout('2020-01-01')
+        self.assertIn('2020', layout['title']['text'])
+        self.assertEqual(json.dumps(figures._template('detail')['layout'], sort_keys=True), template)
+        self.assertNotIn('title', figures.empty_graph()['layout'])
+
+    def test_load_figure_window(self):
+        index = pd.date_range('2012-01-01', '2019-12-31', freq='D')
+        overview = pd.DataFrame({'diff': np.arange(len(index), dtype='float64'), 'interpolation': False}, index=index)
+        quarter_hours = pd.date_range('2012-01-01', '2019-12-31', freq='15T')
+        high_resolution = pd.DataFrame({'diff': np.arange(len(quarter_hours), dtype='float64'),
+                                        'interpolation': False}, index=quarter_hours)
+
+        def interval(start, end):
+            return high_resolution[start:end]
+
+        for start, end, unit in ((datetime(2014, 1, 1), datetime(2014, 6, 1), 'D'),
+                                 (datetime(2014, 1, 1), datetime(2014, 1, 21), 'm')):
+            df = overview if unit == 'D' else high_resolution
+            x = figures.load_figure(overview, interval, start, end)['data'][0]['x']
+            # All values of the visible interval and only the margins around it are shown
+            visible = figures.json_dates(df[start:end].index, unit)
+            self.assertEqual([value for value in x if visible[0] <= value <= visible[-1]], visible)
+            margin = end - start
+            self.assertGreaterEqual(x[0], figures.json_dates(pd.DatetimeIndex([start - margin]), unit)[0])
+            self.assertLessEqual(x[-1], figures.json_dates(pd.DatetimeIndex([end + margin]), unit)[0])
+        # Without an interval, the whole history is downsampled
+        x = figures.load_figure(overview, interval)['data'][0]['x']
+        self.assertLessEqual(len(x), figures.MAX_POINTS)
+        self.assertEqual((x[0], x[-1]), ('2012-01-01', '2019-12-31'))
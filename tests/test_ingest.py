@@ -0,0 +1,63 @@
+import io
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from elv import ingest
+
+READINGS = """zaehler_id,datum_zeit,obis_180
+M1,2020-01-01 00:00:00,100.0
+M1,2020-01-01T00:15,100.5
+M1,2020-01-01 00:15:00,999.0
+M2,2020-01-01 00:00,5
+"""
+
+METERS = """zaehler_id,kunde_name,kunde_vorname,plz,ort
+M1,Muster,Max,12345,Musterstadt
+"""
+
+
+class TestIngest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.con = ingest.connect(os.path.join(self.tmp_dir.name, 'test.db'))
+
+    def tearDown(self):
+        self.con.close()
+        self.tmp_dir.cleanup()
+
+    def test_duplicates_ignored(self):
+        result = ingest.ingest_readings(self.con, io.StringIO(READINGS), batch_size=2)
+        self.assertEqual((result.rows_read, result.rows_inserted, result.duplicates), (4, 3, 1))
+        self.assertEqual(result.meter_ids, {'M1', 'M2'})
+        self.assertEqual(self.con.execute("SELECT obis_180 FROM zaehlwerte WHERE zaehler_id = 'M1' "
+                                          "AND datum_zeit = '2020-01-01 00:15:00';").fetchall(), [(100.5,)])
+        # Ingesting the same file again does not add any entries
+        result = ingest.ingest_readings(self.con, io.StringIO(READINGS))
+        self.assertEqual(result.rows_inserted, 0)
+        self.assertEqual(self.con.execute("PRAGMA journal_mode;").fetchone()[0], 'wal')
+
+    def test_meters(self):
+        ingest.ingest_readings(self.con, io.StringIO(READINGS))
+        self.assertEqual(ingest.ingest_meters(self.con, io.StringIO(METERS)), 1)
+        self.assertEqual(self.con.execute("SELECT * FROM zaehlpunkte ORDER BY zaehler_id;").fetchall(),
+                         [('M1', 'Muster', 'Max', '12345', 'Musterstadt'), ('M2', None, None, None, None)])
+
+    def test_existing_duplicates_removed(self):
+        path = os.path.join(self.tmp_dir.name, 'existing.db')
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE zaehlwerte (zaehler_id TEXT, datum_zeit TEXT, obis_180 REAL);")
+        con.executemany("INSERT INTO zaehlwerte VALUES (?, ?, ?);",
+                        [('M1', '2020-01-01 00:00:00', 1.0), ('M1', '2020-01-01 00:00:00', 2.0)])
+        con.commit()
+        con.close()
+        con = ingest.connect(path)
+        self.assertEqual(con.execute("SELECT obis_180 FROM zaehlwerte;").fetchall(), [(1.0,)])
+        con.close()
+
+    def test_invalid_reading(self):
+        with self.assertRaises(ValueError):
+            ingest.ingest_readings(self.con, io.StringIO("zaehler_id,datum_zeit,obis_180\nM1,01.01.2020,1\n"))
+        with self.assertRaises(ValueError):
+            ingest.ingest_readings(self.con, io.StringIO("zaehler_id,obis_180\nM1,1\n"))
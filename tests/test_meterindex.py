@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from elv.meterindex import MeterIndex
+
+
+class TestMeterIndex(TestCase):
+    def setUp(self):
+        self.index = MeterIndex([
+            ('1001', 'Müller', 'Hans', '60311', 'Frankfurt am Main'),
+            ('1002', 'Schmidt', 'Anna', '10115', 'Berlin'),
+            ('2001', 'Mueller', 'Petra', '60311', 'Frankfurt am Main'),
+            ('3001', None, None, None, None),
+        ])
+
+    def test_prefix(self):
+        self.assertEqual([m for m, _ in self.index.search('10', 10)], ['1001', '1002'])
+        self.assertEqual([m for m, _ in self.index.search('frank', 10)], ['1001', '2001'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual([m for m, _ in self.index.search('frankfurt petra', 10)], ['2001'])
+        self.assertEqual(self.index.search('berlin petra', 10), [])
+
+    def test_ranking_and_normalization(self):
+        # Accents are removed, the word matches come before the substring matches
+        self.assertEqual([m for m, _ in self.index.search('muller', 10)], ['1001'])
+        self.assertEqual([m for m, _ in self.index.search('ller', 10)], ['1001', '2001'])
+        self.assertEqual([m for m, _ in self.index.search('001', 10)], ['1001', '2001', '3001'])
+        self.assertEqual([m for m, _ in self.index.search('001', 2)], ['1001', '2001'])
+
+    def test_labels(self):
+        self.assertEqual(self.index.label('1002'), "1002 (Anna Schmidt, 10115 Berlin)")
+        self.assertEqual(self.index.label('3001'), "3001")
+        self.assertEqual(self.index.label('unknown'), "unknown")
+        self.assertEqual(self.index.search('  ', 10), [])
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, mock
+
+import flask
+
+from elv import metrics
+
+
+class TestMetrics(TestCase):
+    def test_histogram(self):
+        histogram = metrics.Histogram('test_duration_seconds', "Test.", 'name', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, 'a')
+        text = metrics.exposition()
+        self.assertIn('# TYPE test_duration_seconds histogram', text)
+        self.assertIn('test_duration_seconds_bucket{name="a",le="0.1"} 1', text)
+        self.assertIn('test_duration_seconds_bucket{name="a",le="1"} 2', text)
+        self.assertIn('test_duration_seconds_bucket{name="a",le="+Inf"} 3', text)
+        self.assertIn('test_duration_seconds_count{name="a"} 3', text)
+
+    def test_metrics_route(self):
+        server = flask.Flask(__name__)
+        metrics.init_app(server)
+
+        @server.route('/day')
+        @metrics.timed_callback
+        def day_callback(date='2020-01-01', meter='M1'):
+            return date
+
+        client = server.test_client()
+        self.assertEqual(client.get('/day').status_code, 200)
+        response = client.get('/metrics')
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        self.assertIn('elv_callback_duration_seconds_count{callback="day_callback"} 1', text)
+        self.assertIn('elv_callback_overhead_seconds_count{callback="day_callback"} 1', text)
+        self.assertIn('elv_request_duration_seconds_count{endpoint="day_callback"} 1', text)
+
+    def test_exited_workers(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {'ELV_METRICS_DIR': directory}):
+            # Observations of a worker that exited without removing its file
+            process = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True,
+                                     check=True, text=True)
+            path = os.path.join(directory, f"{process.stdout.strip()}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'elv_figure_duration_seconds': {'exited': [0] * 15 + [1., 1]}}, f)
+            self.assertNotIn('exited', metrics.exposition())
+            self.assertFalse(os.path.exists(path))
+            self.assertTrue(os.path.exists(os.path.join(directory, f"{os.getpid()}.json")))
+            metrics._remove_dump()
+            self.assertEqual(os.listdir(directory), [])
@@ -0,0 +1,12 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+
+class TestStartup(TestCase):
+    def test_import_is_lazy(self):
+        # A new interpreter is required, as the test modules have already imported pandas
+        code = ("import sys, elv, elv.metrics; "
+                "print(sorted({'pandas', 'elv.datahandler'} & set(sys.modules)))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), '[]')
@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from elv.datahandler import DataHandler
+
+
+def reference_prepare_dataframe(df, frequency):
+    """The former pandas implementation of DataHandler._prepare_dataframe."""
+    df = df.set_index('datum_zeit')
+    df = df.loc[~df.index.duplicated(keep='first')]
+    idx = pd.date_range(df.index.min(), df.index.max(), freq=frequency)
+    df = df.reindex(idx)
+    df['interpolation'] = df['obis_180'].isna()
+    df = df.interpolate()
+    df['diff'] = df['obis_180'].diff().shift(-1)
+    df.drop(df.tail(1).index, inplace=True)
+    df['date_time'] = df.index
+    return df
+
+
+class TestPrepareDataframe(TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def readings(self, frequency, periods, start='2020-03-28 00:00'):
+        """Return random readings with gaps, duplicates, values between the grid points and missing values."""
+        idx = pd.date_range(start, periods=periods, freq=frequency)
+        df = pd.DataFrame({'datum_zeit': idx, 'obis_180': np.cumsum(self.rng.uniform(0, 1, periods)) + 1000})
+        df = df.iloc[np.sort(self.rng.choice(periods, periods * 3 // 4, replace=False))]
+        df.loc[df.sample(frac=0.05, random_state=1).index, 'obis_180'] = np.nan
+        duplicates = df.sample(frac=0.05, random_state=2).assign(obis_180=-1.)
+        between = df.sample(frac=0.02, random_state=3)
+        between = between.assign(datum_zeit=between['datum_zeit'] + pd.Timedelta(minutes=7))
+        return pd.concat([df, duplicates, between]).sort_values('datum_zeit', kind='mergesort')
+
+    def assert_equivalent(self, df, frequency):
+        expected = reference_prepare_dataframe(df, frequency)
+        result = DataHandler._prepare_dataframe(df, frequency)
+        pd.testing.assert_frame_equal(result, expected, check_freq=False)
+        self.assertEqual(list(result.columns), ['obis_180', 'interpolation', 'diff', 'date_time'])
+
+    def test_quarter_hours(self):
+        for periods in (2, 97, 2000):
+            self.assert_equivalent(self.readings('15T', periods), '15T')
+
+    def test_days(self):
+        self.assert_equivalent(self.readings('D', 800), 'D')
+
+    def test_missing_values_at_the_borders(self):
+        df = self.readings('15T', 97)
+        df.iloc[[0, 1, -1], df.columns.get_loc('obis_180')] = np.nan
+        self.assert_equivalent(df, '15T')
+
+    def test_without_deduplication(self):
+        df = self.readings('15T', 500).drop_duplicates('datum_zeit')
+        shuffled = df.sample(frac=1, random_state=4)
+        pd.testing.assert_frame_equal(DataHandler._prepare_dataframe(shuffled, '15T', deduplicate=False),
+                                      DataHandler._prepare_dataframe(df, '15T'))
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from elv.quality import DECREASE, DUPLICATE, GAP, MeterScan
+from tests.database import SyntheticDatabaseTestCase
+
+
+def readings(*entries):
+    return pd.DataFrame({'datum_zeit': pd.to_datetime([e[0] for e in entries]),
+                         'obis_180': [float(e[1]) for e in entries]})
+
+
+class TestMeterScan(TestCase):
+    df = readings(('2020-01-01 00:00', 1), ('2020-01-01 00:15', 2), ('2020-01-01 00:15', 5),
+                  ('2020-01-01 01:00', 4), ('2020-01-01 01:07', 4.5), ('2020-01-01 01:15', 3),
+                  ('2020-01-01 01:15', 3), ('2020-01-01 01:30', 3.5))
+
+    def test_scan(self):
+        scan = MeterScan()
+        scan.add(self.df)
+        summary = scan.summary()
+        self.assertEqual(summary.row_count, 8)
+        self.assertEqual((summary.first_time, summary.last_time), ('2020-01-01 00:00:00', '2020-01-01 01:30:00'))
+        self.assertEqual((summary.gaps, summary.missing_quarter_hours, summary.longest_gap), (1, 2, 2))
+        self.assertEqual((summary.duplicates, summary.decreases, summary.off_grid), (2, 1, 1))
+        problems = scan.problems()
+        self.assertEqual(problems['kind'].tolist(), [DUPLICATE, GAP, DECREASE, DUPLICATE])
+        self.assertEqual(problems.loc[1, ['start_time', 'end_time', 'amount']].tolist(),
+                         ['2020-01-01 00:15:00', '2020-01-01 01:00:00', 2.])
+        self.assertEqual(problems.loc[2, 'amount'], 1.5)  # The first entry of each point in time is used
+
+    def test_chunks(self):
+        expected = MeterScan()
+        expected.add(self.df)
+        for chunk_size in (1, 2, 3):
+            scan = MeterScan()
+            for first in range(0, len(self.df), chunk_size):
+                scan.add(self.df.iloc[first:first + chunk_size])
+            self.assertEqual(scan.summary(), expected.summary())
+            self.assertTrue(scan.problems().equals(expected.problems()))
+
+    def test_unsorted(self):
+        with self.assertRaises(ValueError):
+            MeterScan().add(self.df.iloc[::-1])
+
+
+class TestUpdateQuality(SyntheticDatabaseTestCase):
+    meters = 3
+    seed = 5
+
+    def test_update_quality(self):
+        dh = self.handler(self.copy_database())
+        meter = dh.meters_in_database()[0]
+        self.assertIsNone(dh.data_quality(meter))
+        self.assertEqual(dh.update_quality(workers=2), 3)
+        summary = dh.data_quality(meter)
+        self.assertEqual(summary.row_count, dh.metadata(meter).row_count)
+        self.assertGreater(summary.gaps, 0)
+        self.assertGreater(summary.duplicates, 0)
+        # The gaps are the quarter hours interpolated when the values are read
+        df = dh.interval(meter, summary.first_time, summary.last_time)
+        self.assertEqual(df['interpolation'].sum(), summary.missing_quarter_hours)
+        problems = dh.data_problems(meter, summary.first_time, summary.last_time)
+        self.assertEqual(problems[problems['kind'] == GAP]['amount'].sum(), summary.missing_quarter_hours)
+        self.assertEqual(problems[problems['kind'] == DUPLICATE]['amount'].sum(), summary.duplicates)
+        # Scanning again in the calling process replaces the stored problems
+        self.assertEqual(dh.update_quality([meter], workers=1), 1)
+        self.assertEqual(dh.data_quality(meter), summary)
+        self.assertTrue(dh.data_problems(meter, summary.first_time, summary.last_time).equals(problems))
+
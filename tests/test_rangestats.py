@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from elv.rangestats import RangeStatistics
+
+
+class TestRangeStatistics(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        values = rng.uniform(0, 30, 1000)
+        values[[5, 500]] = np.nan
+        self.series = pd.Series(values, index=pd.date_range('2018-01-01', periods=1000, freq='D'))
+        self.statistics = RangeStatistics(self.series)
+
+    def test_windows(self):
+        rng = np.random.default_rng(1)
+        for _ in range(200):
+            start, end = sorted(self.series.index[0] + pd.to_timedelta(rng.integers(-100, 1100, 2), unit='D'))
+            window = self.series.loc[start:end]
+            for name in ('min', 'max', 'mean', 'sum'):
+                expected = getattr(window, name)()
+                result = getattr(self.statistics, name)(start, end)
+                if np.isnan(expected):
+                    self.assertTrue(np.isnan(result))
+                else:
+                    self.assertAlmostEqual(result, expected, places=6)
+
+    def test_empty_window(self):
+        self.assertTrue(np.isnan(self.statistics.min('2020-01-01', '2019-01-01')))
+        self.assertTrue(np.isnan(self.statistics.mean('2030-01-01', '2030-02-01')))
+        self.assertEqual(self.statistics.sum('2030-01-01', '2030-02-01'), 0)
+
+    def test_open_window(self):
+        self.assertAlmostEqual(self.statistics.sum(), self.series.sum(), places=6)
+        self.assertEqual(self.statistics.max(start='2018-06-01'), self.series.loc['2018-06-01':].max())
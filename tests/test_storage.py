@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from elv.storage import MANIFEST_FILE, ColumnarStorage, Storage, write_columnar
+
+
+class TestColumnarStorage(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, 'columnar')
+        index = pd.date_range('2020-01-01', '2020-01-03', freq='15T')
+        self.df = pd.DataFrame({'datum_zeit': index, 'obis_180': [float(i) for i in range(len(index))]})
+        duplicated = pd.concat([self.df.iloc[:10], self.df.iloc[5:6].assign(obis_180=-1.)]).sort_values(
+            'datum_zeit', kind='mergesort')
+        self.written = write_columnar(self.directory, 'v1', [('M1', self.df), ('M2', duplicated)])
+        self.storage = ColumnarStorage(self.directory)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_readings(self):
+        self.assertEqual(self.written, len(self.df) + 10)
+        self.assertEqual(self.storage.version, 'v1')
+        df = self.storage.readings('M1', '2020-01-02 00:00', '2020-01-03 00:01')
+        expected = self.df.loc[(self.df['datum_zeit'] >= '2020-01-02') & (self.df['datum_zeit'] <= '2020-01-03')]
+        pd.testing.assert_frame_equal(df, expected.reset_index(drop=True))
+        self.assertTrue(self.storage.readings('M3', '2020-01-01 00:00', '2020-01-02 00:00').empty)
+        # The columns are views of the mapped files
+        self.assertTrue(np.shares_memory(df['datum_zeit'].to_numpy(), self.storage._timestamps))
+        self.assertTrue(np.shares_memory(df['obis_180'].to_numpy(), self.storage._values))
+
+    def test_daily_readings(self):
+        df = self.storage.daily_readings('M1')
+        self.assertEqual(df['datum_zeit'].dt.strftime('%Y-%m-%d %H:%M').tolist(),
+                         ['2020-01-01 00:00', '2020-01-02 00:00', '2020-01-03 00:00'])
+        self.assertEqual(df['obis_180'].tolist(), [0., 96., 192.])
+        self.assertEqual(self.storage.daily_readings('M2')['obis_180'].tolist(), [0.])
+
+    def test_outdated_format(self):
+        with open(os.path.join(self.directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'version': 'v1', 'meters': {'M1': [0, len(self.df)]}}, f)
+        storage = ColumnarStorage(self.directory)
+        self.assertIsNone(storage.version)
+        self.assertTrue(storage.readings('M1', '2020-01-01 00:00', '2020-01-02 00:00').empty)
+
+    def test_duplicates_removed(self):
+        df = self.storage.readings('M2', '2020-01-01 00:00', '2020-01-02 00:00')
+        self.assertEqual(df['obis_180'].tolist(), list(range(10)))
+
+    def test_portfolio_readings(self):
+        df = self.storage.portfolio_readings(['M2', 'M1'], '2020-01-01 00:00', '2020-01-01 01:00')
+        self.assertEqual(df['zaehler_id'].tolist(), ['M1'] * 5 + ['M2'] * 5)
+        self.assertEqual(df['obis_180'].tolist(), [0., 1., 2., 3., 4.] * 2)
+
+
+class TestStorage(TestCase):
+    def test_abstract(self):
+        class Incomplete(Storage):
+            def readings(self, meter_id, start, end):
+                return pd.DataFrame(columns=['datum_zeit', 'obis_180'])
+
+        with self.assertRaises(TypeError):
+            Incomplete()
@@ -0,0 +1,39 @@
+import pathlib
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from elv.synthetic import generate_database
+
+
+class TestSyntheticDatabase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def rows(self, name, seed):
+        path = pathlib.Path(self.tmp_dir.name) / name
+        generate_database(path, meters=2, years=1, seed=seed)
+        con = sqlite3.connect(path)
+        rows = con.execute("SELECT * FROM zaehlwerte ORDER BY rowid;").fetchall()
+        con.close()
+        return rows
+
+    def test_deterministic(self):
+        rows = self.rows('a.db', seed=0)
+        self.assertEqual(rows, self.rows('b.db', seed=0))
+        self.assertNotEqual(rows, self.rows('c.db', seed=1))
+
+    def test_gaps_and_duplicates(self):
+        rows = self.rows('a.db', seed=0)
+        keys = [row[:2] for row in rows]
+        self.assertLess(len(set(keys)), len(keys))
+        for meter_id in {row[0] for row in rows}:
+            readings = [row for row in rows if row[0] == meter_id]
+            values = [row[2] for row in readings]
+            self.assertEqual(values, sorted(values))
+            # Each day has 96 quarter hours, so gaps reduce the number of distinct points in time
+            days = len({row[1][:10] for row in readings}) - 1
+            self.assertLess(len({row[1] for row in readings}), days * 96 + 1)
@@ -0,0 +1,49 @@
+import pathlib
+import tempfile
+from unittest import TestCase
+
+from flask_caching.backends import SimpleCache
+
+from elv.cache import DataCache
+from elv.datahandler import DataHandler
+from elv.synthetic import generate_database
+from elv.warmup import warm_up
+
+
+class TestWarmUp(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = pathlib.Path(self.tmp_dir.name) / 'test.db'
+        generate_database(self.db_path, meters=2, years=1, seed=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_warm_up(self):
+        cache = DataCache(SimpleCache())
+        progress = []
+        finished = warm_up(DataHandler(cache=cache, db_path=self.db_path), duty_cycle=1,
+                           progress=lambda *args: progress.append(args))
+        self.assertEqual(finished, 2)
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        # Another process sharing the cache does not calculate anything again
+        misses = cache.stats()['misses']
+        dh = DataHandler(cache=cache, db_path=self.db_path)
+        for meter_id in dh.meters_in_database():
+            dh.metadata(meter_id)
+            dh.overview(meter_id)
+            dh.yearly_energy_usage(meter_id)
+        self.assertEqual(cache.stats()['misses'], misses)
+
+    def test_cache_threshold(self):
+        # Two meters with three values each fit into half of a cache of 12 values, but not of 10 values
+        dh = DataHandler(cache=DataCache(SimpleCache(threshold=12), threshold=12), db_path=self.db_path)
+        self.assertEqual(warm_up(dh, duty_cycle=1), 2)
+        dh = DataHandler(cache=DataCache(SimpleCache(threshold=10), threshold=10), db_path=self.db_path)
+        with self.assertLogs('elv.warmup', 'WARNING') as logs:
+            self.assertEqual(warm_up(dh, duty_cycle=1), 1)
+        self.assertIn("ELV_CACHE_THRESHOLD to at least 12", logs.output[0])
+
+    def test_invalid_duty_cycle(self):
+        with self.assertRaises(ValueError):
+            warm_up(DataHandler(cache=DataCache(SimpleCache()), db_path=self.db_path), duty_cycle=0)
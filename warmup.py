@@ -0,0 +1,7 @@
+import logging
+
+from elv import warmup
+
+# Started as a uWSGI mule, see uwsgi.ini, or with "python warmup.py"
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+warmup.run()
@@ -1,6 +1,10 @@
 import sys
 
 from elv import index
+from elv.preload import preload
+
+# Loaded by the uWSGI master, the workers are forked afterwards and share the preloaded modules and tables
+preload()
 
 if '-d' in sys.argv:
     index.app.run_server(debug=True, host='0.0.0.0')